@@ -0,0 +1,51 @@
+'''
+Moving a batch of a restaurant's orders from Pending to Preparing: one
+RestaurantPartner.update_order_status call (and commit) per order against a single
+bulk_update_status call, for 1, 100 and 10k orders per call.
+
+Usage: python benchmarks/bench_bulk_status.py [batch sizes...]
+
+'''
+
+import sys
+import time
+
+from common import seed_restaurants
+from order import Order
+from restaurant_partner import RestaurantPartner
+from utils.database import connection
+
+
+def place(menu_item_id, count):
+    return Order.place_orders([(n % 50 + 1, [(menu_item_id, 1)]) for n in range(count)])
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1, 100, 10000]
+
+    with connection() as conn:
+        restaurant_id = seed_restaurants(conn, 1, 1)[0]
+        menu_item_id = conn.execute('SELECT id FROM MenuItems').fetchone()[0]
+    partner = RestaurantPartner.__new__(RestaurantPartner)
+    partner.restaurant_id = restaurant_id
+
+    for size in sizes:
+        order_ids = place(menu_item_id, size)
+        start = time.perf_counter()
+        assert all(partner.update_order_status(order_id, 'Preparing') for order_id in order_ids)
+        one_by_one = size / (time.perf_counter() - start)
+
+        order_ids = place(menu_item_id, size)
+        start = time.perf_counter()
+        results = partner.bulk_update_status(order_ids, 'Pending', 'Preparing')
+        bulk = size / (time.perf_counter() - start)
+        assert all(results.values()) and len(results) == size
+        # A second call finds none of them still Pending
+        assert not any(partner.bulk_update_status(order_ids, 'Pending', 'Preparing').values())
+
+        print(f"{size:>6} orders: one call each {one_by_one:8.0f} orders/s  "
+              f"bulk_update_status {bulk:8.0f} orders/s  ({bulk / one_by_one:6.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
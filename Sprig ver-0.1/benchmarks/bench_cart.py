@@ -0,0 +1,98 @@
+'''
+Micro-benchmarks for Cart operations: the dict-backed cart with a running total
+against the previous list-based cart, which scanned its items on every change and
+re-priced everything for every total. Each operation is run on carts of growing size.
+
+Usage: python benchmarks/bench_cart.py [iterations]
+
+'''
+
+import random
+import sys
+
+from common import seed_restaurants, timed
+from cart import Cart, fetch_prices
+from utils.database import connection
+
+CART_SIZES = [10, 100, 1000]
+
+
+class ListCartItem:
+    def __init__(self, menu_item_id, quantity):
+        self.menu_item_id = menu_item_id
+        self.quantity = quantity
+
+
+class ListCart:
+    """
+    The list-based cart as it was before, keyed on menu_item_id for a like-for-like comparison.
+    """
+
+    def __init__(self):
+        self.items = []
+
+    def add_to_cart(self, menu_item_id, quantity):
+        for item in self.items:
+            if item.menu_item_id == menu_item_id:
+                item.quantity += quantity
+                return
+        self.items.append(ListCartItem(menu_item_id, quantity))
+
+    def remove_from_cart(self, menu_item_id):
+        for item in self.items:
+            if item.menu_item_id == menu_item_id:
+                self.items.remove(item)
+                return
+
+    def update_quantity(self, menu_item_id, new_quantity):
+        for item in self.items:
+            if item.menu_item_id == menu_item_id:
+                item.quantity = new_quantity
+                return
+
+    def calculate_total(self):
+        prices = fetch_prices(item.menu_item_id for item in self.items)
+        return sum(prices[item.menu_item_id] * item.quantity for item in self.items)
+
+
+def build(cart_class, menu_item_ids):
+    cart = cart_class(1) if cart_class is Cart else cart_class()
+    for menu_item_id in menu_item_ids:
+        cart.add_to_cart(menu_item_id, 1)
+    return cart
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rng = random.Random(11)
+
+    with connection() as conn:
+        seed_restaurants(conn, 1, max(CART_SIZES))
+        all_ids = [row[0] for row in conn.execute('SELECT id FROM MenuItems ORDER BY id')]
+
+    for size in CART_SIZES:
+        menu_item_ids = all_ids[:size]
+        old, new = build(ListCart, menu_item_ids), build(Cart, menu_item_ids)
+        new.calculate_total()
+        picks = [rng.choice(menu_item_ids) for _ in range(iterations)]
+        print(f"{size} lines")
+
+        def run(name, old_op, new_op):
+            pick = iter(picks * 2)
+            before = timed(lambda: old_op(next(pick)), iterations)
+            pick = iter(picks * 2)
+            after = timed(lambda: new_op(next(pick)), iterations)
+            print(f"  {name:<22} list {before:11.0f}/s  dict {after:11.0f}/s  ({after / before:7.1f}x)")
+
+        run('add existing item', lambda i: old.add_to_cart(i, 1), lambda i: new.add_to_cart(i, 1))
+        run('update quantity', lambda i: old.update_quantity(i, 2), lambda i: new.update_quantity(i, 2))
+        run('remove and re-add', lambda i: (old.remove_from_cart(i), old.add_to_cart(i, 2)),
+            lambda i: (new.remove_from_cart(i), new.add_to_cart(i, 2, 100.0)))
+        run('total after a change', lambda i: (old.update_quantity(i, 3), old.calculate_total()),
+            lambda i: (new.update_quantity(i, 3), new.get_subtotal()))
+        new.reprice()
+        assert abs(old.calculate_total() - new.calculate_total()['total']) < 1e-6
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+'''
+Write amplification of persistent carts: a random mix of cart adds, quantity changes
+and removals across many customers, written through by CartStore at several flush
+batch sizes, against plain write-through (a flush after every change).
+Reports changes per second, rows written per change and commits per change.
+
+Usage: python benchmarks/bench_cart_store.py [changes] [customers]
+
+'''
+
+import random
+import sys
+import threading
+import time
+
+from common import seed_restaurants
+from utils.cart_store import CartStore
+from utils.database import connection, get_pool
+
+BATCH_SIZES = [None, 8, 32, 128]
+
+
+def run(batch, changes, customers, menu_item_ids):
+    rng = random.Random(7)
+    store = CartStore(flush_batch=batch or changes + 1, flush_ms=60000)
+    commits = get_pool().stats()['commits']
+    threads = threading.active_count()
+    start = time.perf_counter()
+    for _ in range(changes):
+        cart = store.get(rng.randrange(customers) + 1)
+        menu_item_id = rng.choice(menu_item_ids)
+        roll = rng.random()
+        if roll < 0.6:
+            cart.add_to_cart(menu_item_id, 1)
+        elif roll < 0.85:
+            cart.update_quantity(menu_item_id, rng.randint(1, 5))
+        else:
+            cart.remove_from_cart(menu_item_id)
+        if batch is None:
+            store.flush()
+    store.flush()
+    # Wait for background flushes started by full batches
+    while threading.active_count() > threads:
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    stats = store.stats()
+    commits = get_pool().stats()['commits'] - commits
+    label = 'write-through' if batch is None else f"batch {batch}"
+    print(f"{label:<14} {stats['mutations'] / elapsed:9.0f} changes/s"
+          f"  {stats['write_amplification']:.2f} rows/change"
+          f"  {commits / stats['mutations']:.3f} commits/change")
+
+
+def main():
+    changes = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    customers = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    with connection() as conn:
+        seed_restaurants(conn, 1, 50)
+        menu_item_ids = [row[0] for row in conn.execute('SELECT id FROM MenuItems')]
+
+    print(f"{changes} cart changes over {customers} customers")
+    for batch in BATCH_SIZES:
+        run(batch, changes, customers, menu_item_ids)
+
+
+if __name__ == '__main__':
+    main()
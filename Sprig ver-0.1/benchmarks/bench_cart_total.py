@@ -0,0 +1,49 @@
+'''
+Cart.calculate_total with one price query per line (CartItem.calculate_subtotal,
+the old behaviour) against the batched IN (...) lookup, for carts of 1 to 100 lines.
+
+Usage: python benchmarks/bench_cart_total.py [iterations]
+
+'''
+
+import sys
+
+from common import seed_restaurants, timed
+from cart import Cart
+from membership import active_discount_rates
+from utils.database import connection, get_pool
+
+CART_SIZES = [1, 5, 15, 50, 100]
+
+
+def calculate_total_per_line(cart):
+    total = sum(item.calculate_subtotal() for item in cart.items.values())
+    with connection() as conn:
+        rate = active_discount_rates(conn.cursor(), [cart.customer_id]).get(cart.customer_id, 0)
+    return total - round(total * rate, 2)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    with connection() as conn:
+        seed_restaurants(conn, 1, max(CART_SIZES))
+        menu_item_ids = [row[0] for row in conn.execute('SELECT id FROM MenuItems ORDER BY id')]
+
+    for size in CART_SIZES:
+        cart = Cart(1)
+        for menu_item_id in menu_item_ids[:size]:
+            cart.add_to_cart(menu_item_id, 2)
+        assert abs(cart.calculate_total()['total'] - calculate_total_per_line(cart)) < 1e-6
+
+        checkouts = get_pool().stats()['checkouts']
+        before = timed(lambda: calculate_total_per_line(cart), iterations)
+        per_line_checkouts = (get_pool().stats()['checkouts'] - checkouts) / iterations
+        # Force the price lookup each time; otherwise the cart's running total answers without a query
+        after = timed(lambda: (cart.reprice(), cart.calculate_total()), iterations)
+        print(f"{size:4d} lines: per-line {before:9.0f}/s ({per_line_checkouts:.0f} queries)"
+              f"  batched {after:9.0f}/s (2 queries)  ({after / before:5.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
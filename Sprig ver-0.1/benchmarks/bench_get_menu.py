@@ -0,0 +1,73 @@
+'''
+Compares menu reads with a fresh sqlite3 connection per call (the old behaviour),
+the shared connection pool, and Restaurant.get_menu served from the menu cache,
+single- and multi-threaded.
+
+Usage: python benchmarks/bench_get_menu.py [iterations] [threads]
+
+'''
+
+import sqlite3
+import sys
+import threading
+import time
+
+from common import seed_restaurants, timed
+from utils.database import DATABASE, connection, get_pool
+from restaurant import Restaurant
+from utils.menu_cache import menu_cache
+
+
+def get_menu_unpooled(restaurant_id):
+    conn = sqlite3.connect(DATABASE)
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM MenuItems WHERE restaurant_id=?', (restaurant_id,))
+    menu_items = cursor.fetchall()
+    conn.close()
+    return menu_items
+
+
+def get_menu_pooled(restaurant_id):
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM MenuItems WHERE restaurant_id=?', (restaurant_id,))
+        return cursor.fetchall()
+
+
+def threaded(fn, iterations, threads):
+    per_thread = iterations // threads
+    workers = [threading.Thread(target=lambda: [fn() for _ in range(per_thread)])
+               for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    with connection() as conn:
+        restaurant_id = seed_restaurants(conn, 10, 40)[0]
+    restaurant = Restaurant(restaurant_id, '', '')
+
+    before = timed(lambda: get_menu_unpooled(restaurant_id), iterations)
+    pooled = timed(lambda: get_menu_pooled(restaurant_id), iterations)
+    cached = timed(restaurant.get_menu, iterations)
+    print(f"get_menu, 1 thread:  unpooled {before:10.0f}/s  pooled {pooled:10.0f}/s ({pooled / before:.1f}x)"
+          f"  cached {cached:10.0f}/s ({cached / before:.1f}x)")
+
+    before = threaded(lambda: get_menu_unpooled(restaurant_id), iterations, threads)
+    pooled = threaded(lambda: get_menu_pooled(restaurant_id), iterations, threads)
+    cached = threaded(restaurant.get_menu, iterations, threads)
+    print(f"get_menu, {threads} threads: unpooled {before:10.0f}/s  pooled {pooled:10.0f}/s ({pooled / before:.1f}x)"
+          f"  cached {cached:10.0f}/s ({cached / before:.1f}x)")
+    print(f"pool stats: {get_pool().stats()}")
+    print(f"menu cache stats: {menu_cache.stats()}")
+
+
+if __name__ == '__main__':
+    main()
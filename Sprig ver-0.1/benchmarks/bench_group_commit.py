@@ -0,0 +1,68 @@
+'''
+Order placements per second with one commit per write versus group commit
+at several batch windows. Uses the durable profile (synchronous=FULL) so every
+commit pays for an fsync, as it would in production.
+
+Usage: python benchmarks/bench_group_commit.py [seconds] [threads]
+
+'''
+
+import os
+import sys
+import threading
+import time
+
+from common import TEMP_DIR, seed_restaurants
+from order import Order
+from utils.database import configure_pool, connection, initialize_database
+from utils.group_commit import disable_group_commit, enable_group_commit
+
+WINDOWS_MS = [None, 0.5, 1, 2, 5, 10]
+
+
+def run(window_ms, seconds, threads, menu_item_id):
+    writer = enable_group_commit(window_ms) if window_ms is not None else None
+    stop = threading.Event()
+    counts = [0] * threads
+
+    def worker(n):
+        order = Order(None, n + 1, None, None)
+        while not stop.is_set():
+            order.place_order([(menu_item_id, 1)])
+            counts[n] += 1
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for w in workers:
+        w.start()
+    time.sleep(seconds)
+    stop.set()
+    for w in workers:
+        w.join()
+
+    label = 'no batching' if window_ms is None else f"window {window_ms:g} ms"
+    line = f"{label:<14} {sum(counts) / seconds:10.0f} writes/s"
+    if writer is not None:
+        line += f"  (avg batch {writer.stats()['average_batch']:.1f})"
+        disable_group_commit()
+    print(line)
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    configure_pool(database=os.path.join(TEMP_DIR, 'group_commit.db'),
+                   size=threads, profile='durable')
+    initialize_database()
+    with connection() as conn:
+        restaurant_id = seed_restaurants(conn, 1, 1)[0]
+        menu_item_id = conn.execute('SELECT id FROM MenuItems WHERE restaurant_id=?',
+                                    (restaurant_id,)).fetchone()[0]
+
+    print(f"{threads} threads, {seconds:g}s per run")
+    for window_ms in WINDOWS_MS:
+        run(window_ms, seconds, threads, menu_item_id)
+
+
+if __name__ == '__main__':
+    main()
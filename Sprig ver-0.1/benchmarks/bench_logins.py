@@ -0,0 +1,62 @@
+'''
+Login throughput with bcrypt checks in the hashing pool, as its worker count varies.
+Concurrent callers log in with User.login; "inline" (0 workers) checks on the calling
+threads as before the pool. Only as many workers as there are cores can run at once,
+so throughput stops growing past the core count, but callers queue in front of the
+pool (see waits) instead of competing for the CPU with the rest of the process.
+
+Usage: python benchmarks/bench_logins.py [logins] [callers] [bcrypt_rounds]
+
+'''
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import TEMP_DIR  # noqa: F401  (sets up the benchmark database)
+from user import User
+from utils import hashing
+from utils.database import connection
+
+WORKER_COUNTS = sorted({0, 1, 2, 4, os.cpu_count() or 1})
+
+
+def seed_users(count, hashed):
+    with connection() as conn:
+        conn.executemany('''
+            INSERT INTO Users (username, password, name, email, user_type)
+            VALUES (?, ?, ?, ?, 'Customer')
+        ''', [(f"user{n}", hashed, f"User {n}", f"user{n}@example.com") for n in range(count)])
+        conn.commit()
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    callers = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    hashing.password_hasher = hashing.PasswordHasher(workers=0, hasher=hashing.BcryptHasher(rounds))
+    seed_users(callers, hashing.hash_password('correct horse'))
+    print(f"{os.cpu_count()} cores, bcrypt cost {rounds}, {callers} concurrent callers")
+
+    for workers in WORKER_COUNTS:
+        hashing.password_hasher = hashing.PasswordHasher(workers=workers, max_pending=max(workers, 1) * 2,
+                                                         wait_ms=60000, hasher=hashing.BcryptHasher(rounds))
+        # Start the worker processes outside the timing
+        with ThreadPoolExecutor(max(workers, 1)) as executor:
+            list(executor.map(lambda _: hashing.hash_password('warm up'), range(max(workers, 1))))
+        with ThreadPoolExecutor(callers) as executor:
+            start = time.perf_counter()
+            results = list(executor.map(lambda n: User.login(f"user{n % callers}", 'correct horse'), range(logins)))
+            elapsed = time.perf_counter() - start
+        assert all(results)
+        stats = hashing.password_hasher.stats()
+        hashing.password_hasher.shutdown()
+        label = 'inline' if workers == 0 else f"{workers} workers"
+        print(f"{label:>10}: {logins / elapsed:7.1f} logins/s  p50 {stats['p50_ms']:7.1f} ms  "
+              f"p99 {stats['p99_ms']:7.1f} ms  max queue {stats['max_queue_depth']:3}  waits {stats['waits']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+'''
+Loading a screen of orders with their items: Order.get_order_details once per order against
+one load_order_details call for the whole batch. Counts the statements each approach runs
+(two per order for the loop, three for the batch) and the time.
+
+Usage: python benchmarks/bench_order_details.py [items_per_order] [iterations]
+
+'''
+
+import sys
+
+from common import seed_restaurants, timed
+from order import Order, load_order_details
+from utils.database import connection
+
+BATCH_SIZES = [1, 10, 50, 200]
+
+
+def count_statements(fn):
+    """
+    Runs fn() and returns how many SQL statements it executed on this thread's connection.
+    """
+    statements = []
+    with connection() as conn:
+        conn.set_trace_callback(statements.append)
+        try:
+            fn()
+        finally:
+            conn.set_trace_callback(None)
+    return len(statements)
+
+
+def per_order(order_ids):
+    return [Order(order_id, None, None, None).get_order_details() for order_id in order_ids]
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    with connection() as conn:
+        seed_restaurants(conn, 1, items)
+        menu_item_ids = [row[0] for row in conn.execute('SELECT id FROM MenuItems')]
+    order_ids = Order.place_orders([(n % 50 + 1, [(menu_item_id, 1) for menu_item_id in menu_item_ids])
+                                    for n in range(max(BATCH_SIZES))])
+    with connection() as conn:
+        conn.executemany('''
+            INSERT INTO Payments (order_id, payment_method, payment_status, payment_date, amount)
+            VALUES (?, 'UPI', 'Completed', datetime('now'), 100)
+        ''', [(order_id,) for order_id in order_ids[::2]])
+        conn.commit()
+
+    for size in BATCH_SIZES:
+        batch = order_ids[:size]
+        assert [(d.order_id, [(line.menu_item_id, line.quantity, line.item_name) for line in d.items])
+                for d in load_order_details(batch)] == \
+            [(order_id, [tuple(row) for row in details[0]]) for order_id, details in zip(batch, per_order(batch))]
+        loop_queries = count_statements(lambda: per_order(batch))
+        batch_queries = count_statements(lambda: load_order_details(batch))
+        loop = timed(lambda: per_order(batch), iterations)
+        batched = timed(lambda: load_order_details(batch), iterations)
+        print(f"{size:>4} orders: per-order {loop_queries:4} queries {loop:8.0f} screens/s   "
+              f"batched {batch_queries:4} queries {batched:8.0f} screens/s  ({batched / loop:5.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
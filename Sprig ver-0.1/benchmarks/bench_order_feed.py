@@ -0,0 +1,81 @@
+'''
+Refreshing a restaurant partner's order screen: reloading every order (what view_orders
+returned before it was paged) against RestaurantPartner.view_order_changes, which reads
+only the orders placed or changed since the last refresh. Between refreshes a few
+orders change status; the reload grows with history, the delta with the changes.
+
+Usage: python benchmarks/bench_order_feed.py [changes_per_refresh] [refreshes]
+
+'''
+
+import random
+import sys
+
+from common import seed_restaurants, timed
+from order import order_watermark
+from restaurant_partner import RestaurantPartner
+from utils.database import connection, unit_of_work
+
+HISTORY_SIZES = [1000, 10000, 100000]
+
+
+def seed_orders(conn, restaurant_id, orders):
+    conn.executemany('''
+        INSERT INTO Orders (customer_id, restaurant_id, order_status, order_date)
+        VALUES (?, ?, 'Delivered', datetime('2024-01-01', ? || ' minutes'))
+    ''', [(n % 500 + 1, restaurant_id, n) for n in range(orders)])
+    conn.commit()
+
+
+def full_reload(restaurant_id):
+    with connection() as conn:
+        return conn.execute('''
+            SELECT Orders.id, Orders.customer_id, Orders.order_status, Orders.order_date
+            FROM Orders WHERE Orders.restaurant_id=?
+        ''', (restaurant_id,)).fetchall()
+
+
+def touch(order_ids, changes):
+    # Any update bumps change_seq; total_amount keeps the order's status legal
+    with unit_of_work() as cursor:
+        cursor.executemany('UPDATE Orders SET total_amount = coalesce(total_amount, 0) + 1 WHERE id=?',
+                           [(order_id,) for order_id in random.sample(order_ids, changes)])
+
+
+def main():
+    changes = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    refreshes = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    with connection() as conn:
+        restaurant_id = seed_restaurants(conn, 1, 1)[0]
+    partner = RestaurantPartner.__new__(RestaurantPartner)
+    partner.restaurant_id = restaurant_id
+    seeded = 0
+    for history in HISTORY_SIZES:
+        with connection() as conn:
+            seed_orders(conn, restaurant_id, history - seeded)
+        seeded = history
+        with connection() as conn:
+            order_ids = [row[0] for row in conn.execute('SELECT id FROM Orders')]
+        state = {}
+
+        def reload():
+            touch(order_ids, changes)
+            return full_reload(restaurant_id)
+
+        def delta():
+            touch(order_ids, changes)
+            batch = partner.view_order_changes(state['watermark'])
+            assert len(batch) == changes and not batch.has_more
+            state['watermark'] = batch.watermark
+
+        by_reload = timed(reload, refreshes)
+        with connection() as conn:
+            state['watermark'] = order_watermark(conn.cursor())
+        by_delta = timed(delta, refreshes)
+        print(f"{history:>7} orders, {changes} changed per refresh: reload {by_reload:7.0f}/s  "
+              f"delta {by_delta:7.0f}/s  ({by_delta / by_reload:6.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+'''
+Paging through one restaurant's order list: LIMIT/OFFSET against the (order_date, id)
+keyset pages of RestaurantPartner.view_orders. An OFFSET page re-reads every row before
+it, so deep pages get slower; a keyset page seeks straight to its cursor in the
+(restaurant_id, order_date) index and costs the same at any depth.
+
+Usage: python benchmarks/bench_order_pages.py [orders] [page_size] [iterations]
+
+'''
+
+import sys
+
+from common import seed_restaurants, timed
+from order import fetch_order_page
+from utils.database import connection
+
+SELECT = 'SELECT Orders.id, Orders.customer_id, Orders.order_status, Orders.order_date FROM Orders'
+
+
+def seed_orders(conn, restaurant_id, orders):
+    # One order a minute, newest last, so pages span distinct order dates
+    conn.executemany('''
+        INSERT INTO Orders (customer_id, restaurant_id, order_status, order_date)
+        VALUES (?, ?, 'Delivered', datetime('2024-01-01', ? || ' minutes'))
+    ''', [(n % 500 + 1, restaurant_id, n) for n in range(orders)])
+    conn.commit()
+
+
+def offset_page(restaurant_id, offset, page_size):
+    with connection() as conn:
+        return conn.execute(f'''
+            {SELECT} WHERE Orders.restaurant_id=?
+            ORDER BY Orders.order_date DESC, Orders.id DESC LIMIT ? OFFSET ?
+        ''', (restaurant_id, page_size, offset)).fetchall()
+
+
+def keyset_page(restaurant_id, after, page_size):
+    with connection() as conn:
+        return fetch_order_page(conn.cursor(), SELECT, 'restaurant_id', restaurant_id, after, page_size)
+
+
+def main():
+    orders = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    page_size = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    iterations = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    with connection() as conn:
+        restaurant_id = seed_restaurants(conn, 1, 1)[0]
+        seed_orders(conn, restaurant_id, orders)
+
+    for depth in (0, 0.1, 0.5, 0.99):
+        offset = int(orders * depth)
+        # The cursor for the same page is the (order_date, id) of the row just before it
+        previous = offset_page(restaurant_id, offset - 1, 1)[0] if offset else None
+        after = (previous['order_date'], previous['id']) if previous else None
+        assert [row['id'] for row in keyset_page(restaurant_id, after, page_size)] == \
+            [row['id'] for row in offset_page(restaurant_id, offset, page_size)]
+        by_offset = timed(lambda: offset_page(restaurant_id, offset, page_size), iterations)
+        by_keyset = timed(lambda: keyset_page(restaurant_id, after, page_size), iterations)
+        print(f"page at row {offset:>7}: OFFSET {by_offset:8.0f}/s  keyset {by_keyset:8.0f}/s  "
+              f"({by_keyset / by_offset:6.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+'''
+Following live orders by polling Order.track_order() versus subscribing to the order hub.
+Polling costs one query per watcher per interval whether or not anything changed; the
+hub costs one snapshot query per subscriber and then pushes each committed change.
+Reports the polling query rate for the same watchers, and the hub's query count and
+commit-to-delivery latency for asyncio subscribers.
+
+Usage: python benchmarks/bench_order_tracking.py [orders] [watchers_per_order] [poll_interval_s]
+
+'''
+
+import asyncio
+import statistics
+import sys
+import time
+
+from common import seed_restaurants, timed
+from order import Order, change_order_status
+from utils.database import connection, unit_of_work
+from utils.order_hub import order_hub
+
+STEPS = [('Preparing', 'restaurant'), ('Out for Delivery', 'restaurant'), ('Delivered', 'delivery')]
+
+
+async def watch(order_id, latencies):
+    async for event in order_hub.subscribe(order_id):
+        if not event.get('snapshot'):
+            latencies.append(time.perf_counter() - event['published_at'])
+
+
+def advance(order_ids, status, actor):
+    for order_id in order_ids:
+        with unit_of_work() as cursor:
+            change_order_status(cursor, order_id, status, None, actor)
+
+
+async def run_hub(order_ids, watchers):
+    latencies = []
+    tasks = [asyncio.create_task(watch(order_id, latencies))
+             for order_id in order_ids for _ in range(watchers)]
+    # Let every subscriber take its snapshot
+    while order_hub.stats()['subscribers'] < len(tasks):
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.2)
+    loop = asyncio.get_running_loop()
+    for status, actor in STEPS:
+        await loop.run_in_executor(None, advance, order_ids, status, actor)
+    await asyncio.gather(*tasks)
+    return latencies
+
+
+def main():
+    orders = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    watchers = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    interval = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+
+    with connection() as conn:
+        seed_restaurants(conn, 1, 1)
+        menu_item_id = conn.execute('SELECT id FROM MenuItems').fetchone()[0]
+    order_ids = Order.place_orders([(n % 50 + 1, [(menu_item_id, 1)]) for n in range(orders)])
+
+    # Stamp publish time so subscribers can measure delivery latency
+    publish = order_hub.publish
+    order_hub.publish = lambda event: publish(dict(event, published_at=time.perf_counter()))
+
+    subscribers = orders * watchers
+    rate = timed(Order(order_ids[0], None, None, None).track_order, 2000)
+    print(f"{subscribers} watchers on {orders} orders")
+    print(f"polling every {interval:g}s: {subscribers / interval:.0f} queries/s "
+          f"({subscribers / interval / rate:.0%} of one thread at {rate:.0f} track_order calls/s)")
+
+    start = time.perf_counter()
+    latencies = asyncio.run(run_hub(order_ids, watchers))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"hub: {subscribers} snapshot queries in total, {len(latencies)} events pushed in {elapsed:.1f}s, "
+          f"latency p50 {statistics.median(latencies) * 1000:.2f} ms "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+    print(f"hub stats: {order_hub.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+'''
+Order placement throughput: one Order.place_order call (and commit) per order,
+the same calls inside a single unit of work, and Order.place_orders, which prices
+and writes every order with one executemany per table.
+
+Usage: python benchmarks/bench_place_orders.py [orders] [lines_per_order]
+
+'''
+
+import random
+import sys
+import time
+
+from common import seed_restaurants
+from order import Order
+from utils.database import connection, unit_of_work
+
+
+def make_carts(orders, lines, menus):
+    rng = random.Random(3)
+    carts = []
+    for n in range(orders):
+        menu = menus[rng.randrange(len(menus))]
+        cart_items = [(menu_item_id, rng.randint(1, 3)) for menu_item_id in rng.sample(menu, lines)]
+        carts.append((n % 500 + 1, cart_items))
+    return carts
+
+
+def report(label, orders, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {orders / elapsed:9.0f} orders/s")
+
+
+def main():
+    orders = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    lines = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    with connection() as conn:
+        restaurant_ids = seed_restaurants(conn, 20, 30)
+        menus = [[row[0] for row in conn.execute('SELECT id FROM MenuItems WHERE restaurant_id=?', (r,))]
+                 for r in restaurant_ids]
+    carts = make_carts(orders, lines, menus)
+
+    def one_by_one():
+        for customer_id, cart_items in carts:
+            Order(None, customer_id, None, None).place_order(cart_items)
+
+    def one_transaction():
+        with unit_of_work():
+            for customer_id, cart_items in carts:
+                Order(None, customer_id, None, None).place_order(cart_items)
+
+    print(f"{orders} orders of {lines} lines")
+    report('place_order, commit each', orders, one_by_one)
+    report('place_order, one transaction', orders, one_transaction)
+    report('place_orders (bulk)', orders, lambda: Order.place_orders(carts))
+
+
+if __name__ == '__main__':
+    main()
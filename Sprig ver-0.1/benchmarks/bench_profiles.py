@@ -0,0 +1,83 @@
+'''
+Mixed read/write throughput for each database performance profile.
+Writer threads insert orders the way Order.place_order does, one commit per order,
+while reader threads list a restaurant's orders like RestaurantPartner.view_orders.
+
+Usage: python benchmarks/bench_profiles.py [seconds] [readers] [writers]
+
+'''
+
+import os
+import sys
+import threading
+import time
+
+from common import TEMP_DIR, seed_restaurants
+from utils.database import PROFILES, configure_pool, connection, initialize_database
+
+
+def writer(restaurant_id, stop, counts):
+    while not stop.is_set():
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO Orders (customer_id, restaurant_id, order_status, order_date)
+                VALUES (?, ?, 'Pending', datetime('now'))
+            ''', (1, restaurant_id))
+            order_id = cursor.lastrowid
+            cursor.execute('''
+                INSERT INTO OrderItems (order_id, menu_item_id, quantity)
+                VALUES (?, ?, ?)
+            ''', (order_id, 1, 2))
+            conn.commit()
+        counts['writes'] += 1
+
+
+def reader(restaurant_id, stop, counts):
+    while not stop.is_set():
+        with connection() as conn:
+            conn.execute('''
+                SELECT Orders.id, Orders.customer_id, Orders.order_status
+                FROM Orders
+                WHERE Orders.restaurant_id=?
+                ORDER BY Orders.id DESC LIMIT 50
+            ''', (restaurant_id,)).fetchall()
+        counts['reads'] += 1
+
+
+def run(profile, seconds, readers, writers):
+    configure_pool(database=os.path.join(TEMP_DIR, f"{profile}.db"),
+                   size=readers + writers, profile=profile)
+    initialize_database()
+    with connection() as conn:
+        restaurant_id = seed_restaurants(conn, 1, 20)[0]
+
+    stop = threading.Event()
+    counts = [{'reads': 0, 'writes': 0} for _ in range(readers + writers)]
+    threads = [threading.Thread(target=reader, args=(restaurant_id, stop, counts[i]))
+               for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(restaurant_id, stop, counts[readers + i]))
+                for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    reads = sum(c['reads'] for c in counts) / seconds
+    writes = sum(c['writes'] for c in counts) / seconds
+    print(f"{profile:<10} reads {reads:10.0f}/s  writes {writes:8.0f}/s")
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    writers = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    print(f"{readers} readers, {writers} writers, {seconds:g}s per profile")
+    for profile in PROFILES:
+        run(profile, seconds, readers, writers)
+
+
+if __name__ == '__main__':
+    main()
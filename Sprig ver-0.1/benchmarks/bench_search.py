@@ -0,0 +1,82 @@
+'''
+Dish and restaurant search over a 100k-item catalog: a ranked LIKE scan of MenuItems
+and Restaurants (the only option before the FTS5 index) against Restaurant.search.
+The synthetic catalog repeats a few dish names, so common words match thousands of
+rows; rarer words show the gap more clearly.
+
+Usage: python benchmarks/bench_search.py [items] [iterations]
+
+'''
+
+import random
+import sys
+import time
+
+from common import timed
+from restaurant import Restaurant
+from utils.database import connection
+
+DISHES = ['Biryani', 'Paneer Tikka', 'Masala Dosa', 'Butter Chicken', 'Dal Makhani',
+          'Chole Bhature', 'Pav Bhaji', 'Veg Pulao', 'Hakka Noodles', 'Margherita Pizza',
+          'Pasta Alfredo', 'Gulab Jamun', 'Rasmalai', 'Idli Sambar', 'Vada Pav']
+STYLES = ['Hyderabadi', 'Lucknowi', 'Spicy', 'Classic', 'Special', 'Mini', 'Jumbo', 'Homestyle']
+CUISINES = ['Indian', 'Chinese', 'Italian', 'South Indian', 'Mughlai', 'Street Food']
+QUERIES = ['biryani', 'hyderabadi biry', 'paneer', 'dosa', 'mughlai', 'pizza', 'jamun']
+
+
+def seed_catalog(items, per_restaurant=100):
+    rng = random.Random(7)
+    with connection() as conn:
+        cursor = conn.cursor()
+        for r in range(items // per_restaurant):
+            cursor.execute('''
+                INSERT INTO Restaurants (restaurant_name, address, cuisine_type)
+                VALUES (?, ?, ?)
+            ''', (f"{rng.choice(STYLES)} Kitchen {r}", f"{r} Main Street", rng.choice(CUISINES)))
+            restaurant_id = cursor.lastrowid
+            cursor.executemany('''
+                INSERT INTO MenuItems (restaurant_id, item_name, item_description, price, item_type)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(restaurant_id, f"{rng.choice(STYLES)} {rng.choice(DISHES)}",
+                   f"House recipe number {i}", rng.randint(80, 600), 'Veg')
+                  for i in range(per_restaurant)])
+        conn.commit()
+
+
+def like_search(query, limit=20):
+    """
+    Ranked search without the index: every row is scanned, name matches first.
+    """
+    pattern = f"%{query}%"
+    with connection() as conn:
+        items = conn.execute('''
+            SELECT id, item_name FROM MenuItems
+            WHERE item_name LIKE ? OR item_description LIKE ?
+            ORDER BY item_name LIKE ? DESC LIMIT ?
+        ''', (pattern, pattern, pattern, limit)).fetchall()
+        restaurants = conn.execute('''
+            SELECT id, restaurant_name FROM Restaurants
+            WHERE restaurant_name LIKE ? OR cuisine_type LIKE ?
+            ORDER BY restaurant_name LIKE ? DESC LIMIT ?
+        ''', (pattern, pattern, pattern, limit)).fetchall()
+    return items + restaurants
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    start = time.perf_counter()
+    seed_catalog(items)
+    print(f"seeded {items} items (index kept by triggers) in {time.perf_counter() - start:.1f}s")
+
+    for query in QUERIES:
+        hits = Restaurant.search(query, limit=5)
+        top = ', '.join(hit['title'] for hit in hits[:3])
+        like = timed(lambda: like_search(query), iterations)
+        fts = timed(lambda: Restaurant.search(query), iterations)
+        print(f"{query!r:<18} LIKE {like:8.0f}/s  FTS5 {fts:8.0f}/s  ({fts / like:5.1f}x)  top: {top}")
+
+
+if __name__ == '__main__':
+    main()
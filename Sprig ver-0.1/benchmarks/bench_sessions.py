@@ -0,0 +1,36 @@
+'''
+Authenticating a request: checking the password again with User.login against validating
+a session token. A cached token costs a dictionary lookup and a sha256 of the token; a
+token the process has not seen yet (e.g. after a restart) costs one primary-key read.
+
+Usage: python benchmarks/bench_sessions.py [iterations] [bcrypt_cost]
+
+'''
+
+import sys
+
+from common import timed
+from user import User
+from utils import hashing
+from utils.sessions import SessionStore, session_store
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    cost = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    hashing.password_hasher = hashing.PasswordHasher(workers=0, hasher=hashing.BcryptHasher(cost))
+    User('alice', 'Secret#123', 'Alice', 'alice@example.com').register()
+    token = User.login('alice', 'Secret#123')['session_token']
+
+    logins = timed(lambda: User.login('alice', 'Secret#123'), 20)
+    cached = timed(lambda: session_store.validate(token), iterations)
+    cold = timed(lambda: SessionStore().validate(token), iterations // 10)
+    print(f"password check (bcrypt cost {cost}) {logins:10.1f}/s  {1e6 / logins:10.1f} us")
+    print(f"session token, cached          {cached:10.0f}/s  {1e6 / cached:10.1f} us")
+    print(f"session token, not cached      {cold:10.0f}/s  {1e6 / cold:10.1f} us")
+    print(session_store.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+'''
+Signup attempts with usernames that are already taken, as a bot retrying a list of
+names would make them. Before the availability filter every attempt hashed the password
+and only then hit the UNIQUE constraint; now a taken name is confirmed with one query
+and no hash. Also times availability lookups for free names (answered by the Bloom
+filter alone) and taken names (filter hit plus a confirming query).
+
+Usage: python benchmarks/bench_signup_retries.py [users] [attempts] [bcrypt_cost]
+
+'''
+
+import sys
+
+from common import timed
+from customer import Customer
+from utils import hashing
+from utils.availability import is_username_available, user_availability
+from utils.database import connection
+
+
+def seed_users(count, hashed):
+    with connection() as conn:
+        conn.executemany('''
+            INSERT INTO Users (username, password, name, email, user_type)
+            VALUES (?, ?, ?, ?, 'Customer')
+        ''', [(f"user{n}", hashed, f"User {n}", f"user{n}@example.com") for n in range(count)])
+        conn.commit()
+
+
+def signup_before(username, password):
+    # What a taken username cost before: a full hash, then the IntegrityError
+    hashed = hashing.hash_password(password)
+    try:
+        with connection() as conn:
+            conn.execute('''
+                INSERT INTO Users (username, password, name, email, user_type)
+                VALUES (?, ?, ?, ?, 'Customer')
+            ''', (username, hashed, 'Bot', f"{username}@bot.example.com"))
+            conn.commit()
+    except Exception:
+        conn.rollback()
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    attempts = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    cost = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    hashing.password_hasher = hashing.PasswordHasher(workers=0, hasher=hashing.BcryptHasher(cost))
+    seed_users(users, hashing.hash_password('correct horse'))
+    user_availability.rebuild()
+    names = [f"user{n * 7919 % users}" for n in range(attempts)]
+
+    before = timed(lambda: [signup_before(name, 'Secret#123') for name in names], 1) * attempts
+    after = timed(lambda: [Customer.signup(name, 'Secret#123', 'Bot', f"{name}@bot.example.com", '5550100100')
+                           for name in names], 1) * attempts
+    free = timed(lambda: is_username_available('nobody-has-this-name'), 100000)
+    taken = timed(lambda: is_username_available('user42'), 10000)
+    print(f"{users} users, bcrypt cost {cost}")
+    print(f"taken-name signup, hash then insert  {before:10.1f}/s  {1e6 / before:10.1f} us")
+    print(f"taken-name signup, availability check {after:9.1f}/s  {1e6 / after:10.1f} us")
+    print(f"lookup, free name (filter only)       {free:9.0f}/s  {1e6 / free:10.1f} us")
+    print(f"lookup, taken name (filter + query)   {taken:9.0f}/s  {1e6 / taken:10.1f} us")
+    print(user_availability.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+'''
+Onboarding customers one Customer.signup at a time against utils/user_import.py, which
+hashes in the pool a chunk ahead and inserts each chunk with executemany in one
+transaction. At a realistic bcrypt cost hashing dominates both, so the import gains what
+the pool's workers add; at a low cost the per-signup commit dominates the loop.
+
+Usage: python benchmarks/bench_user_import.py [users] [bcrypt_cost] [workers]
+
+'''
+
+import contextlib
+import io
+import os
+import sys
+import time
+
+from common import TEMP_DIR  # noqa: F401  (sets up the benchmark database)
+from customer import Customer
+from utils import hashing
+from utils.user_import import import_users
+
+
+def rows(prefix, count):
+    return [(n + 1, {'username': f"{prefix}{n}", 'password': 'Secret#123', 'name': 'Bench User',
+                     'email': f"{prefix}{n}@example.com", 'phone': '5550100100'}) for n in range(count)]
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    cost = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count() or 1
+
+    hashing.password_hasher = hashing.PasswordHasher(workers=workers, hasher=hashing.BcryptHasher(cost))
+    hashing.hash_password('warm up')
+    print(f"{users} customers, bcrypt cost {cost}, {workers} hashing workers")
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _, fields in rows('signup', users):
+            Customer.signup(fields['username'], fields['password'], fields['name'], fields['email'], fields['phone'])
+    signups = users / (time.perf_counter() - start)
+
+    report = import_users(rows('import', users), 'Customer')
+    assert report.imported == users, report.errors[:5]
+    print(f"signup loop      {signups:9.1f} users/s")
+    print(f"bulk import      {report.rate:9.1f} users/s")
+    print(hashing.password_hasher.stats())
+    hashing.password_hasher.shutdown()
+
+
+if __name__ == '__main__':
+    main()
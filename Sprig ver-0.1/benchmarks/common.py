@@ -0,0 +1,55 @@
+'''
+Shared helpers for the benchmark scripts.
+Every benchmark runs against a throwaway database in a temporary directory,
+so running one never touches sprig.db.
+
+'''
+
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+TEMP_DIR = tempfile.mkdtemp(prefix='sprig-bench-')
+os.environ['SPRIG_DATABASE'] = os.path.join(TEMP_DIR, 'bench.db')
+
+from utils.database import initialize_database  # noqa: E402
+
+initialize_database()
+
+
+def seed_restaurants(conn, restaurants, items_per_restaurant):
+    """
+    Inserts restaurants with menu items and returns the restaurant ids.
+    """
+    cursor = conn.cursor()
+    restaurant_ids = []
+    for r in range(restaurants):
+        cursor.execute('''
+            INSERT INTO Restaurants (restaurant_name, address, cuisine_type)
+            VALUES (?, ?, ?)
+        ''', (f"Restaurant {r}", f"{r} Main Street", 'Indian'))
+        restaurant_id = cursor.lastrowid
+        restaurant_ids.append(restaurant_id)
+        cursor.executemany('''
+            INSERT INTO MenuItems (restaurant_id, item_name, item_description, price, item_type)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(restaurant_id, f"Dish {i}", f"Dish {i} of restaurant {r}", 100 + i, 'Veg')
+              for i in range(items_per_restaurant)])
+    conn.commit()
+    return restaurant_ids
+
+
+def timed(fn, iterations):
+    """
+    Runs fn() the given number of times and returns calls per second.
+    """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed if elapsed else float('inf')
@@ -6,196 +6,161 @@ Attributes:
 
 cart_id: Unique identifier for each cart.
 customer_id: References the customer who owns this cart.
-items: List of CartItem objects, representing individual items in the cart.
+items: Dict of CartItem objects keyed by menu_item_id, representing individual items in the cart.
 total_price: The cumulative price of all items in the cart.
+The subtotal is kept up to date on every change, so adding, removing or re-pricing a line is O(1).
+A menu write bumps menu_cache.version, and the next total re-prices the whole cart with one query.
 Methods:
 
 add_item(menu_item_id, quantity): Adds an item to the cart. Checks if the item is already in the cart, and if so, updates the quantity.
-remove_item(cart_item_id): Removes an item from the cart by its ID.
-update_quantity(cart_item_id, new_quantity): Adjusts the quantity of a specific item in the cart.
+remove_item(menu_item_id): Removes an item from the cart by its menu item ID.
+update_quantity(menu_item_id, new_quantity): Adjusts the quantity of a specific item in the cart.
 calculate_total(): Computes the total price for all items in the cart, considering membership discounts if applicable.
+All prices are fetched with one query, and the per-line subtotals are returned with the discounted total.
+The discount uses the customer's active membership rate, the same one stored on the order.
 view_cart(): Displays the current items in the cart along with their quantities and the total price.
 clear_cart(): Empties all items from the cart.
+discard(): Empties the cart once the order placed from it commits.
 Encapsulation: The methods ensure that only the cart owner can modify its contents, and the calculations are handled internally for security.
 
 '''
 
 import sqlite3
+from utils.database import connection, on_commit, select_in
+from utils.menu_cache import menu_cache
+from membership import active_discount_rates
 
 
-DATABASE = 'sprig.db'
+def fetch_prices(menu_item_ids):
+    """
+    Returns {menu_item_id: price} for the given ids using one IN (...) query per chunk.
+    """
+    with connection() as conn:
+        return dict(select_in(conn.cursor(), 'SELECT id, price FROM MenuItems WHERE id IN ({ids})', menu_item_ids))
 
 
 class Cart:
     def __init__(self, customer_id):
         self.customer_id = customer_id
-        self.items = []
+        self.cart_id = None
+        self.items = {}
         self.total_price = 0
-
-    def add_to_cart(self, menu_item_id, quantity):
+        self._subtotal = 0
+        self._unpriced = 0
+        self._price_version = menu_cache.version
+        # Set by the cart store for persistent carts; told about every change
+        self._store = None
+
+    def _add_line(self, item):
+        if item.priced:
+            self._subtotal += item.calculate_subtotal(item.price) if item.price is not None else 0
+        else:
+            self._unpriced += 1
+
+    def _remove_line(self, item):
+        if item.priced:
+            self._subtotal -= item.calculate_subtotal(item.price) if item.price is not None else 0
+        else:
+            self._unpriced -= 1
+
+    def add_to_cart(self, menu_item_id, quantity, price=None):
         """
         Adds an item to the cart. Checks if the item is already in the cart, and if so, updates the quantity.
+        Pass the price when the caller already knows it; otherwise it is looked up on the next total.
         """
-        for item in self.items:
-            if item.menu_item_id == menu_item_id:
-                item.quantity += quantity
-                return
-        self.items.append(
-            CartItem(None, self.customer_id, menu_item_id, quantity))
+        item = self.items.get(menu_item_id)
+        if item is not None:
+            self._remove_line(item)
+            item.quantity += quantity
+            self._add_line(item)
+        else:
+            item = CartItem(None, self.customer_id, menu_item_id, quantity, price)
+            self.items[menu_item_id] = item
+            self._add_line(item)
+        if self._store is not None:
+            self._store.mark_dirty(self, menu_item_id)
 
-    def remove_from_cart(self, cart_item_id):
+    def remove_from_cart(self, menu_item_id):
         """
-        Removes an item from the cart by its ID.
+        Removes an item from the cart by its menu item ID.
         """
-        for item in self.items:
-            if item.cart_item_id == cart_item_id:
-                self.items.remove(item)
-                return
+        item = self.items.pop(menu_item_id, None)
+        if item is not None:
+            self._remove_line(item)
+            if self._store is not None:
+                self._store.mark_dirty(self, menu_item_id)
 
-    def update_quantity(self, cart_item_id, new_quantity):
+    def update_quantity(self, menu_item_id, new_quantity):
         """
         Adjusts the quantity of a specific item in the cart.
         """
-        for item in self.items:
-            if item.cart_item_id == cart_item_id:
-                item.quantity = new_quantity
-                return
+        item = self.items.get(menu_item_id)
+        if item is not None:
+            self._remove_line(item)
+            item.quantity = new_quantity
+            self._add_line(item)
+            if self._store is not None:
+                self._store.mark_dirty(self, menu_item_id)
 
-    def calculate_total(self, membership_status):
-        """
-        Computes the total price for all items in the cart, considering membership discounts if applicable.
+    def reprice(self):
         """
-        total = 0
-        for item in self.items:
-            total += item.calculate_subtotal()
-        if membership_status == 'Gold':
-            total *= 0.9
-        elif membership_status == 'Silver':
-            total *= 0.95
-        self.total_price = total
-
-    def view_cart(self):
+        Fetches current prices for every line with one query and rebuilds the subtotal.
         """
-        Displays the current items in the cart along with their quantities and the total price.
-        """
-        for item in self.items:
-            print(f"{item.menu_item_id}: {item.quantity}")
-        print(f"Total Price: {self.total_price}")
+        # Read the version first so a price change during the lookup forces another reprice
+        version = menu_cache.version
+        prices = fetch_prices(self.items)
+        subtotal = 0
+        for item in self.items.values():
+            item.price = prices.get(item.menu_item_id)
+            item.priced = True
+            if item.price is not None:
+                subtotal += item.calculate_subtotal(item.price)
+        self._subtotal = subtotal
+        self._unpriced = 0
+        self._price_version = version
 
-    def clear_cart(self):
+    def get_subtotal(self):
         """
-        Empties all items from the cart.
+        Returns the undiscounted total, re-pricing only when a line has no price yet
+        or a menu price may have changed since the last lookup.
         """
-        self.items = []
-        self.total_price = 0
-
-
-class CartItem:
-    def __init__(self, cart_item_id, customer_id, menu_item_id, quantity):
-        self.cart_item_id = cart_item_id
-        self.customer_id = customer_id
-        self.menu_item_id = menu_item_id
-        self.quantity = quantity
+        if self._unpriced or self._price_version != menu_cache.version:
+            self.reprice()
+        return self._subtotal
 
-    def calculate_subtotal(self):
+    def calculate_total(self):
         """
-        Calculates the total price for this item based on its quantity.
+        Computes the total price for all items in the cart, considering membership discounts if applicable.
+        Returns a dict with the per-line subtotals ('lines'), 'subtotal', 'discount' and 'total'.
+        Items no longer on any menu are priced as None and contribute nothing.
+        The discount is rounded the way insert_orders rounds it, so 'total' is what the order will store.
         """
-        # Fetch the price of the menu item from the database
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT price FROM MenuItems WHERE id=?
-            ''', (self.menu_item_id,))
-            price = cursor.fetchone()[0]
-            conn.close()
-            return price * self.quantity
+            subtotal = self.get_subtotal()
+            with connection() as conn:
+                rate = active_discount_rates(conn.cursor(), [self.customer_id]).get(self.customer_id, 0)
         except sqlite3.Error as e:
-            print(f"Database error during subtotal calculation: {e}")
-            return 0
-
-'''
-Cart and CartItem
-Purpose: Manages the items that a customer intends to purchase, acting as a temporary storage before an order is placed.
-
-Attributes:
-
-cart_id: Unique identifier for each cart.
-customer_id: References the customer who owns this cart.
-items: List of CartItem objects, representing individual items in the cart.
-total_price: The cumulative price of all items in the cart.
-Methods:
+            print(f"Database error during total calculation: {e}")
+            return None
+        lines = [{'menu_item_id': item.menu_item_id, 'quantity': item.quantity, 'price': item.price,
+                  'subtotal': item.calculate_subtotal(item.price) if item.price is not None else 0}
+                 for item in self.items.values()]
+        discount = round(subtotal * rate, 2)
+        self.total_price = subtotal - discount
+        return {'lines': lines, 'subtotal': subtotal, 'discount': discount,
+                'total': self.total_price}
 
-add_item(menu_item_id, quantity): Adds an item to the cart. Checks if the item is already in the cart, and if so, updates the quantity.
-remove_item(cart_item_id): Removes an item from the cart by its ID.
-update_quantity(cart_item_id, new_quantity): Adjusts the quantity of a specific item in the cart.
-calculate_total(): Computes the total price for all items in the cart, considering membership discounts if applicable.
-view_cart(): Displays the current items in the cart along with their quantities and the total price.
-clear_cart(): Empties all items from the cart.
-Encapsulation: The methods ensure that only the cart owner can modify its contents, and the calculations are handled internally for security.
-
-'''
-
-import sqlite3
-
-
-DATABASE = 'sprig.db'
-
-
-class Cart:
-    def __init__(self, customer_id):
-        self.customer_id = customer_id
-        self.items = []
-        self.total_price = 0
-
-    def add_to_cart(self, menu_item_id, quantity):
+    def get_cart_items(self):
         """
-        Adds an item to the cart. Checks if the item is already in the cart, and if so, updates the quantity.
-        """
-        for item in self.items:
-            if item.menu_item_id == menu_item_id:
-                item.quantity += quantity
-                return
-        self.items.append(
-            CartItem(None, self.customer_id, menu_item_id, quantity))
-
-    def remove_from_cart(self, cart_item_id):
-        """
-        Removes an item from the cart by its ID.
-        """
-        for item in self.items:
-            if item.cart_item_id == cart_item_id:
-                self.items.remove(item)
-                return
-
-    def update_quantity(self, cart_item_id, new_quantity):
-        """
-        Adjusts the quantity of a specific item in the cart.
-        """
-        for item in self.items:
-            if item.cart_item_id == cart_item_id:
-                item.quantity = new_quantity
-                return
-
-    def calculate_total(self, membership_status):
-        """
-        Computes the total price for all items in the cart, considering membership discounts if applicable.
+        Returns the cart contents as (menu_item_id, quantity) pairs.
         """
-        total = 0
-        for item in self.items:
-            total += item.calculate_subtotal()
-        if membership_status == 'Gold':
-            total *= 0.9
-        elif membership_status == 'Silver':
-            total *= 0.95
-        self.total_price = total
+        return [(item.menu_item_id, item.quantity) for item in self.items.values()]
 
     def view_cart(self):
         """
         Displays the current items in the cart along with their quantities and the total price.
         """
-        for item in self.items:
+        for item in self.items.values():
             print(f"{item.menu_item_id}: {item.quantity}")
         print(f"Total Price: {self.total_price}")
 
@@ -203,30 +168,54 @@ class Cart:
         """
         Empties all items from the cart.
         """
-        self.items = []
+        self._reset()
+        if self._store is not None:
+            self._store.mark_cleared(self)
+
+    def discard(self):
+        """
+        Empties the cart for an order placed from it, once the current unit of work commits.
+        A stored cart's lines are deleted in that unit of work; call this before its other
+        writes (see CartStore.discard).
+        """
+        if self._store is not None:
+            self._store.discard(self)
+        else:
+            on_commit(self._reset)
+
+    def _reset(self):
+        self.items = {}
         self.total_price = 0
+        self._subtotal = 0
+        self._unpriced = 0
 
 
 class CartItem:
-    def __init__(self, cart_item_id, customer_id, menu_item_id, quantity):
+    __slots__ = ('cart_item_id', 'customer_id', 'menu_item_id', 'quantity', 'price', 'priced')
+
+    def __init__(self, cart_item_id, customer_id, menu_item_id, quantity, price=None):
         self.cart_item_id = cart_item_id
         self.customer_id = customer_id
         self.menu_item_id = menu_item_id
         self.quantity = quantity
+        self.price = price
+        self.priced = price is not None
 
-    def calculate_subtotal(self):
+    def calculate_subtotal(self, price=None):
         """
         Calculates the total price for this item based on its quantity.
+        Pass the price when it is already known to skip the database lookup.
         """
+        if price is not None:
+            return price * self.quantity
         # Fetch the price of the menu item from the database
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT price FROM MenuItems WHERE id=?
-            ''', (self.menu_item_id,))
-            price = cursor.fetchone()[0]
-            conn.close()
+            with connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT price FROM MenuItems WHERE id=?
+                ''', (self.menu_item_id,))
+                price = cursor.fetchone()[0]
             return price * self.quantity
         except sqlite3.Error as e:
             print(f"Database error during subtotal calculation: {e}")
@@ -5,10 +5,12 @@ Attributes:
 customer_id: Inherited from User.
 membership_status: Tracks if a customer is a member.
 Methods:
+login(): Checks the password and starts a session; the customer's session_token identifies them afterwards.
+from_session(token): Returns the customer a session token belongs to, without a password check.
 view_restaurants(): Displays available restaurants.
 view_menu(): Shows menu items from a selected restaurant.
-add_to_cart(): Adds menu items to a cart.
-place_order(): Confirms an order based on cart contents.
+add_to_cart(): Adds menu items to the customer's persistent cart.
+place_order(): Confirms an order based on cart contents and empties the cart.
 view_order_history(): Displays past orders.
 Abstraction: Hides the complexities of interacting with restaurant data.
 
@@ -17,14 +19,15 @@ Abstraction: Hides the complexities of interacting with restaurant data.
 import sqlite3
 import hashlib
 from user import *
+from user import is_taken, verify_login
 from restaurant import *
 from cart import *
 from order import *
-from utils.database import get_db_connection
+from utils.cart_store import cart_store
+from utils.database import connection, in_unit_of_work, unit_of_work
+from utils.hashing import HashingBusy, hash_password
+from utils.sessions import session_store
 from utils.validations import validate_username, validate_password, validate_name, validate_email, validate_phone_number
-import bcrypt
-
-DATABASE = 'sprig.db'
 
 
 class Customer(User):
@@ -38,48 +41,78 @@ class Customer(User):
         if not all([validate_username(username), validate_password(password),
                     validate_name(name), validate_email(email), validate_phone_number(phone)]):
             return None
+        if is_taken(username, email):
+            return None
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
         try:
-            # Create base user first
-            user = User(username, password, name, email)
-            user.register()
-            
-            # Get the user_id and create customer record
-            cursor.execute('SELECT id FROM Users WHERE username = ?', (username,))
-            user_id = cursor.fetchone()['id']
-            
-            cursor.execute('''
-                INSERT INTO Customers (id, phone_number)
-                VALUES (?, ?)
-            ''', (user_id, phone))
-            
-            conn.commit()
+            hashed_password = hash_password(password)
+            # Users and Customers rows are written in one transaction
+            with unit_of_work() as cursor:
+                user = User(username, password, name, email)
+                user_id = user.register('Customer', hashed_password)
+
+                cursor.execute('''
+                    INSERT INTO Customers (id, phone_number)
+                    VALUES (?, ?)
+                ''', (user_id, phone))
             customer = cls(user_id, username, password, name, email, phone)
             return customer
         except sqlite3.IntegrityError:
             print("Username or email already exists.")
             return None
-        finally:
-            conn.close()
+        except HashingBusy as e:
+            print(f"Signup is busy, please try again: {e}")
+            return None
 
     @classmethod
     def login(cls, username, password):
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT Users.id, Users.username, Users.password, Users.name, Users.email, Customers.phone_number
-            FROM Users
-            JOIN Customers ON Users.id = Customers.id
-            WHERE Users.username = ? AND Users.user_type = 'Customer'
-        ''', (username,))
-        user_data = cursor.fetchone()
-        conn.close()
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT Users.id, Users.username, Users.password, Users.name, Users.email, Customers.phone_number
+                FROM Users
+                JOIN Customers ON Users.id = Customers.id
+                WHERE Users.username = ? AND Users.user_type = 'Customer'
+            ''', (username,))
+            user_data = cursor.fetchone()
 
-        if user_data and bcrypt.checkpw(password.encode('utf-8'), user_data['password']):
-            return cls(user_data['id'], user_data['username'], user_data['name'], user_data['email'], user_data['phone_number'])
-        return None
+        try:
+            valid = user_data is not None and verify_login(user_data['id'], password, user_data['password'])
+        except HashingBusy as e:
+            print(f"Login is busy, please try again: {e}")
+            return None
+        if not valid:
+            return None
+        customer = cls(user_data['id'], user_data['username'], None, user_data['name'], user_data['email'],
+                       user_data['phone_number'])
+        try:
+            customer.session_token = session_store.create(customer.customer_id, 'Customer')
+        except sqlite3.Error as e:
+            print(f"Database error during login: {e}")
+            return None
+        return customer
+
+    @classmethod
+    def from_session(cls, token):
+        """
+        Returns the logged-in customer a session token belongs to, or None; no password is checked.
+        """
+        session = User.authenticate(token, 'Customer')
+        if session is None:
+            return None
+        with connection() as conn:
+            user_data = conn.execute('''
+                SELECT Users.id, Users.username, Users.name, Users.email, Customers.phone_number
+                FROM Users
+                JOIN Customers ON Users.id = Customers.id
+                WHERE Users.id = ?
+            ''', (session.user_id,)).fetchone()
+        if user_data is None:
+            return None
+        customer = cls(user_data['id'], user_data['username'], None, user_data['name'], user_data['email'],
+                       user_data['phone_number'])
+        customer.session_token = token
+        return customer
 
     def view_restaurants(self):
         """
@@ -96,38 +129,46 @@ class Customer(User):
 
     def add_to_cart(self, cart_items):
         """
-        Adds menu items to a cart.
+        Adds menu items to the customer's cart, which is kept by the cart store.
         - cart_items: list of (menu_item_id, quantity) tuples.
         """
-        cart = Cart(self.customer_id)
+        cart = cart_store.get(self.customer_id)
         for menu_item_id, quantity in cart_items:
             cart.add_to_cart(menu_item_id, quantity)
+        return cart
 
-    def place_order(self):
+    def place_order(self, cart=None):
         """
         Confirms an order based on cart contents.
+        Converting the cart into an order, and emptying a stored cart, is a single unit of work.
         """
-        cart = Cart(self.customer_id)
-        cart_items = cart.get_cart_items()
+        cart = cart if cart is not None else cart_store.get(self.customer_id)
         order = Order(None, self.customer_id, None, None)
-        return order.place_order(cart_items)
+        try:
+            with unit_of_work():
+                # First, so a cart flush in progress can finish before this transaction takes the write lock
+                cart.discard()
+                order_id = order.place_order(cart.get_cart_items())
+        except (sqlite3.Error, ValueError) as e:
+            if in_unit_of_work():
+                raise
+            print(f"Database error during checkout: {e}")
+            return None
+        return order_id
 
-    def view_order_history(self):
+    def view_order_history(self, after=None, limit=DEFAULT_PAGE_SIZE, status=None, since=None, until=None):
         """
-        Displays past orders.
+        Displays one page of past orders, newest first.
+        Pass the previous page's next_cursor as after to get the next one.
         """
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT Orders.id, Orders.order_status, Orders.order_date, Restaurants.name
-                FROM Orders
-                JOIN Restaurants ON Orders.restaurant_id=Restaurants.id
-                WHERE Orders.customer_id=?
-            ''', (self.customer_id,))
-            orders = cursor.fetchall()
-            conn.close()
-            return orders
+            with connection() as conn:
+                return fetch_order_page(conn.cursor(), '''
+                    SELECT Orders.id, Orders.order_status, Orders.order_date, Restaurants.restaurant_name,
+                           Orders.total_amount
+                    FROM Orders
+                    JOIN Restaurants ON Orders.restaurant_id=Restaurants.id
+                ''', 'customer_id', self.customer_id, after, limit, status, since, until)
         except sqlite3.Error as e:
             print(f"Database error during order history retrieval: {e}")
             return []
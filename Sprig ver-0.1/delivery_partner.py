@@ -4,107 +4,159 @@ Purpose: Manages order deliveries.
 Attributes:
 partner_id: Inherited from User.
 Methods:
+login(): Checks the password and starts a session; from_session(token) restores the partner from it.
 view_assigned_orders(): Shows orders assigned for delivery.
-update_order_status(): Updates delivery status (e.g., In Transit, Delivered).
+accept_order(): Takes an unassigned order for delivery.
+update_order_status(): Updates delivery status (e.g., In Transit, Delivered) of assigned orders only.
+time_in_states(): Average and total time this partner's deliveries spent in each status.
 view_earnings(): Shows total earnings from completed deliveries.
 Encapsulation: Hides the complexities of order management from other entities.
 
 '''
 
 import sqlite3
-import hashlib
-from user import User
-
-DATABASE = 'sprig.db'
+from user import User, is_taken
+from order import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, assign_delivery_partner, change_order_status, fetch_order_changes,
+                   fetch_order_page, time_in_states)
+from utils.availability import user_availability
+from utils.database import connection, unit_of_work
+from utils.group_commit import write
+from utils.hashing import HashingBusy, hash_password
+from utils.sessions import session_store
 
 
 class DeliveryPartner(User):
     @classmethod
     def signup(cls, username, password, name, vehicle_type, license_number):
+        if is_taken(username, f"{username}@sprig.com"):
+            return None
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO Users (username, password, name, email, user_type)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (username, hashlib.sha256(password.encode()).hexdigest(), name, f"{username}@sprig.com", 'DeliveryPartner'))
-            user_id = cursor.lastrowid
-            cursor.execute('''
-                INSERT INTO DeliveryPartners (id, vehicle_type, license_number)
-                VALUES (?, ?, ?)
-            ''', (user_id, vehicle_type, license_number))
-            conn.commit()
-            delivery_partner = cls(
-                user_id, username, password, name, vehicle_type, license_number)
-            conn.close()
+            hashed_password = hash_password(password)
+            with unit_of_work() as cursor:
+                cursor.execute('''
+                    INSERT INTO Users (username, password, name, email, user_type)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (username, hashed_password, name, f"{username}@sprig.com", 'DeliveryPartner'))
+                user_id = cursor.lastrowid
+                user_availability.add(username, f"{username}@sprig.com")
+                cursor.execute('''
+                    INSERT INTO DeliveryPartners (id, vehicle_type, license_number)
+                    VALUES (?, ?, ?)
+                ''', (user_id, vehicle_type, license_number))
+            delivery_partner = cls(username, password, user_id)
             return delivery_partner
         except sqlite3.Error as e:
             print(f"Database error during delivery partner signup: {e}")
             return None
+        except HashingBusy as e:
+            print(f"Signup is busy, please try again: {e}")
+            return None
 
     @classmethod
     def login(cls, username, password):
         try:
             # First verify user credentials using parent User class
-            hashed_password = hashlib.sha256(password.encode()).hexdigest()
-            user = User.login(username, hashed_password)
+            user = User.login(username, password)
             
             if user:
-                conn = sqlite3.connect(DATABASE)
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT dp.* 
-                    FROM DeliveryPartners dp
-                    JOIN Users u ON u.id = dp.id
-                    WHERE u.username = ? AND u.user_type = 'DeliveryPartner'
-                ''', (username,))
-                partner = cursor.fetchone()
-                conn.close()
+                with connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        SELECT dp.* 
+                        FROM DeliveryPartners dp
+                        JOIN Users u ON u.id = dp.id
+                        WHERE u.username = ? AND u.user_type = 'DeliveryPartner'
+                    ''', (username,))
+                    partner = cursor.fetchone()
                 
                 if partner:
-                    return cls(username, password, partner[0])
+                    delivery_partner = cls(username, password, partner[0])
+                    delivery_partner.session_token = user['session_token']
+                    return delivery_partner
+                # Not a delivery partner, so the session User.login started is not needed
+                session_store.revoke(user['session_token'])
             return None
         except sqlite3.Error as e:
             print(f"Database error during login: {e}")
             return None
 
+    @classmethod
+    def from_session(cls, token):
+        """
+        Returns the logged-in delivery partner a session token belongs to, or None; no password is checked.
+        """
+        session = User.authenticate(token, 'DeliveryPartner')
+        if session is None:
+            return None
+        with connection() as conn:
+            partner = conn.execute('''
+                SELECT u.username, dp.id
+                FROM DeliveryPartners dp
+                JOIN Users u ON u.id = dp.id
+                WHERE dp.id = ?
+            ''', (session.user_id,)).fetchone()
+        if partner is None:
+            return None
+        delivery_partner = cls(partner['username'], None, partner['id'])
+        delivery_partner.session_token = token
+        return delivery_partner
+
     def __init__(self, username, password, partner_id):
-        super().__init__(username, password)
+        super().__init__(username, password, None, None)
         self.partner_id = partner_id
 
-    def view_assigned_orders(self):
+    def view_assigned_orders(self, after=None, limit=DEFAULT_PAGE_SIZE, status=None, since=None, until=None):
         """
-        Shows orders assigned for delivery.
+        Shows one page of orders assigned for delivery, newest first.
+        Pass the previous page's next_cursor as after to get the next one.
         """
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT Orders.id, Orders.order_status, Orders.order_date, Restaurants.restaurant_name
-                FROM Orders
-                JOIN Restaurants ON Orders.restaurant_id = Restaurants.id
-                WHERE Orders.delivery_partner_id=?
-            ''', (self.partner_id,))
-            orders = cursor.fetchall()
-            conn.close()
-            return orders
+            with connection() as conn:
+                return fetch_order_page(conn.cursor(), '''
+                    SELECT Orders.id, Orders.order_status, Orders.order_date, Restaurants.restaurant_name
+                    FROM Orders
+                    JOIN Restaurants ON Orders.restaurant_id = Restaurants.id
+                ''', 'delivery_partner_id', self.partner_id, after, limit, status, since, until)
         except sqlite3.Error as e:
             print(f"Database error during order retrieval: {e}")
             return None
 
+    def view_assigned_order_changes(self, watermark=0, limit=MAX_PAGE_SIZE):
+        """
+        Shows orders assigned for delivery or changed since watermark, for refreshing
+        a screen without reloading every order. Pass the result's watermark next time.
+        """
+        try:
+            with connection() as conn:
+                return fetch_order_changes(conn.cursor(), '''
+                    SELECT Orders.id, Orders.order_status, Orders.order_date, Restaurants.restaurant_name,
+                           Orders.change_seq
+                    FROM Orders
+                    JOIN Restaurants ON Orders.restaurant_id = Restaurants.id
+                ''', 'delivery_partner_id', self.partner_id, watermark, limit)
+        except sqlite3.Error as e:
+            print(f"Database error during order retrieval: {e}")
+            return None
+
+    def accept_order(self, order_id):
+        """
+        Takes an unassigned order for delivery; returns False if another partner already has it.
+        """
+        try:
+            return write(assign_delivery_partner, order_id, self.partner_id)
+        except sqlite3.Error as e:
+            print(f"Database error during order assignment: {e}")
+            return False
+
     def update_order_status(self, order_id, status):
         """
         Updates delivery status (e.g., In Transit, Delivered).
+        Returns True if this update won; False if the order is not assigned to this partner,
+        the transition is not allowed, or another update changed the order first.
         """
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE Orders SET order_status=? WHERE id=?
-            ''', (status, order_id))
-            conn.commit()
-            conn.close()
-            return True
+            return write(change_order_status, order_id, status, None, 'delivery',
+                         'delivery_partner_id', self.partner_id)
         except sqlite3.Error as e:
             print(f"Database error during order status update: {e}")
             return False
@@ -114,14 +166,27 @@ class DeliveryPartner(User):
         Shows total earnings from completed deliveries.
         """
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT SUM(amount) FROM Payments WHERE delivery_partner_id=?
-            ''', (self.partner_id,))
-            earnings = cursor.fetchone()[0]
-            conn.close()
+            with connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT SUM(Payments.amount) FROM Payments
+                    JOIN Orders ON Orders.id = Payments.order_id
+                    WHERE Orders.delivery_partner_id=? AND Orders.order_status='Delivered'
+                      AND Payments.payment_status='Completed'
+                ''', (self.partner_id,))
+                earnings = cursor.fetchone()[0]
             return earnings
         except sqlite3.Error as e:
             print(f"Database error during earnings retrieval: {e}")
             return None
+
+    def time_in_states(self):
+        """
+        Average and total time this partner's deliveries spent in each status.
+        Returns {status: {'orders', 'total_ms', 'avg_ms', 'max_ms'}}.
+        """
+        try:
+            return time_in_states('delivery_partner_id', self.partner_id)
+        except sqlite3.Error as e:
+            print(f"Database error during order history retrieval: {e}")
+            return {}
@@ -22,14 +22,19 @@ from utils.validations import (
     validate_name, validate_price, validate_description, validate_status,
     validate_email, validate_phone_number
 )
-from utils.database import initialize_database, get_db_connection
-
-DATABASE = 'sprig.db'
+from utils.availability import user_availability
+from utils.database import initialize_database
+from utils.cart_store import cart_store
+from utils.hashing import password_hasher
+from utils.menu_cache import menu_cache
 
 
 def main():
     try:
         initialize_database()  # Move initialization here
+        menu_cache.warm_up()
+        user_availability.rebuild()
+        password_hasher.calibrate()
         print("Welcome to Sprig!")
         while True:
             print("1. Customer")
@@ -110,6 +115,7 @@ def customer_menu(customer):
         view_order_history(customer)
     elif choice == "6":
         print("Logging out...")
+        customer.logout()
     else:
         print("Invalid choice. Please try again.")
         customer_menu(customer)
@@ -140,11 +146,10 @@ def view_menu(customer):
 
 
 def add_to_cart(customer):
-    cart = Cart(customer.customer_id)
     menu_item_id = input("Enter menu item ID: ")
     quantity = input("Enter quantity: ")
-    if validate_id(menu_item_id) and validate_quantity(quantity):
-        cart.add_to_cart(menu_item_id, quantity)
+    if validate_id(menu_item_id)[0] and validate_quantity(quantity)[0]:
+        customer.add_to_cart([(int(menu_item_id), int(quantity))])
         print("Item added to cart.")
     else:
         print("Invalid input. Please try again.")
@@ -152,11 +157,9 @@ def add_to_cart(customer):
 
 
 def place_order(customer):
-    cart = Cart(customer.customer_id)
-    cart_items = cart.get_cart_items()
-    if cart_items:
-        order = Order(None, customer.customer_id, None, None)
-        order_id = order.place_order(cart_items)
+    cart = cart_store.get(customer.customer_id)
+    if cart.get_cart_items():
+        order_id = customer.place_order(cart)
         if order_id:
             print(f"Order placed successfully! Order ID: {order_id}")
         else:
@@ -167,7 +170,7 @@ def place_order(customer):
 
 
 def view_order_history(customer):
-    orders = Order.get_order_history(customer.customer_id)
+    orders = customer.view_order_history()
     if orders:
         print("Order History:")
         for order in orders:
@@ -208,6 +211,7 @@ def restaurant_partner_menu(restaurant_partner):
         view_orders(restaurant_partner)
     elif choice == "4":
         print("Logging out...")
+        restaurant_partner.logout()
     else:
         print("Invalid choice. Please try again.")
         restaurant_partner_menu(restaurant_partner)
@@ -282,6 +286,7 @@ def delivery_partner_menu(delivery_partner):
         view_earnings(delivery_partner)
     elif choice == "4":
         print("Logging out...")
+        delivery_partner.logout()
     else:
         print("Invalid choice. Please try again.")
         delivery_partner_menu(delivery_partner)
@@ -419,5 +424,6 @@ def delivery_partner_flow():
                 delivery_partner_menu(partner)
 
 
+# Keep this guard: password hashing workers re-import the main module (utils/hashing.py)
 if __name__ == "__main__":
     main()
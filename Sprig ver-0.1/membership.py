@@ -7,59 +7,26 @@ discount_rate: Discount applicable for orders.
 Methods:
 apply_discount(): Applies a membership discount to an order.
 check_membership_status(): Verifies if a customer is a member.
+active_discount_rates(cursor, customer_ids): The discount rates of active memberships, used for
+both the cart total and the discount stored on an order.
 Abstraction: Encapsulates the details of discount logic.
 
 '''
 
 import sqlite3
+from utils.database import connection, select_in
 
-DATABASE = 'sprig.db'
 
-
-class Membership:
-    def __init__(self, customer_id, discount_rate):
-        self.customer_id = customer_id
-        self.discount_rate = discount_rate
-
-    def apply_discount(self, order_total):
-        """
-        Applies a membership discount to an order.
-        """
-        return order_total * (1 - self.discount_rate)
-
-    def check_membership_status(self):
-        """
-        Verifies if a customer is a member.
-        """
-        try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT membership_status FROM Customers WHERE id=?
-            ''', (self.customer_id,))
-            status = cursor.fetchone()[0]
-            conn.close()
-            return status
-        except sqlite3.Error as e:
-            print(f"Database error during membership status check: {e}")
-            return None
-
-'''
-Membership
-Purpose: Manages the membership features for customers.
-Attributes:
-customer_id: ID of the member.
-discount_rate: Discount applicable for orders.
-Methods:
-apply_discount(): Applies a membership discount to an order.
-check_membership_status(): Verifies if a customer is a member.
-Abstraction: Encapsulates the details of discount logic.
-
-'''
-
-import sqlite3
-
-DATABASE = 'sprig.db'
+def active_discount_rates(cursor, customer_ids):
+    """
+    Returns {customer_id: discount_rate} for the customers with an unexpired membership,
+    taking the best rate when a customer has several. Customers without one are left out.
+    """
+    return dict(select_in(cursor, """
+        SELECT customer_id, MAX(discount_rate) FROM Membership
+        WHERE customer_id IN ({ids}) AND expiry_date >= date('now')
+        GROUP BY customer_id
+    """, customer_ids))
 
 
 class Membership:
@@ -76,15 +43,16 @@ class Membership:
     def check_membership_status(self):
         """
         Verifies if a customer is a member.
+        Returns the type of the customer's best active membership, or None if there is none.
         """
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT membership_status FROM Customers WHERE id=?
-            ''', (self.customer_id,))
-            status = cursor.fetchone()[0]
-            conn.close()
+            with connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT membership_type, MAX(discount_rate) FROM Membership
+                    WHERE customer_id=? AND expiry_date >= date('now')
+                ''', (self.customer_id,))
+                status = cursor.fetchone()[0]
             return status
         except sqlite3.Error as e:
             print(f"Database error during membership status check: {e}")
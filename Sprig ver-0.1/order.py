@@ -14,17 +14,432 @@ items: List of OrderItem objects, representing the items within the order.
 Methods:
 
 place_order(cart): Creates a new order using items from a given cart, calculates the total, and saves the order in the database.
+place_orders(carts): Places many orders at once in a single transaction, e.g. for replays and imports.
 update_order_status(new_status): Updates the status of an order (e.g., from "Pending" to "Preparing").
+Status changes follow ORDER_TRANSITIONS and are compare-and-swap updates, so of two racing updates only one wins.
+change_order_statuses() applies one transition to a batch of orders in a single statement per 500 orders.
 get_order_details(): Retrieves the details of a specific order, including items, status, and delivery information.
+load_order_details(order_ids): Loads a batch of orders with their items, payment and delivery partner in a fixed number of queries.
 cancel_order(): Cancels an order if it’s in an allowable state, such as "Pending."
 track_order(): Provides real-time status updates on the order’s progress.
+get_status_history(): Lists every status change of the order from the OrderEvents log.
+subscribe(): Streams the order's status changes as they are committed, instead of polling track_order().
+time_in_states(): Reports how long the order spent in each status.
+Every status change appends to OrderEvents in the same transaction; Orders.order_status is the
+current-status projection of that log, so tracking an order stays a single primary-key read.
 Encapsulation: Methods like place_order() ensure that orders are created through a controlled process, protecting the order data's integrity.
 
 '''
 
 import sqlite3
+import time
+from utils.database import connection, in_chunks, in_unit_of_work, on_commit, select_in, unit_of_work
+from utils.group_commit import write
+from utils.order_hub import order_hub
+from membership import active_discount_rates
+
+
+def insert_orders(cursor, orders):
+    """
+    Inserts orders and their items on the given cursor and returns the new order ids.
+    - orders: list of (customer_id, restaurant_id, cart_items) where cart_items are
+      (menu_item_id, quantity) pairs; restaurant_id may be None to take it from the items.
+    Prices are captured per line at order time, the discount comes from the customer's
+    active membership, and the total is stored on the order. Everything is written with
+    one executemany per table, so a thousand orders cost a handful of statements.
+    """
+    menu_item_ids = {menu_item_id for _, _, cart_items in orders for menu_item_id, _ in cart_items}
+    menu = {row[0]: (row[1], row[2]) for row in select_in(
+        cursor, 'SELECT id, restaurant_id, price FROM MenuItems WHERE id IN ({ids})', menu_item_ids)}
+    discount_rates = active_discount_rates(cursor, [customer_id for customer_id, _, _ in orders])
+
+    order_rows, item_rows = [], []
+    for customer_id, restaurant_id, cart_items in orders:
+        if not cart_items:
+            raise ValueError(f"Order for customer {customer_id} has no items")
+        lines = []
+        for menu_item_id, quantity in cart_items:
+            if menu_item_id not in menu:
+                raise ValueError(f"Menu item {menu_item_id} does not exist")
+            item_restaurant_id, price = menu[menu_item_id]
+            if restaurant_id is None:
+                restaurant_id = item_restaurant_id
+            elif item_restaurant_id != restaurant_id:
+                raise ValueError(f"Menu item {menu_item_id} is not from restaurant {restaurant_id}")
+            lines.append((menu_item_id, quantity, price))
+        subtotal = sum(quantity * price for _, quantity, price in lines)
+        discount = round(subtotal * discount_rates.get(customer_id, 0), 2)
+        order_rows.append((customer_id, restaurant_id, 'Pending', discount, subtotal - discount))
+        item_rows.append(lines)
+
+    now = now_ms()
+    # Take a block of change sequence values at once instead of one trigger update per order
+    last_seq = cursor.execute(
+        "UPDATE Counters SET value = value + ? WHERE name='orders' RETURNING value", (len(order_rows),)).fetchone()[0]
+    first_seq = last_seq - len(order_rows) + 1
+    cursor.executemany("""
+        INSERT INTO Orders (customer_id, restaurant_id, order_status, order_date, membership_discount,
+                            total_amount, status_seq, status_changed_at, change_seq)
+        VALUES (?, ?, ?, datetime('now'), ?, ?, 1, ?, ?)
+    """, [row + (now, first_seq + n) for n, row in enumerate(order_rows)])
+    # The inserts above hold the write lock, so their AUTOINCREMENT ids are consecutive
+    last_id = cursor.execute('SELECT last_insert_rowid()').fetchone()[0]
+    order_ids = list(range(last_id - len(order_rows) + 1, last_id + 1))
+    cursor.executemany("""
+        INSERT INTO OrderItems (order_id, menu_item_id, quantity, price)
+        VALUES (?, ?, ?, ?)
+    """, [(order_id, menu_item_id, quantity, price)
+          for order_id, lines in zip(order_ids, item_rows)
+          for menu_item_id, quantity, price in lines])
+    cursor.executemany("""
+        INSERT INTO OrderEvents (order_id, seq, from_status, to_status, actor, created_at)
+        VALUES (?, 1, NULL, 'Pending', 'customer', ?)
+    """, [(order_id, now) for order_id in order_ids])
+
+    def publish_placed():
+        for order_id in order_ids:
+            order_hub.publish({'order_id': order_id, 'seq': 1, 'from_status': None, 'to_status': 'Pending',
+                               'actor': 'customer', 'created_at': now})
+
+    on_commit(publish_placed)
+    return order_ids
+
+
+def insert_order(cursor, customer_id, restaurant_id, cart_items):
+    """
+    Inserts an order and its items on the given cursor and returns the new order id.
+    """
+    return insert_orders(cursor, [(customer_id, restaurant_id, list(cart_items))])[0]
+
+
+def refresh_order_total(cursor, order_id):
+    """
+    Recomputes an order's total from its lines after they change, keeping the discount proportional.
+    """
+    row = cursor.execute(
+        'SELECT total_amount, membership_discount FROM Orders WHERE id=?', (order_id,)).fetchone()
+    if row is None:
+        return
+    total, discount = row[0] or 0, row[1] or 0
+    subtotal = cursor.execute(
+        'SELECT coalesce(SUM(price * quantity), 0) FROM OrderItems WHERE order_id=?', (order_id,)).fetchone()[0]
+    discount = round(discount * subtotal / (total + discount), 2) if total + discount else 0
+    cursor.execute('UPDATE Orders SET membership_discount=?, total_amount=? WHERE id=?',
+                   (discount, subtotal - discount, order_id))
+
+
+# Allowed status changes and who may make them. Delivered and Cancelled are final.
+ORDER_TRANSITIONS = {
+    ('Pending', 'Preparing'): {'restaurant'},
+    ('Pending', 'Cancelled'): {'customer', 'restaurant'},
+    ('Preparing', 'Out for Delivery'): {'restaurant', 'delivery'},
+    ('Preparing', 'Cancelled'): {'restaurant'},
+    ('Out for Delivery', 'Delivered'): {'delivery'},
+}
+# Columns an actor's updates are scoped by
+STATUS_SCOPES = ('restaurant_id', 'delivery_partner_id')
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def can_transition(from_status, to_status, actor=None):
+    """
+    Returns whether an order may move from from_status to to_status; actor None means any actor.
+    """
+    actors = ORDER_TRANSITIONS.get((from_status, to_status))
+    return actors is not None and (actor is None or actor in actors)
+
+
+def change_order_status(cursor, order_id, to_status, from_status=None, actor=None, scope=None, scope_id=None):
+    """
+    Moves an order to to_status with a compare-and-swap on its current status and returns
+    True only if this call made the change. When from_status is None the current status is
+    read first. scope ('restaurant_id' or 'delivery_partner_id') restricts the update to
+    orders belonging to scope_id. A successful change appends its OrderEvents row on the
+    same cursor, so the event commits or rolls back with the status.
+    """
+    where, params = 'id=?', [order_id]
+    if scope is not None:
+        if scope not in STATUS_SCOPES:
+            raise ValueError(f"Unknown order scope {scope}")
+        where += f" AND {scope}=?"
+        params.append(scope_id)
+    if from_status is None:
+        row = cursor.execute(f"SELECT order_status FROM Orders WHERE {where}", params).fetchone()
+        if row is None:
+            return False
+        from_status = row[0]
+    if not can_transition(from_status, to_status, actor):
+        return False
+    now = now_ms()
+    row = cursor.execute(f"""
+        UPDATE Orders SET order_status=?, status_seq=status_seq + 1, status_changed_at=?
+        WHERE {where} AND order_status=?
+        RETURNING status_seq
+    """, [to_status, now, *params, from_status]).fetchone()
+    if row is None:
+        return False
+    event = {'order_id': order_id, 'seq': row[0], 'from_status': from_status, 'to_status': to_status,
+             'actor': actor, 'created_at': now}
+    cursor.execute('''
+        INSERT INTO OrderEvents (order_id, seq, from_status, to_status, actor, created_at)
+        VALUES (:order_id, :seq, :from_status, :to_status, :actor, :created_at)
+    ''', event)
+    on_commit(lambda: order_hub.publish(event))
+    return True
+
+
+def change_order_statuses(cursor, order_ids, from_status, to_status, actor=None, scope=None, scope_id=None):
+    """
+    Moves every listed order that is still in from_status to to_status, with one
+    compare-and-swap UPDATE and one event insert per LOOKUP_CHUNK orders instead of a
+    round trip per order. Returns {order_id: True if this call changed it}; scope works
+    as in change_order_status.
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    results = dict.fromkeys(order_ids, False)
+    if not can_transition(from_status, to_status, actor):
+        return results
+    where, params = '', []
+    if scope is not None:
+        if scope not in STATUS_SCOPES:
+            raise ValueError(f"Unknown order scope {scope}")
+        where, params = f" AND {scope}=?", [scope_id]
+    now = now_ms()
+    events = []
+    for chunk, placeholders in in_chunks(order_ids):
+        cursor.execute(f"""
+            UPDATE Orders SET order_status=?, status_seq=status_seq + 1, status_changed_at=?
+            WHERE id IN ({placeholders}){where} AND order_status=?
+            RETURNING id, status_seq
+        """, [to_status, now, *chunk, *params, from_status])
+        events.extend({'order_id': order_id, 'seq': seq, 'from_status': from_status, 'to_status': to_status,
+                       'actor': actor, 'created_at': now} for order_id, seq in cursor.fetchall())
+    cursor.executemany('''
+        INSERT INTO OrderEvents (order_id, seq, from_status, to_status, actor, created_at)
+        VALUES (:order_id, :seq, :from_status, :to_status, :actor, :created_at)
+    ''', events)
+    for event in events:
+        results[event['order_id']] = True
+
+    def publish_changed():
+        for event in events:
+            order_hub.publish(event)
+
+    on_commit(publish_changed)
+    return results
+
+
+MAX_PAGE_SIZE = 100
+DEFAULT_PAGE_SIZE = 20
+
+
+class OrderPage(list):
+    """
+    One page of orders, newest first. next_cursor is the (order_date, id) to pass as
+    after= for the following page, or None on the last page.
+    """
+
+    def __init__(self, rows, next_cursor):
+        super().__init__(rows)
+        self.next_cursor = next_cursor
+
+
+def fetch_order_page(cursor, select, scope, scope_id, after=None, limit=DEFAULT_PAGE_SIZE,
+                     status=None, since=None, until=None):
+    """
+    Runs select (a SELECT ... FROM Orders [JOIN ...] returning Orders.id and Orders.order_date)
+    for the orders whose scope column equals scope_id, newest first, one page at a time.
+    Pages are keyed on (order_date, id) rather than OFFSET, so with the (scope, order_date)
+    indexes every page costs the same however deep it is.
+    - status: one status or a list of statuses to keep.
+    - since/until: order_date range, inclusive start and exclusive end.
+    """
+    if scope not in ('customer_id',) + STATUS_SCOPES:
+        raise ValueError(f"Unknown order scope {scope}")
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    where, params = [f"Orders.{scope}=?"], [scope_id]
+    if status is not None:
+        statuses = [status] if isinstance(status, str) else list(status)
+        where.append(f"Orders.order_status IN ({', '.join('?' * len(statuses))})")
+        params.extend(statuses)
+    if since is not None:
+        where.append('Orders.order_date >= ?')
+        params.append(since)
+    if until is not None:
+        where.append('Orders.order_date < ?')
+        params.append(until)
+    if after is not None:
+        where.append('(Orders.order_date, Orders.id) < (?, ?)')
+        params.extend(after)
+    cursor.execute(f"""
+        {select}
+        WHERE {' AND '.join(where)}
+        ORDER BY Orders.order_date DESC, Orders.id DESC
+        LIMIT ?
+    """, [*params, limit + 1])
+    rows = cursor.fetchall()
+    if len(rows) <= limit:
+        return OrderPage(rows, None)
+    rows = rows[:limit]
+    return OrderPage(rows, (rows[-1]['order_date'], rows[-1]['id']))
+
+
+class OrderChanges(list):
+    """
+    Orders inserted or changed after a watermark, oldest change first. watermark is the
+    value to pass next time; has_more is True when the limit cut the batch short.
+    """
+
+    def __init__(self, rows, watermark, has_more):
+        super().__init__(rows)
+        self.watermark = watermark
+        self.has_more = has_more
+
+
+def order_watermark(cursor):
+    """
+    Returns the current order change sequence; read it before a full load, then poll from it.
+    """
+    row = cursor.execute("SELECT value FROM Counters WHERE name='orders'").fetchone()
+    return row[0] if row else 0
+
+
+def fetch_order_changes(cursor, select, scope, scope_id, watermark=0, limit=MAX_PAGE_SIZE):
+    """
+    Runs select (a SELECT ... FROM Orders [JOIN ...] returning Orders.change_seq) for the
+    orders whose scope column equals scope_id and whose change_seq is above watermark.
+    Triggers on Orders give every insert and update a new change_seq, so with the
+    (scope, change_seq) indexes a refresh reads only what changed since the last one.
+    """
+    if scope not in STATUS_SCOPES:
+        raise ValueError(f"Unknown order scope {scope}")
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    cursor.execute(f"""
+        {select}
+        WHERE Orders.{scope}=? AND Orders.change_seq > ?
+        ORDER BY Orders.change_seq
+        LIMIT ?
+    """, (scope_id, watermark, limit + 1))
+    rows = cursor.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return OrderChanges(rows, rows[-1]['change_seq'] if rows else watermark, has_more)
+
+
+class OrderLine:
+    """
+    One line of a loaded order, priced as it was ordered.
+    """
+
+    __slots__ = ('menu_item_id', 'item_name', 'quantity', 'price')
+
+    def __init__(self, menu_item_id, item_name, quantity, price):
+        self.menu_item_id = menu_item_id
+        self.item_name = item_name
+        self.quantity = quantity
+        self.price = price
+
+
+class OrderDetails:
+    """
+    An order's header, lines, latest payment and delivery assignment, as loaded by load_order_details.
+    """
+
+    __slots__ = ('order_id', 'customer_id', 'restaurant_id', 'restaurant_name', 'status', 'order_date',
+                 'membership_discount', 'total_amount', 'delivery_partner_id', 'delivery_partner_name',
+                 'payment_method', 'payment_status', 'payment_amount', 'items')
+
+    def __init__(self, row):
+        (self.order_id, self.customer_id, self.restaurant_id, self.restaurant_name, self.status,
+         self.order_date, self.membership_discount, self.total_amount, self.delivery_partner_id,
+         self.delivery_partner_name) = row
+        self.payment_method = self.payment_status = self.payment_amount = None
+        self.items = []
+
+
+def load_order_details(order_ids):
+    """
+    Loads many orders with their lines, item names, latest payment and delivery partner in
+    three queries per LOOKUP_CHUNK orders, however many lines each has.
+    Returns OrderDetails in the order of order_ids; unknown ids are left out.
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    with connection() as conn:
+        cursor = conn.cursor()
+        orders = {row[0]: OrderDetails(row) for row in select_in(cursor, """
+            SELECT Orders.id, Orders.customer_id, Orders.restaurant_id, Restaurants.restaurant_name,
+                   Orders.order_status, Orders.order_date, Orders.membership_discount, Orders.total_amount,
+                   Orders.delivery_partner_id, Users.name
+            FROM Orders
+            JOIN Restaurants ON Restaurants.id = Orders.restaurant_id
+            LEFT JOIN Users ON Users.id = Orders.delivery_partner_id
+            WHERE Orders.id IN ({ids})
+        """, order_ids)}
+        for order_id, menu_item_id, item_name, quantity, price in select_in(cursor, """
+            SELECT OrderItems.order_id, OrderItems.menu_item_id, MenuItems.item_name, OrderItems.quantity,
+                   OrderItems.price
+            FROM OrderItems
+            JOIN MenuItems ON MenuItems.id = OrderItems.menu_item_id
+            WHERE OrderItems.order_id IN ({ids})
+            ORDER BY OrderItems.order_id, OrderItems.id
+        """, orders):
+            orders[order_id].items.append(OrderLine(menu_item_id, item_name, quantity, price))
+        # Rows come oldest first, so each order ends up with its latest payment
+        for order_id, method, status, amount in select_in(cursor, """
+            SELECT order_id, payment_method, payment_status, amount FROM Payments
+            WHERE order_id IN ({ids})
+            ORDER BY order_id, id
+        """, orders):
+            details = orders[order_id]
+            details.payment_method, details.payment_status, details.payment_amount = method, status, amount
+    return [orders[order_id] for order_id in order_ids if order_id in orders]
+
+
+# Time spent in each status: until the next event, or until now for an order still in a
+# non-final status. Time in Delivered or Cancelled is not counted.
+STATE_DURATIONS = '''
+    SELECT to_status, COUNT(*), SUM(duration), AVG(duration), MAX(duration)
+    FROM (
+        SELECT OrderEvents.to_status,
+               coalesce(LEAD(OrderEvents.created_at) OVER (PARTITION BY OrderEvents.order_id
+                                                           ORDER BY OrderEvents.seq),
+                        CASE WHEN OrderEvents.to_status IN ('Delivered', 'Cancelled') THEN NULL ELSE ? END)
+               - OrderEvents.created_at AS duration
+        FROM Orders
+        JOIN OrderEvents ON OrderEvents.order_id = Orders.id
+        WHERE Orders.{column}=?
+    )
+    WHERE duration IS NOT NULL
+    GROUP BY to_status
+'''
 
-DATABASE = 'sprig.db'
+
+def time_in_states(column, value):
+    """
+    Returns {status: {'orders', 'total_ms', 'avg_ms', 'max_ms'}} over the orders whose
+    column ('id', 'restaurant_id' or 'delivery_partner_id') equals value.
+    """
+    if column not in ('id',) + STATUS_SCOPES:
+        raise ValueError(f"Unknown order scope {column}")
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(STATE_DURATIONS.format(column=column), (now_ms(), value))
+        return {status: {'orders': count, 'total_ms': total, 'avg_ms': average, 'max_ms': longest}
+                for status, count, total, average, longest in cursor.fetchall()}
+
+
+def assign_delivery_partner(cursor, order_id, delivery_partner_id):
+    """
+    Assigns an unassigned, not yet finished order to a delivery partner; True if this call won it.
+    """
+    cursor.execute('''
+        UPDATE Orders SET delivery_partner_id=?
+        WHERE id=? AND delivery_partner_id IS NULL AND order_status IN ('Pending', 'Preparing')
+    ''', (delivery_partner_id, order_id))
+    return cursor.rowcount == 1
 
 
 class Order:
@@ -39,38 +454,48 @@ class Order:
         Creates a new order using items from a given cart, calculates the total, and saves the order in the database.
         """
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO Orders (customer_id, restaurant_id, order_status)
-                VALUES (?, ?, ?)
-            ''', (self.customer_id, self.restaurant_id, 'Pending'))
-            order_id = cursor.lastrowid
-            for menu_item_id, quantity in cart_items:
-                cursor.execute('''
-                    INSERT INTO OrderItems (order_id, menu_item_id, quantity)
-                    VALUES (?, ?, ?)
-                ''', (order_id, menu_item_id, quantity))
-            conn.commit()
-            conn.close()
-            return order_id
-        except sqlite3.Error as e:
+            return write(insert_order, self.customer_id, self.restaurant_id, list(cart_items))
+        except (sqlite3.Error, ValueError) as e:
+            if in_unit_of_work():
+                raise
             print(f"Database error during order placement: {e}")
             return None
 
+    @staticmethod
+    def place_orders(carts):
+        """
+        Places one order per cart in a single transaction and returns the new order ids.
+        - carts: Cart objects, or (customer_id, cart_items) pairs.
+        If any cart is invalid nothing is written.
+        """
+        orders = []
+        for cart in carts:
+            if isinstance(cart, tuple):
+                customer_id, cart_items = cart
+            else:
+                customer_id, cart_items = cart.customer_id, cart.get_cart_items()
+            orders.append((customer_id, None, list(cart_items)))
+        if not orders:
+            return []
+        try:
+            with unit_of_work() as cursor:
+                return insert_orders(cursor, orders)
+        except (sqlite3.Error, ValueError) as e:
+            if in_unit_of_work():
+                raise
+            print(f"Database error during bulk order placement: {e}")
+            return None
+
     def update_order_status(self, new_status):
         """
         Updates the status of an order (e.g., from "Pending" to "Preparing").
+        Returns True if the transition is allowed and no concurrent update got there first.
         """
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE Orders SET order_status=? WHERE id=?
-            ''', (new_status, self.order_id))
-            conn.commit()
-            conn.close()
-            return True
+            changed = write(change_order_status, self.order_id, new_status, self.status)
+            if changed:
+                self.status = new_status
+            return changed
         except sqlite3.Error as e:
             print(f"Database error during order status update: {e}")
             return False
@@ -80,19 +505,18 @@ class Order:
         Retrieves the details of a specific order, including items, status, and delivery information.
         """
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT OrderItems.menu_item_id, OrderItems.quantity, MenuItems.item_name
-                FROM OrderItems
-                JOIN MenuItems ON OrderItems.menu_item_id = MenuItems.id
-                WHERE OrderItems.order_id=?
-            ''', (self.order_id,))
-            items = cursor.fetchall()
-            cursor.execute(
-                'SELECT order_status FROM Orders WHERE id=?', (self.order_id,))
-            status = cursor.fetchone()[0]
-            conn.close()
+            with connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT OrderItems.menu_item_id, OrderItems.quantity, MenuItems.item_name
+                    FROM OrderItems
+                    JOIN MenuItems ON OrderItems.menu_item_id = MenuItems.id
+                    WHERE OrderItems.order_id=?
+                ''', (self.order_id,))
+                items = cursor.fetchall()
+                cursor.execute(
+                    'SELECT order_status FROM Orders WHERE id=?', (self.order_id,))
+                status = cursor.fetchone()[0]
             return items, status
 
         except sqlite3.Error as e:
@@ -103,9 +527,13 @@ class Order:
         """
         Cancels an order if it's in an allowable state, such as "Pending."
         """
-        if self.status == 'Pending':
-            return self.update_order_status('Cancelled')
-        else:
+        try:
+            changed = write(change_order_status, self.order_id, 'Cancelled', self.status, 'customer')
+            if changed:
+                self.status = 'Cancelled'
+            return changed
+        except sqlite3.Error as e:
+            print(f"Database error during order cancellation: {e}")
             return False
 
     def track_order(self):
@@ -113,184 +541,49 @@ class Order:
         Provides real-time status updates on the order's progress.
         """
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute(
-                'SELECT order_status FROM Orders WHERE id=?', (self.order_id,))
-            status = cursor.fetchone()[0]
-            conn.close()
+            with connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    'SELECT order_status FROM Orders WHERE id=?', (self.order_id,))
+                status = cursor.fetchone()[0]
             return status
         except sqlite3.Error as e:
             print(f"Database error during order tracking: {e}")
             return None
 
-
-class OrderItem:
-    def __init__(self, order_item_id, order_id, menu_item_id, quantity):
-        self.order_item_id = order_item_id
-        self.order_id = order_id
-        self.menu_item_id = menu_item_id
-        self.quantity = quantity
-
-    def update_quantity(self, new_quantity):
-        """
-        Changes the quantity of a specific item within an order.
-        """
-        try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE OrderItems SET quantity=? WHERE id=?
-            ''', (new_quantity, self.order_item_id))
-            conn.commit()
-            conn.close()
-            return True
-        except sqlite3.Error as e:
-            print(f"Database error during order item update: {e}")
-            return False
-
-    def remove_item(self):
+    def subscribe(self):
         """
-        Deletes an item from the order.
+        Returns an async iterator over the order's status events: a snapshot of the current
+        status, then each committed change, ending once the order is delivered or cancelled.
+        Use order_hub.subscribe_queue(order_id) for a blocking iterator in threaded code.
         """
-        try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                DELETE FROM OrderItems WHERE id=?
-            ''', (self.order_item_id,))
-            conn.commit()
-            conn.close()
-            return True
-        except sqlite3.Error as e:
-            print(f"Database error during order item removal: {e}")
-            return False
-
-'''
-Order and OrderItem
-Purpose: Manages orders placed by customers, tracking their status and the items within each order.
-
-Attributes:
-
-order_id: Unique identifier for each order.
-customer_id: References the customer who placed the order.
-restaurant_id: References the restaurant fulfilling the order.
-status: Current status of the order (e.g., Pending, Preparing, Out for Delivery, Delivered).
-order_date: Date and time when the order was placed.
-total_amount: Final amount after applying discounts and membership benefits.
-items: List of OrderItem objects, representing the items within the order.
-Methods:
+        return order_hub.subscribe(self.order_id)
 
-place_order(cart): Creates a new order using items from a given cart, calculates the total, and saves the order in the database.
-update_order_status(new_status): Updates the status of an order (e.g., from "Pending" to "Preparing").
-get_order_details(): Retrieves the details of a specific order, including items, status, and delivery information.
-cancel_order(): Cancels an order if it’s in an allowable state, such as "Pending."
-track_order(): Provides real-time status updates on the order’s progress.
-Encapsulation: Methods like place_order() ensure that orders are created through a controlled process, protecting the order data's integrity.
-
-'''
-
-import sqlite3
-
-DATABASE = 'sprig.db'
-
-
-class Order:
-    def __init__(self, order_id, customer_id, restaurant_id, status):
-        self.order_id = order_id
-        self.customer_id = customer_id
-        self.restaurant_id = restaurant_id
-        self.status = status
-
-    def place_order(self, cart_items):
+    def get_status_history(self):
         """
-        Creates a new order using items from a given cart, calculates the total, and saves the order in the database.
+        Lists every status change of the order as (seq, from_status, to_status, actor, created_at) rows.
         """
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO Orders (customer_id, restaurant_id, order_status)
-                VALUES (?, ?, ?)
-            ''', (self.customer_id, self.restaurant_id, 'Pending'))
-            order_id = cursor.lastrowid
-            for menu_item_id, quantity in cart_items:
+            with connection() as conn:
+                cursor = conn.cursor()
                 cursor.execute('''
-                    INSERT INTO OrderItems (order_id, menu_item_id, quantity)
-                    VALUES (?, ?, ?)
-                ''', (order_id, menu_item_id, quantity))
-            conn.commit()
-            conn.close()
-            return order_id
-        except sqlite3.Error as e:
-            print(f"Database error during order placement: {e}")
-            return None
-
-    def update_order_status(self, new_status):
-        """
-        Updates the status of an order (e.g., from "Pending" to "Preparing").
-        """
-        try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE Orders SET order_status=? WHERE id=?
-            ''', (new_status, self.order_id))
-            conn.commit()
-            conn.close()
-            return True
+                    SELECT seq, from_status, to_status, actor, created_at
+                    FROM OrderEvents WHERE order_id=? ORDER BY seq
+                ''', (self.order_id,))
+                return cursor.fetchall()
         except sqlite3.Error as e:
-            print(f"Database error during order status update: {e}")
-            return False
+            print(f"Database error during order history retrieval: {e}")
+            return []
 
-    def get_order_details(self):
+    def time_in_states(self):
         """
-        Retrieves the details of a specific order, including items, status, and delivery information.
+        Reports how long the order spent in each status, in milliseconds.
         """
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT OrderItems.menu_item_id, OrderItems.quantity, MenuItems.item_name
-                FROM OrderItems
-                JOIN MenuItems ON OrderItems.menu_item_id = MenuItems.id
-                WHERE OrderItems.order_id=?
-            ''', (self.order_id,))
-            items = cursor.fetchall()
-            cursor.execute(
-                'SELECT order_status FROM Orders WHERE id=?', (self.order_id,))
-            status = cursor.fetchone()[0]
-            conn.close()
-            return items, status
-
+            return {status: stats['total_ms'] for status, stats in time_in_states('id', self.order_id).items()}
         except sqlite3.Error as e:
-            print(f"Database error during order details retrieval: {e}")
-            return None
-
-    def cancel_order(self):
-        """
-        Cancels an order if it's in an allowable state, such as "Pending."
-        """
-        if self.status == 'Pending':
-            return self.update_order_status('Cancelled')
-        else:
-            return False
-
-    def track_order(self):
-        """
-        Provides real-time status updates on the order's progress.
-        """
-        try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute(
-                'SELECT order_status FROM Orders WHERE id=?', (self.order_id,))
-            status = cursor.fetchone()[0]
-            conn.close()
-            return status
-        except sqlite3.Error as e:
-            print(f"Database error during order tracking: {e}")
-            return None
+            print(f"Database error during order history retrieval: {e}")
+            return {}
 
 
 class OrderItem:
@@ -305,13 +598,11 @@ class OrderItem:
         Changes the quantity of a specific item within an order.
         """
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE OrderItems SET quantity=? WHERE id=?
-            ''', (new_quantity, self.order_item_id))
-            conn.commit()
-            conn.close()
+            with unit_of_work() as cursor:
+                cursor.execute('''
+                    UPDATE OrderItems SET quantity=? WHERE id=?
+                ''', (new_quantity, self.order_item_id))
+                refresh_order_total(cursor, self.order_id)
             return True
         except sqlite3.Error as e:
             print(f"Database error during order item update: {e}")
@@ -322,13 +613,11 @@ class OrderItem:
         Deletes an item from the order.
         """
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                DELETE FROM OrderItems WHERE id=?
-            ''', (self.order_item_id,))
-            conn.commit()
-            conn.close()
+            with unit_of_work() as cursor:
+                cursor.execute('''
+                    DELETE FROM OrderItems WHERE id=?
+                ''', (self.order_item_id,))
+                refresh_order_total(cursor, self.order_id)
             return True
         except sqlite3.Error as e:
             print(f"Database error during order item removal: {e}")
@@ -23,12 +23,12 @@ Encapsulation: Sensitive details related to transactions are managed internally,
 '''
 
 import sqlite3
+from datetime import datetime
 from order import Order
 from customer import Customer
 from cart import Cart
 from membership import Membership
-
-DATABASE = 'sprig.db'
+from utils.database import in_unit_of_work, unit_of_work
 
 
 class Payment(Order, Customer, Cart, Membership):
@@ -51,107 +51,55 @@ class Payment(Order, Customer, Cart, Membership):
         print(f"Payment Status: {self.payment_status}")
         print(f"Transaction Date: {self.transaction_date}")
 
-    def process_payment(self, payment_method):
-        """
-        Initiates the payment process using the specified method and details. Verifies payment through integration with a payment gateway.
-        For simplicity, this method will just simulate a successful payment.
-        """
-        print(f"Processing payment with {payment_method}...")
-
-        if payment_method in ["Credit Card", "Debit Card", "UPI"]:
-            self.payment_status = "Completed"
-            print("Payment successful.")
-        else:
-            self.payment_status = "Failed"
-            print("Payment failed. Invalid payment method.")
-
-    def verify_payment(self):
-        """
-        Confirms if the payment has been processed successfully, updating the payment_status to "Completed" if verification is successful.
-        Here, we'll simulate verification as always successful for demonstration.
-        """
-        if self.payment_status == "Completed":
-            print("Payment verified successfully.")
-        else:
-            print("Payment verification failed. Please retry.")
-
-    def refund_payment(self, reason):
-        """
-        Handles refunds in case of issues such as order cancellation. Changes payment_status to "Refunded" and logs the reason for the refund.
-        """
-        if self.payment_status == "Completed":
-            self.payment_status = "Refunded"
-            print(f"Payment refunded successfully. Reason: {reason}")
-        else:
-            print("Refund not possible. Payment was not completed.")
-
-    def get_payment_status(self):
-        """
-        Retrieves the current status of the payment for tracking purposes.
-        """
-        return self.payment_status
-
-    def calculate_final_amount(self, cart_total, discounts):
-        """
-        Calculates the final payable amount, applying discounts or membership benefits (if applicable).
-        For simplicity, it subtracts the discount from the total.
-        """
-        final_amount = cart_total - discounts
-        print(f"Final amount after applying discounts: {final_amount}")
-        return final_amount
-
-'''
-Payment (Inheriting from Order, Customer, Cart, and Membership classes):
-Purpose: Handles payments for customer orders, ensuring transactions are secure and processed correctly.
-
-Attributes:
-
-payment_id: Unique identifier for each payment.
-order_id: Associated order that the payment is tied to.
-customer_id: References the customer making the payment.
-amount: Total payment amount.
-payment_method: Specifies the payment method used (e.g., credit card, debit card, UPI).
-payment_status: Status of the transaction (e.g., "Pending", "Completed", "Failed", "Refunded").
-transaction_date: The date and time when the transaction occurred.
-Methods:
-
-process_payment(payment_method, details): Initiates the payment process using the specified method and details. Verifies payment through integration with a payment gateway.
-verify_payment(): Confirms if the payment has been processed successfully, updating the payment_status to "Completed" if verification is successful.
-refund_payment(reason): Handles refunds in case of issues such as order cancellation. Changes payment_status to "Refunded" and logs the reason for the refund.
-get_payment_status(): Retrieves the current status of the payment for tracking purposes.
-calculate_final_amount(cart_total, discounts): Calculates the final payable amount, applying discounts or membership benefits (if applicable).
-Encapsulation: Sensitive details related to transactions are managed internally, and only relevant methods are exposed to ensure secure payment processing.
-
-'''
-
-import sqlite3
-from order import Order
-from customer import Customer
-from cart import Cart
-from membership import Membership
-
-DATABASE = 'sprig.db'
-
-
-class Payment(Order, Customer, Cart, Membership):
-    def __init__(self, payment_id, order_id, customer_id, amount, payment_method, payment_status, transaction_date):
-        super().__init__(order_id, customer_id, None, None)
-        self.payment_id = payment_id
-        self.amount = amount
-        self.payment_method = payment_method
-        self.payment_status = payment_status
-        self.transaction_date = transaction_date
-
-    def payment_details(self):
-        """
-        Displays the payment details for reference.
-        """
-        print(f"Payment ID: {self.payment_id}")
-        print(f"Order ID: {self.order_id}")
-        print(f"Amount: {self.amount}")
-        print(f"Payment Method: {self.payment_method}")
-        print(f"Payment Status: {self.payment_status}")
-        print(f"Transaction Date: {self.transaction_date}")
+    @classmethod
+    def checkout(cls, customer, cart, payment_method, amount):
+        """
+        Places the customer's order from the cart and records its payment as one unit of work.
+        amount is what the customer agreed to pay; it must match the order total stored in
+        Orders, or nothing is charged or written.
+        Returns the Payment, or None if the amount, the payment or the database write fails.
+        """
+        payment = cls(None, None, customer.customer_id, amount, payment_method, 'Pending',
+                      datetime.now().isoformat(timespec='seconds'))
+        try:
+            with unit_of_work() as cursor:
+                payment.order_id = customer.place_order(cart)
+                cursor.execute('SELECT total_amount FROM Orders WHERE id=?', (payment.order_id,))
+                row = cursor.fetchone()
+                if row is None:
+                    raise ValueError("The order was not placed")
+                if amount is None or round(amount, 2) != round(row[0], 2):
+                    raise ValueError(f"Payment amount {amount} does not match the order total {row[0]}")
+                payment.process_payment(payment_method)
+                if payment.payment_status != 'Completed':
+                    raise ValueError(f"Payment with {payment_method} failed")
+                payment.record_payment()
+            return payment
+        except ValueError as e:
+            print(f"Checkout failed: {e}")
+            return None
+        except sqlite3.Error as e:
+            print(f"Database error during checkout: {e}")
+            return None
+
+    def record_payment(self):
+        """
+        Saves the payment against its order and returns the payment id.
+        """
+        try:
+            with unit_of_work() as cursor:
+                cursor.execute('''
+                    INSERT INTO Payments (order_id, payment_method, payment_status, payment_date, amount)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (self.order_id, self.payment_method, self.payment_status,
+                      self.transaction_date or datetime.now().isoformat(timespec='seconds'), self.amount))
+                self.payment_id = cursor.lastrowid
+            return self.payment_id
+        except sqlite3.Error as e:
+            if in_unit_of_work():
+                raise
+            print(f"Database error during payment recording: {e}")
+            return None
 
     def process_payment(self, payment_method):
         """
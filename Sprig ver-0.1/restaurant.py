@@ -8,13 +8,28 @@ address: Location of the restaurant.
 Methods:
 get_menu(): Fetches menu items for display.
 get_restaurant_list(): Returns a list of available restaurants.
+search(query, limit, offset): Finds dishes and restaurants by name, description or cuisine.
 Abstraction: Shields the complex database interactions from the partner class.
 
 '''
 
+import re
 import sqlite3
+from utils.database import connection
+from utils.menu_cache import menu_cache
 
-DATABASE = 'sprig.db'
+SEARCH_PAGE_LIMIT = 100
+
+# bm25 weights, one per SearchIndex column: kind, ref_id, restaurant_id, title, body
+SEARCH_WEIGHTS = (0.0, 0.0, 0.0, 10.0, 1.0)
+
+
+def build_match_query(query):
+    """
+    Turns free text into an FTS5 query where every word must match as a prefix.
+    """
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
 
 
 class Restaurant:
@@ -28,13 +43,7 @@ class Restaurant:
         Fetches menu items for display.
         """
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute(
-                'SELECT * FROM MenuItems WHERE restaurant_id=?', (self.restaurant_id,))
-            menu_items = cursor.fetchall()
-            conn.close()
-            return menu_items
+            return menu_cache.get(self.restaurant_id)
         except sqlite3.Error as e:
             print(f"Database error during menu retrieval: {e}")
             return []
@@ -45,69 +54,47 @@ class Restaurant:
         Returns a list of available restaurants.
         """
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM Restaurants')
-            restaurants = cursor.fetchall()
-            conn.close()
+            with connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT * FROM Restaurants')
+                restaurants = cursor.fetchall()
             return restaurants
         except sqlite3.Error as e:
             print(f"Database error during restaurant list retrieval: {e}")
             return []
 
-
-'''
-Restaurant
-Purpose: Represents restaurant information and menu management.
-Attributes:
-restaurant_id: Unique identifier.
-name: Restaurant's name.
-address: Location of the restaurant.
-Methods:
-get_menu(): Fetches menu items for display.
-get_restaurant_list(): Returns a list of available restaurants.
-Abstraction: Shields the complex database interactions from the partner class.
-
-'''
-
-
-DATABASE = 'sprig.db'
-
-
-class Restaurant:
-    def __init__(self, restaurant_id, name, address):
-        self.restaurant_id = restaurant_id
-        self.name = name
-        self.address = address
-
-    def get_menu(self):
-        """
-        Fetches menu items for display.
-        """
-        try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute(
-                'SELECT * FROM MenuItems WHERE restaurant_id=?', (self.restaurant_id,))
-            menu_items = cursor.fetchall()
-            conn.close()
-            return menu_items
-        except sqlite3.Error as e:
-            print(f"Database error during menu retrieval: {e}")
-            return []
-
     @staticmethod
-    def get_restaurant_list():
+    def search(query, limit=20, offset=0):
         """
-        Returns a list of available restaurants.
+        Finds dishes and restaurants matching every word of the query (prefixes included),
+        best BM25 match first. Each hit has kind ('item' or 'restaurant'), ref_id,
+        restaurant_id, title, body, restaurant_name, price and availability.
         """
+        match = build_match_query(query)
+        if not match:
+            return []
+        limit = max(1, min(int(limit), SEARCH_PAGE_LIMIT))
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM Restaurants')
-            restaurants = cursor.fetchall()
-            conn.close()
-            return restaurants
+            with connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT SearchIndex.kind, SearchIndex.ref_id, SearchIndex.restaurant_id,
+                           SearchIndex.title, SearchIndex.body, Restaurants.restaurant_name,
+                           MenuItems.price, MenuItems.availability
+                    FROM (
+                        SELECT rowid, bm25(SearchIndex, {', '.join(map(str, SEARCH_WEIGHTS))}) AS score
+                        FROM SearchIndex
+                        WHERE SearchIndex MATCH ?
+                        ORDER BY score
+                        LIMIT ? OFFSET ?
+                    ) AS hits
+                    JOIN SearchIndex ON SearchIndex.rowid = hits.rowid
+                    JOIN Restaurants ON Restaurants.id = SearchIndex.restaurant_id
+                    LEFT JOIN MenuItems ON SearchIndex.kind = 'item' AND MenuItems.id = SearchIndex.ref_id
+                    ORDER BY hits.score
+                ''', (match, limit, max(0, int(offset))))
+                results = cursor.fetchall()
+            return results
         except sqlite3.Error as e:
-            print(f"Database error during restaurant list retrieval: {e}")
+            print(f"Database error during search: {e}")
             return []
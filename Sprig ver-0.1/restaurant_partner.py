@@ -5,97 +5,129 @@ Attributes:
 partner_id: Inherited from User.
 restaurant_id: ID associated with the restaurant they manage.
 Methods:
+login(): Checks the password and starts a session; from_session(token) restores the partner from it.
 add_menu_item(): Allows partners to add new dishes to the menu.
 remove_menu_item(): Removes a dish from the menu.
-view_orders(): Retrieves current orders for their restaurant.
+view_orders(): Retrieves current orders for their restaurant, one page at a time.
+view_order_changes(): Retrieves only the orders placed or changed since the last refresh.
 update_order_status(): Changes the status of orders to reflect their progress.
-Polymorphism: update_order_status() behaves differently compared to delivery partners.
+bulk_update_status(): Moves a batch of orders from one status to another in one transaction.
+time_in_states(): Average and total time this restaurant's orders spent in each status.
+Polymorphism: update_order_status() behaves differently compared to delivery partners: it only
+touches this restaurant's orders and only makes the transitions a restaurant is allowed to.
 
 '''
 
 import sqlite3
-import hashlib
-import bcrypt
-from user import User
-
-
-DATABASE = 'sprig.db'
+from user import User, is_taken
+from order import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, change_order_status, change_order_statuses, fetch_order_changes,
+                   fetch_order_page, time_in_states)
+from utils.availability import user_availability
+from utils.database import connection, unit_of_work
+from utils.group_commit import write
+from utils.hashing import HashingBusy, hash_password
+from utils.menu_cache import invalidate_menu
+from utils.sessions import session_store
 
 
 class RestaurantPartner(User):
     def __init__(self, username, password, partner_id, restaurant_id):
-        super().__init__(username, password)
+        super().__init__(username, password, None, None)
         self.partner_id = partner_id
         self.restaurant_id = restaurant_id
 
     @classmethod
     def signup(cls, username, password, restaurant_name, address, cuisine):
+        if is_taken(username, f"{username}@sprig.com"):
+            return None
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-            cursor.execute('''
-                INSERT INTO Users (username, password, name, email, user_type)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (username, hashed_password, restaurant_name, f"{username}@sprig.com", 'RestaurantPartner'))
-            user_id = cursor.lastrowid
-            cursor.execute('''
-                INSERT INTO Restaurants (restaurant_name, address, cuisine_type)
-                VALUES (?, ?, ?)
-            ''', (restaurant_name, address, cuisine))
-            restaurant_id = cursor.lastrowid
-            cursor.execute('''
-                INSERT INTO RestaurantPartners (id, restaurant_id, address, cuisine_type)
-                VALUES (?, ?, ?, ?)
-            ''', (user_id, restaurant_id, address, cuisine))
-            conn.commit()
-            restaurant_partner = cls(user_id, username, password, restaurant_name, address, cuisine)
-            conn.close()
+            hashed_password = hash_password(password)
+            with unit_of_work() as cursor:
+                cursor.execute('''
+                    INSERT INTO Users (username, password, name, email, user_type)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (username, hashed_password, restaurant_name, f"{username}@sprig.com", 'RestaurantPartner'))
+                user_id = cursor.lastrowid
+                user_availability.add(username, f"{username}@sprig.com")
+                cursor.execute('''
+                    INSERT INTO Restaurants (restaurant_name, address, cuisine_type)
+                    VALUES (?, ?, ?)
+                ''', (restaurant_name, address, cuisine))
+                restaurant_id = cursor.lastrowid
+                cursor.execute('''
+                    INSERT INTO RestaurantPartners (id, restaurant_id, address, cuisine_type)
+                    VALUES (?, ?, ?, ?)
+                ''', (user_id, restaurant_id, address, cuisine))
+            restaurant_partner = cls(username, password, user_id, restaurant_id)
             return restaurant_partner
         except sqlite3.Error as e:
             print(f"Database error during restaurant partner signup: {e}")
             return None
+        except HashingBusy as e:
+            print(f"Signup is busy, please try again: {e}")
+            return None
 
     @classmethod
     def login(cls, username, password):
         try:
             # First verify user credentials using parent User class
-            hashed_password = hashlib.sha256(password.encode()).hexdigest()
-            user = User.login(username, hashed_password)
+            user = User.login(username, password)
             
             if user:
-                conn = sqlite3.connect(DATABASE)
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT rp.*, r.id as restaurant_id 
-                    FROM RestaurantPartners rp
-                    JOIN Users u ON u.id = rp.id
-                    JOIN Restaurants r ON r.id = rp.restaurant_id
-                    WHERE u.username = ? AND u.user_type = 'RestaurantPartner'
-                ''', (username,))
-                partner = cursor.fetchone()
-                conn.close()
+                with connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        SELECT rp.*, r.id as restaurant_id 
+                        FROM RestaurantPartners rp
+                        JOIN Users u ON u.id = rp.id
+                        JOIN Restaurants r ON r.id = rp.restaurant_id
+                        WHERE u.username = ? AND u.user_type = 'RestaurantPartner'
+                    ''', (username,))
+                    partner = cursor.fetchone()
                 
                 if partner:
-                    return cls(username, password, partner[0], partner['restaurant_id'])
+                    restaurant_partner = cls(username, password, partner[0], partner['restaurant_id'])
+                    restaurant_partner.session_token = user['session_token']
+                    return restaurant_partner
+                # Not a restaurant partner, so the session User.login started is not needed
+                session_store.revoke(user['session_token'])
             return None
         except sqlite3.Error as e:
             print(f"Database error during login: {e}")
             return None
 
-    def add_menu_item(self, item_name, price, description):
+    @classmethod
+    def from_session(cls, token):
+        """
+        Returns the logged-in restaurant partner a session token belongs to, or None; no password is checked.
+        """
+        session = User.authenticate(token, 'RestaurantPartner')
+        if session is None:
+            return None
+        with connection() as conn:
+            partner = conn.execute('''
+                SELECT u.username, rp.id, rp.restaurant_id
+                FROM RestaurantPartners rp
+                JOIN Users u ON u.id = rp.id
+                WHERE rp.id = ?
+            ''', (session.user_id,)).fetchone()
+        if partner is None:
+            return None
+        restaurant_partner = cls(partner['username'], None, partner['id'], partner['restaurant_id'])
+        restaurant_partner.session_token = token
+        return restaurant_partner
+
+    def add_menu_item(self, item_name, price, description, item_type='Regular'):
         """
         Allows partners to add new dishes to the menu.
         """
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO MenuItems (restaurant_id, item_name, price, item_description)
-                VALUES (?, ?, ?, ?)
-            ''', (self.restaurant_id, item_name, price, description))
-            conn.commit()
-            conn.close()
+            with unit_of_work() as cursor:
+                cursor.execute('''
+                    INSERT INTO MenuItems (restaurant_id, item_name, price, item_description, item_type)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (self.restaurant_id, item_name, price, description, item_type))
+                invalidate_menu(self.restaurant_id)
             return True
         except sqlite3.Error as e:
             print(f"Database error during menu item addition: {e}")
@@ -106,33 +138,43 @@ class RestaurantPartner(User):
         Removes a dish from the menu.
         """
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                DELETE FROM MenuItems WHERE id=?
-            ''', (menu_item_id,))
-            conn.commit()
-            conn.close()
+            with unit_of_work() as cursor:
+                cursor.execute('''
+                    DELETE FROM MenuItems WHERE id=? AND restaurant_id=?
+                ''', (menu_item_id, self.restaurant_id))
+                invalidate_menu(self.restaurant_id)
             return True
         except sqlite3.Error as e:
             print(f"Database error during menu item removal: {e}")
             return False
 
-    def view_orders(self):
+    def view_orders(self, after=None, limit=DEFAULT_PAGE_SIZE, status=None, since=None, until=None):
         """
-        Retrieves current orders for their restaurant.
+        Retrieves one page of their restaurant's orders, newest first.
+        Pass the previous page's next_cursor as after to get the next one.
         """
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT Orders.id, Orders.customer_id, Orders.order_status
-                FROM Orders
-                WHERE Orders.restaurant_id=?
-            ''', (self.restaurant_id,))
-            orders = cursor.fetchall()
-            conn.close()
-            return orders
+            with connection() as conn:
+                return fetch_order_page(conn.cursor(), '''
+                    SELECT Orders.id, Orders.customer_id, Orders.order_status, Orders.order_date
+                    FROM Orders
+                ''', 'restaurant_id', self.restaurant_id, after, limit, status, since, until)
+        except sqlite3.Error as e:
+            print(f"Database error during order retrieval: {e}")
+            return None
+
+    def view_order_changes(self, watermark=0, limit=MAX_PAGE_SIZE):
+        """
+        Retrieves their restaurant's orders placed or changed since watermark, for refreshing
+        a screen without reloading every order. Pass the result's watermark next time.
+        """
+        try:
+            with connection() as conn:
+                return fetch_order_changes(conn.cursor(), '''
+                    SELECT Orders.id, Orders.customer_id, Orders.order_status, Orders.order_date,
+                           Orders.change_seq
+                    FROM Orders
+                ''', 'restaurant_id', self.restaurant_id, watermark, limit)
         except sqlite3.Error as e:
             print(f"Database error during order retrieval: {e}")
             return None
@@ -140,17 +182,36 @@ class RestaurantPartner(User):
     def update_order_status(self, order_id, status):
         """
         Changes the status of orders to reflect their progress.
+        Returns True if this update won; False if the order is not this restaurant's, the
+        transition is not allowed, or another update changed the order first.
         """
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE Orders SET order_status=? WHERE id=?
-            ''', (status, order_id))
-            conn.commit()
-            conn.close()
-            return True
+            return write(change_order_status, order_id, status, None, 'restaurant',
+                         'restaurant_id', self.restaurant_id)
         except sqlite3.Error as e:
             print(f"Database error during order status update: {e}")
             return False
 
+    def bulk_update_status(self, order_ids, from_status, to_status):
+        """
+        Moves a batch of their restaurant's orders from from_status to to_status in one transaction.
+        Returns {order_id: True if it was changed}; an order is False if it is not this
+        restaurant's, was not in from_status, or the transition is not allowed.
+        """
+        try:
+            return write(change_order_statuses, order_ids, from_status, to_status, 'restaurant',
+                         'restaurant_id', self.restaurant_id)
+        except sqlite3.Error as e:
+            print(f"Database error during bulk order status update: {e}")
+            return dict.fromkeys(order_ids, False)
+
+    def time_in_states(self):
+        """
+        Average and total time this restaurant's orders spent in each status.
+        Returns {status: {'orders', 'total_ms', 'avg_ms', 'max_ms'}}.
+        """
+        try:
+            return time_in_states('restaurant_id', self.restaurant_id)
+        except sqlite3.Error as e:
+            print(f"Database error during order history retrieval: {e}")
+            return {}
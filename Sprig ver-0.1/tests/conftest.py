@@ -0,0 +1,80 @@
+'''
+Shared fixtures for the tests.
+Every test runs against a freshly migrated database in its own temporary directory,
+so running the suite never touches sprig.db. Passwords are hashed inline at a low
+bcrypt cost to keep signups fast.
+
+Run from the project directory: python -m pytest -q
+
+'''
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+os.environ.setdefault('SPRIG_HASH_WORKERS', '0')
+
+import pytest  # noqa: E402
+
+from utils import database, hashing  # noqa: E402
+from utils.availability import user_availability  # noqa: E402
+from utils.menu_cache import menu_cache  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    """
+    Points the shared pool at a new database and returns the pool.
+    """
+    pool = database.configure_pool(database=str(tmp_path / 'test.db'))
+    database.initialize_database()
+    hasher = hashing.password_hasher
+    hashing.password_hasher = hashing.PasswordHasher(workers=0, hasher=hashing.BcryptHasher(4))
+    # Module-level caches must not carry state over from another test's database
+    menu_cache.invalidate()
+    user_availability.rebuild()
+    yield pool
+    hashing.password_hasher = hasher
+    pool.close()
+
+
+@pytest.fixture
+def menu_item_ids(db):
+    """
+    Seeds one restaurant with five menu items and returns their ids.
+    """
+    with database.connection() as conn:
+        restaurant_id = conn.execute('''
+            INSERT INTO Restaurants (restaurant_name, address, cuisine_type) VALUES ('Dosa Corner', '1 Main Street', 'Indian')
+        ''').lastrowid
+        conn.executemany('''
+            INSERT INTO MenuItems (restaurant_id, item_name, item_description, price, item_type)
+            VALUES (?, ?, ?, ?, 'Veg')
+        ''', [(restaurant_id, f"Dish {i}", f"Dish number {i}", 100 + i) for i in range(5)])
+        conn.commit()
+        return [row[0] for row in conn.execute('SELECT id FROM MenuItems ORDER BY id')]
+
+
+@pytest.fixture
+def customer(db):
+    from customer import Customer
+    return Customer.signup('asha', 'Secret#123', 'Asha Rao', 'asha@example.com', '5550100100')
+
+
+def signup_restaurant(username, items=3):
+    """
+    Signs up a restaurant partner with a few menu items; returns (partner, menu_item_ids).
+    """
+    from restaurant_partner import RestaurantPartner
+    partner = RestaurantPartner.signup(username, 'Secret#123', f"{username.title()} Kitchen", '1 Main Street', 'Indian')
+    with database.connection() as conn:
+        conn.executemany('''
+            INSERT INTO MenuItems (restaurant_id, item_name, item_description, price, item_type)
+            VALUES (?, ?, ?, ?, 'Veg')
+        ''', [(partner.restaurant_id, f"{username} dish {i}", 'House special', 200 + i) for i in range(items)])
+        conn.commit()
+        menu_item_ids = [row[0] for row in conn.execute(
+            'SELECT id FROM MenuItems WHERE restaurant_id=? ORDER BY id', (partner.restaurant_id,))]
+    return partner, menu_item_ids
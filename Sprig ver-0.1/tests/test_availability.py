@@ -0,0 +1,30 @@
+import threading
+
+from utils import availability
+from utils.availability import UserAvailability
+
+
+def test_user_added_during_a_rebuild_is_in_the_new_filter(customer, monkeypatch):
+    checker = UserAvailability(min_capacity=100)
+    checker.rebuild()
+    reading, resume = threading.Event(), threading.Event()
+
+    class PausingBloomFilter(availability.BloomFilter):
+        def add(self, value):
+            # Hold the rebuild in the middle of its SELECT over Users
+            if threading.current_thread() is rebuilder and not reading.is_set():
+                reading.set()
+                assert resume.wait(5)
+            super().add(value)
+
+    monkeypatch.setattr(availability, 'BloomFilter', PausingBloomFilter)
+    rebuilder = threading.Thread(target=checker.rebuild)
+    rebuilder.start()
+    assert reading.wait(5)
+    checker.add('ravi', 'ravi@example.com')
+    resume.set()
+    rebuilder.join(5)
+
+    assert 'ravi' in checker._usernames and 'ravi@example.com' in checker._emails
+    assert 'asha' in checker._usernames
+    assert checker._rebuilds == []
@@ -0,0 +1,52 @@
+from conftest import signup_restaurant
+from order import Order, change_order_statuses
+from utils.database import connection, unit_of_work
+
+
+def statuses(order_ids):
+    with connection() as conn:
+        rows = conn.execute(f"SELECT id, order_status FROM Orders WHERE id IN ({', '.join('?' * len(order_ids))})",
+                            order_ids)
+        return dict(rows.fetchall())
+
+
+def event_count(order_ids):
+    with connection() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM OrderEvents WHERE order_id IN ({', '.join('?' * len(order_ids))})",
+                            order_ids).fetchone()[0]
+
+
+def test_bulk_update_only_moves_this_restaurants_orders(customer):
+    partner, menu_item_ids = signup_restaurant('dosa')
+    _, other_menu_item_ids = signup_restaurant('idli')
+    mine = Order.place_orders([(customer.customer_id, [(menu_item_ids[0], 1)])] * 3)
+    theirs = Order.place_orders([(customer.customer_id, [(other_menu_item_ids[0], 1)])])
+    # Already moved, so no longer in from_status
+    assert partner.update_order_status(mine[2], 'Preparing')
+
+    results = partner.bulk_update_status(mine + theirs + [mine[0]], 'Pending', 'Preparing')
+
+    assert results == {mine[0]: True, mine[1]: True, mine[2]: False, theirs[0]: False}
+    assert statuses(mine + theirs) == {mine[0]: 'Preparing', mine[1]: 'Preparing', mine[2]: 'Preparing',
+                                       theirs[0]: 'Pending'}
+    # One placement event per order, plus one change each for the three moved orders
+    assert event_count(mine + theirs) == 4 + 3
+
+
+def test_disallowed_transition_changes_nothing(customer):
+    partner, menu_item_ids = signup_restaurant('dosa')
+    order_ids = Order.place_orders([(customer.customer_id, [(menu_item_ids[0], 1)])] * 2)
+    assert partner.bulk_update_status(order_ids, 'Pending', 'Delivered') == dict.fromkeys(order_ids, False)
+    assert set(statuses(order_ids).values()) == {'Pending'}
+
+
+def test_change_order_statuses_spans_chunks(customer, menu_item_ids):
+    order_ids = Order.place_orders([(customer.customer_id, [(menu_item_ids[0], 1)])] * 1200)
+    with unit_of_work() as cursor:
+        results = change_order_statuses(cursor, order_ids[:1100], 'Pending', 'Cancelled', 'customer')
+    assert list(results) == order_ids[:1100] and all(results.values())
+    after = statuses(order_ids)
+    assert [after[order_id] for order_id in order_ids] == ['Cancelled'] * 1100 + ['Pending'] * 100
+    with connection() as conn:
+        seqs = conn.execute("SELECT DISTINCT seq FROM OrderEvents WHERE to_status='Cancelled'").fetchall()
+    assert [tuple(row) for row in seqs] == [(2,)]
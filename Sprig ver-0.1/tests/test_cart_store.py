@@ -0,0 +1,150 @@
+import threading
+
+import pytest
+
+from utils.cart_store import CartStore
+from utils.database import connection, unit_of_work
+
+
+def stored_lines(cart):
+    with connection() as conn:
+        return dict(conn.execute('SELECT menu_item_id, quantity FROM CartItems WHERE cart_id=?',
+                                 (cart.cart_id,)).fetchall())
+
+
+def rows_written(store):
+    return store.stats()['rows_written']
+
+
+def test_rows_written_per_change(customer, menu_item_ids):
+    store = CartStore(flush_batch=1000, flush_ms=60000)
+    cart = store.get(customer.customer_id)
+    first, second = menu_item_ids[:2]
+
+    # The first line also creates the Carts row
+    cart.add_to_cart(first, 1)
+    store.flush()
+    assert rows_written(store) == 2
+
+    cart.add_to_cart(second, 1)
+    store.flush()
+    assert rows_written(store) == 3
+
+    cart.update_quantity(second, 4)
+    store.flush()
+    assert rows_written(store) == 4
+
+    cart.remove_from_cart(first)
+    store.flush()
+    assert rows_written(store) == 5
+    assert stored_lines(cart) == {second: 4}
+    assert store.stats()['mutations'] == 4
+
+
+def test_repeated_changes_to_a_line_cost_one_upsert(customer, menu_item_ids):
+    store = CartStore(flush_batch=1000, flush_ms=60000)
+    cart = store.get(customer.customer_id)
+    cart.add_to_cart(menu_item_ids[0], 1)
+    store.flush()
+    before = store.stats()
+
+    for _ in range(10):
+        cart.add_to_cart(menu_item_ids[1], 1)
+    cart.update_quantity(menu_item_ids[1], 3)
+    store.flush()
+
+    after = store.stats()
+    assert after['mutations'] - before['mutations'] == 11
+    assert after['rows_written'] - before['rows_written'] == 1
+    assert after['flushes'] - before['flushes'] == 1
+    assert stored_lines(cart) == {menu_item_ids[0]: 1, menu_item_ids[1]: 3}
+
+
+def test_cart_reloads_from_the_database(customer, menu_item_ids):
+    store = CartStore(flush_batch=1000, flush_ms=60000)
+    store.get(customer.customer_id).add_to_cart(menu_item_ids[0], 2)
+    store.flush()
+
+    reloaded = CartStore().get(customer.customer_id)
+    assert reloaded.get_cart_items() == [(menu_item_ids[0], 2)]
+
+
+def test_order_waits_for_a_flush_in_progress(customer, menu_item_ids):
+    store = CartStore(flush_batch=1000, flush_ms=60000)
+    cart = store.get(customer.customer_id)
+    cart.add_to_cart(menu_item_ids[0], 1)
+    store.flush()
+    cart.add_to_cart(menu_item_ids[1], 2)
+
+    # Hold a flush after it has taken the pending line but before it writes it
+    entered, release = threading.Event(), threading.Event()
+    write = store._write
+
+    def paused_write(*args):
+        entered.set()
+        release.wait(5)
+        return write(*args)
+
+    store._write = paused_write
+    flusher = threading.Thread(target=store.flush)
+    flusher.start()
+    assert entered.wait(5)
+
+    result = {}
+    placer = threading.Thread(target=lambda: result.update(order_id=customer.place_order(cart)))
+    placer.start()
+    placer.join(0.2)
+    assert placer.is_alive()
+    release.set()
+    flusher.join(5)
+    placer.join(5)
+
+    assert result['order_id'] is not None
+    assert stored_lines(cart) == {}
+    assert cart.get_cart_items() == []
+    with connection() as conn:
+        lines = conn.execute('SELECT menu_item_id, quantity FROM OrderItems WHERE order_id=? ORDER BY id',
+                             (result['order_id'],)).fetchall()
+    assert [tuple(line) for line in lines] == [(menu_item_ids[0], 1), (menu_item_ids[1], 2)]
+
+
+def test_discard_does_not_hold_the_flush_lock_across_its_delete(customer, menu_item_ids):
+    store = CartStore(flush_batch=1000, flush_ms=60000)
+    cart = store.get(customer.customer_id)
+    cart.add_to_cart(menu_item_ids[0], 1)
+    store.flush()
+    cart.add_to_cart(menu_item_ids[1], 2)
+
+    with unit_of_work():
+        cart.discard()
+        assert store._flush_lock.acquire(blocking=False)
+        store._flush_lock.release()
+        # A flush meanwhile must not write the cart back or wait on this transaction
+        cart.add_to_cart(menu_item_ids[2], 1)
+        flusher = threading.Thread(target=store.flush)
+        flusher.start()
+        flusher.join(5)
+        assert not flusher.is_alive()
+
+    assert stored_lines(cart) == {}
+    assert cart.get_cart_items() == []
+    assert store.stats()['pending'] == 1
+    store.flush()
+    assert stored_lines(cart) == {}
+
+
+def test_discard_rolled_back_keeps_pending_lines(customer, menu_item_ids):
+    store = CartStore(flush_batch=1000, flush_ms=60000)
+    cart = store.get(customer.customer_id)
+    cart.add_to_cart(menu_item_ids[0], 1)
+    store.flush()
+    cart.add_to_cart(menu_item_ids[1], 2)
+
+    with pytest.raises(RuntimeError):
+        with unit_of_work():
+            cart.discard()
+            raise RuntimeError('order failed')
+
+    store.flush()
+    assert stored_lines(cart) == {menu_item_ids[0]: 1, menu_item_ids[1]: 2}
+    assert cart.get_cart_items() == [(menu_item_ids[0], 1), (menu_item_ids[1], 2)]
@@ -0,0 +1,60 @@
+import sqlite3
+
+import pytest
+
+from utils import group_commit
+from utils.database import connection, on_commit
+from utils.group_commit import GroupCommitWriter
+
+
+def add_restaurant(cursor, name):
+    cursor.execute("INSERT INTO Restaurants (restaurant_name, address, cuisine_type) VALUES (?, 'Main Street', 'Indian')",
+                   (name,))
+    return cursor.lastrowid
+
+
+def restaurants():
+    with connection() as conn:
+        return [row[0] for row in conn.execute('SELECT restaurant_name FROM Restaurants ORDER BY id')]
+
+
+@pytest.fixture
+def writer(db):
+    writer = GroupCommitWriter(window_ms=1)
+    yield writer
+    writer.close()
+
+
+def test_failed_connection_fails_the_batch_and_the_next_one_reconnects(db, monkeypatch):
+    connect = group_commit.get_db_connection
+
+    def fail_once():
+        monkeypatch.setattr(group_commit, 'get_db_connection', connect)
+        raise sqlite3.OperationalError('unable to open database file')
+
+    monkeypatch.setattr(group_commit, 'get_db_connection', fail_once)
+    writer = GroupCommitWriter(window_ms=1)
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            writer.submit(add_restaurant, 'Lost').result(timeout=5)
+        assert writer.submit(add_restaurant, 'Kept').result(timeout=5) is not None
+    finally:
+        writer.close()
+    assert restaurants() == ['Kept']
+
+
+def test_error_after_commit_reaches_the_caller_and_the_writer_keeps_going(writer):
+    def add_and_fail_after_commit(cursor):
+        on_commit(lambda: 1 / 0)
+        return add_restaurant(cursor, 'Committed')
+
+    with pytest.raises(ZeroDivisionError):
+        writer.submit(add_and_fail_after_commit).result(timeout=5)
+    assert writer.submit(add_restaurant, 'Next').result(timeout=5) is not None
+    assert restaurants() == ['Committed', 'Next']
+
+
+def test_write_after_close_fails_at_once(writer):
+    writer.close()
+    with pytest.raises(RuntimeError):
+        writer.submit(add_restaurant, 'Late').result(timeout=5)
@@ -0,0 +1,71 @@
+import asyncio
+import subprocess
+import sys
+import textwrap
+
+from conftest import ROOT
+from utils import hashing
+
+
+def run_script(tmp_path, body):
+    script = tmp_path / 'script.py'
+    script.write_text(f"import sys\nsys.path.insert(0, {ROOT!r})\nfrom utils import hashing\n" + textwrap.dedent(body))
+    return subprocess.run([sys.executable, str(script)], capture_output=True, text=True, timeout=120)
+
+
+HASH_IN_POOL = '''
+    hasher = hashing.PasswordHasher(workers=2, hasher=hashing.BcryptHasher(4))
+    print(hasher.verify('Secret#123', hasher.hash('Secret#123'))[0])
+    hasher.shutdown()
+'''
+
+
+def test_pool_works_from_a_guarded_script(tmp_path):
+    result = run_script(tmp_path, "if __name__ == '__main__':" + textwrap.indent(HASH_IN_POOL, '    '))
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ['True']
+
+
+def test_unguarded_script_fails_with_a_clear_error(tmp_path):
+    result = run_script(tmp_path, HASH_IN_POOL)
+    assert result.returncode != 0
+    assert "if __name__ == '__main__'" in result.stderr
+
+
+def test_cancelled_wait_for_a_slot_gives_the_slot_back():
+    hasher = hashing.PasswordHasher(workers=0, max_pending=1, hasher=hashing.BcryptHasher(4))
+
+    async def cancel_while_waiting():
+        hasher._slots.acquire()
+        waiter = asyncio.ensure_future(hasher.hash_async('Secret#123'))
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        # The slot frees up after the caller gave up waiting for it
+        hasher._slots.release()
+        await asyncio.sleep(0.1)
+        return waiter.cancelled(), await hasher.hash_async('Secret#123')
+
+    cancelled, hashed = asyncio.run(cancel_while_waiting())
+    assert cancelled and hashed.startswith('$2b$04$')
+    assert hasher._slots.acquire(blocking=False)
+
+
+def test_stronger_hash_is_not_rewritten_at_a_lower_cost():
+    stored = hashing.BcryptHasher(12).hash(b'Secret#123')
+    hasher = hashing.PasswordHasher(workers=0, hasher=hashing.BcryptHasher(10))
+    assert hasher.verify('Secret#123', stored) == (True, None)
+    assert not hashing.ScryptHasher(12).needs_rehash(hashing.ScryptHasher(14).hash(b'Secret#123'))
+
+
+def test_weaker_or_other_hashes_are_upgraded():
+    hasher = hashing.PasswordHasher(workers=0, hasher=hashing.BcryptHasher(5))
+    matches, new_hash = hasher.verify('Secret#123', hashing.BcryptHasher(4).hash(b'Secret#123'))
+    assert matches and new_hash.startswith('$2b$05$')
+    matches, new_hash = hasher.verify('Secret#123', hashing.ScryptHasher(10).hash(b'Secret#123'))
+    assert matches and new_hash.startswith('$2b$05$')
+    assert hasher.verify('wrong', hashing.BcryptHasher(4).hash(b'Secret#123')) == (False, None)
+
+
+def test_calibration_never_goes_below_the_default_cost():
+    assert hashing.BcryptHasher.calibrate(target_ms=0.001).cost == hashing.BcryptHasher.DEFAULT_COST
+    assert hashing.BcryptHasher.calibrate(target_ms=10 ** 9).cost == hashing.BcryptHasher.MAX_COST
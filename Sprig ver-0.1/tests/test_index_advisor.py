@@ -0,0 +1,27 @@
+import pytest
+
+from utils import index_advisor
+
+
+@pytest.fixture(scope='module')
+def conn():
+    conn = index_advisor.build_database()
+    yield conn
+    conn.close()
+
+
+def test_shipped_statements_prepare_and_never_index_the_rowid(conn):
+    statements = index_advisor.collect_statements()
+    assert not any(path.startswith('tests') for path, _, _ in statements)
+    findings = index_advisor.advise(conn, statements)
+    assert [(f['path'], f['line'], f['error']) for f in findings if f['error']] == []
+    proposals = [p for f in findings for p in f['proposals']]
+    assert not any('(id' in p or ', id' in p for p in proposals)
+
+
+def test_rowid_columns_are_dropped_from_the_key(conn):
+    assert index_advisor.propose_index(conn, 'SELECT id FROM MenuItems ORDER BY id', 'MenuItems') == (None, None)
+    key, covering = index_advisor.propose_index(
+        conn, 'SELECT id, price FROM MenuItems WHERE restaurant_id = ? AND rowid > ? ORDER BY id', 'MenuItems')
+    assert key == ['restaurant_id']
+    assert covering == ['restaurant_id', 'price']
@@ -0,0 +1,41 @@
+import pytest
+
+from cart import Cart
+from order import Order
+from utils.database import connection
+
+
+def add_membership(customer_id, membership_type, discount_rate, expiry='+30 days'):
+    with connection() as conn:
+        conn.execute('''
+            INSERT INTO Membership (customer_id, membership_type, discount_rate, expiry_date)
+            VALUES (?, ?, ?, date('now', ?))
+        ''', (customer_id, membership_type, discount_rate, expiry))
+        conn.commit()
+
+
+def stored_total(order_id):
+    with connection() as conn:
+        return tuple(conn.execute('SELECT membership_discount, total_amount FROM Orders WHERE id=?',
+                                  (order_id,)).fetchone())
+
+
+@pytest.mark.parametrize('memberships, rate', [
+    ([], 0),
+    ([('Premium', 0.15)], 0.15),
+    # The best active rate wins, and an expired membership does not count
+    ([('Basic', 0.05), ('Gold', 0.2), ('Premium', 0.5, '-1 day')], 0.2),
+])
+def test_cart_total_is_the_stored_order_total(customer, menu_item_ids, memberships, rate):
+    for membership in memberships:
+        add_membership(customer.customer_id, *membership)
+    cart = Cart(customer.customer_id)
+    cart.add_to_cart(menu_item_ids[0], 3)
+    cart.add_to_cart(menu_item_ids[3], 1)
+
+    shown = cart.calculate_total()
+    order_id = Order.place_orders([(customer.customer_id, cart.get_cart_items())])[0]
+
+    assert shown['subtotal'] == 3 * 100 + 103
+    assert shown['discount'] == round(shown['subtotal'] * rate, 2)
+    assert stored_total(order_id) == (shown['discount'], shown['total'])
@@ -0,0 +1,50 @@
+import pytest
+
+from conftest import signup_restaurant
+from menu import Menu
+from order import Order
+from utils.database import unit_of_work
+from utils.menu_cache import MenuCache, menu_cache
+
+
+def item_names(rows):
+    return sorted(row['item_name'] for row in rows)
+
+
+def test_repeat_reads_are_hits_and_writes_invalidate(db):
+    partner, _ = signup_restaurant('dosa', items=2)
+    menu = Menu(None, partner.restaurant_id)
+    before = menu_cache.stats()
+    first = menu.get_menu()
+    assert menu.get_menu() == first
+    stats = menu_cache.stats()
+    assert (stats['misses'] - before['misses'], stats['hits'] - before['hits']) == (1, 1)
+
+    assert menu.add_menu_item('Rava Dosa', 120, 'Semolina crepe', 1)
+    assert item_names(menu.get_menu()) == ['Rava Dosa', 'dosa dish 0', 'dosa dish 1']
+
+
+def test_rolled_back_write_is_never_cached(db):
+    partner, _ = signup_restaurant('dosa', items=1)
+    menu = Menu(None, partner.restaurant_id)
+    with pytest.raises(RuntimeError):
+        with unit_of_work():
+            assert menu.add_menu_item('Ghost Dosa', 99, 'Never sold', 1)
+            # Read inside the transaction sees the new item but must not cache it
+            assert 'Ghost Dosa' in item_names(menu.get_menu())
+            raise RuntimeError('abort')
+    assert item_names(menu.get_menu()) == ['dosa dish 0']
+
+
+def test_lru_is_bounded_by_entries_and_warm_up_loads_busy_restaurants(customer):
+    partners = [signup_restaurant(name, items=1) for name in ('dosa', 'idli', 'vada')]
+    cache = MenuCache(max_entries=2)
+    for partner, _ in partners:
+        cache.get(partner.restaurant_id)
+    assert cache.stats()['entries'] == 2 and cache.stats()['evictions'] == 1
+
+    Order.place_orders([(customer.customer_id, [(partners[2][1][0], 1)])])
+    warm = MenuCache()
+    assert warm.warm_up(restaurants=5) == 1
+    warm.get(partners[2][0].restaurant_id)
+    assert warm.stats()['hits'] == 1
@@ -0,0 +1,75 @@
+import sqlite3
+
+import pytest
+
+from utils import migrations
+from utils.migrations import get_schema_version, latest_version, migrate
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'schema.db'))
+    yield conn
+    conn.close()
+
+
+def migrate_to(conn, version, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(migrations, 'MIGRATIONS', [m for m in migrations.MIGRATIONS if m[0] <= version])
+        return migrate(conn)
+
+
+def test_fresh_database_is_migrated_once(conn):
+    assert migrate(conn) == [version for version, _, _ in migrations.MIGRATIONS]
+    assert get_schema_version(conn) == latest_version()
+    assert migrate(conn) == []
+
+
+def test_upgrade_keeps_existing_data(conn, monkeypatch):
+    migrate_to(conn, 1, monkeypatch)
+    conn.execute("INSERT INTO Users (username, password, name, email, user_type) "
+                 "VALUES ('asha', 'x', 'Asha Rao', 'asha@example.com', 'Customer')")
+    conn.commit()
+
+    assert migrate(conn) == list(range(2, latest_version() + 1))
+    assert conn.execute('SELECT username FROM Users').fetchall() == [('asha',)]
+
+
+def test_failed_migration_leaves_the_schema_untouched(conn, monkeypatch):
+    migrate_to(conn, 2, monkeypatch)
+    broken = (3, 'Broken', ['CREATE TABLE Half (id INTEGER)', 'SELECT * FROM NoSuchTable'])
+    monkeypatch.setattr(migrations, 'MIGRATIONS', migrations.MIGRATIONS[:2] + [broken])
+    conn.execute('PRAGMA foreign_keys=ON')
+
+    with pytest.raises(sqlite3.OperationalError):
+        migrate(conn)
+    assert get_schema_version(conn) == 2
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name='Half'").fetchone()[0] == 0
+    assert conn.execute('PRAGMA foreign_keys').fetchone()[0] == 1
+
+
+def test_cancelled_orders_rebuild_keeps_orders_their_references_and_indexes(conn, monkeypatch):
+    migrate_to(conn, 5, monkeypatch)
+    conn.executescript('''
+        INSERT INTO Users (id, username, password, name, email, user_type)
+        VALUES (1, 'asha', 'x', 'Asha Rao', 'asha@example.com', 'Customer');
+        INSERT INTO Customers (id, phone_number) VALUES (1, '5550100100');
+        INSERT INTO Restaurants (id, restaurant_name, address, cuisine_type) VALUES (1, 'Dosa Corner', 'Main Street', 'Indian');
+        INSERT INTO MenuItems (id, restaurant_id, item_name, price, item_type) VALUES (1, 1, 'Dosa', 100, 'Veg');
+        INSERT INTO Orders (id, customer_id, restaurant_id, order_status, order_date, total_amount)
+        VALUES (7, 1, 1, 'Pending', '2024-01-01', 100);
+        INSERT INTO OrderItems (order_id, menu_item_id, quantity, price) VALUES (7, 1, 1, 100);
+    ''')
+    indexes = conn.execute("SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='Orders'").fetchall()
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("UPDATE Orders SET order_status='Cancelled' WHERE id=7")
+
+    migrate_to(conn, 6, monkeypatch)
+
+    conn.execute("UPDATE Orders SET order_status='Cancelled' WHERE id=7")
+    assert conn.execute('SELECT id, total_amount FROM Orders').fetchall() == [(7, 100)]
+    assert conn.execute("SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='Orders'").fetchall() == indexes
+    conn.execute('PRAGMA foreign_keys=ON')
+    assert conn.execute('PRAGMA foreign_key_check').fetchall() == []
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("UPDATE Orders SET order_status='Lost' WHERE id=7")
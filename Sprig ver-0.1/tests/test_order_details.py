@@ -0,0 +1,52 @@
+import pytest
+
+from order import Order, load_order_details
+from utils.database import connection
+
+
+def count_statements(fn):
+    """
+    Runs fn() and returns its result and the SQL statements it executed on this thread's connection.
+    """
+    statements = []
+    with connection() as conn:
+        conn.set_trace_callback(statements.append)
+        try:
+            result = fn()
+        finally:
+            conn.set_trace_callback(None)
+    return result, statements
+
+
+@pytest.fixture
+def order_ids(customer, menu_item_ids):
+    ids = Order.place_orders([(customer.customer_id, [(menu_item_ids[n % 5], n % 3 + 1), (menu_item_ids[4], 1)])
+                              for n in range(600)])
+    with connection() as conn:
+        conn.executemany('''
+            INSERT INTO Payments (order_id, payment_method, payment_status, payment_date, amount)
+            VALUES (?, 'UPI', 'Completed', datetime('now'), 100)
+        ''', [(order_id,) for order_id in ids[::2]])
+        conn.commit()
+    return ids
+
+
+# Three queries per LOOKUP_CHUNK (500) ids
+@pytest.mark.parametrize('size, queries', [(1, 3), (10, 3), (600, 6)])
+def test_query_count_does_not_grow_with_the_batch(order_ids, size, queries):
+    batch = order_ids[:size]
+    details, statements = count_statements(lambda: load_order_details(batch))
+
+    assert len(statements) == queries
+    assert [d.order_id for d in details] == batch
+    assert all(len(d.items) == 2 for d in details)
+    # Every other order was paid
+    assert [d.payment_status for d in details] == ['Completed', None] * (size // 2) + ['Completed'] * (size % 2)
+
+
+def test_matches_per_order_details(order_ids):
+    batch = order_ids[:10]
+    for d in load_order_details(batch):
+        lines, _ = Order(d.order_id, None, None, None).get_order_details()
+        assert [(line.menu_item_id, line.quantity, line.item_name) for line in d.items] == \
+            [tuple(row) for row in lines]
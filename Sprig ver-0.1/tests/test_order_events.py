@@ -0,0 +1,62 @@
+import pytest
+
+import order as order_module
+from conftest import signup_restaurant
+from order import Order, change_order_status
+from utils.database import unit_of_work
+
+
+class Clock:
+    def __init__(self, start):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(1_700_000_000_000)
+    monkeypatch.setattr(order_module, 'now_ms', clock)
+    return clock
+
+
+def test_every_change_is_logged_with_its_actor(customer, clock):
+    partner, menu_item_ids = signup_restaurant('dosa')
+    order_id = Order.place_orders([(customer.customer_id, [(menu_item_ids[0], 1)])])[0]
+    clock.now += 60_000
+    assert partner.update_order_status(order_id, 'Preparing')
+    clock.now += 600_000
+    assert partner.update_order_status(order_id, 'Cancelled')
+
+    history = [tuple(row) for row in Order(order_id, None, None, None).get_status_history()]
+    start = 1_700_000_000_000
+    assert history == [(1, None, 'Pending', 'customer', start),
+                       (2, 'Pending', 'Preparing', 'restaurant', start + 60_000),
+                       (3, 'Preparing', 'Cancelled', 'restaurant', start + 660_000)]
+    # Time in the final status is not counted
+    clock.now += 3_600_000
+    assert Order(order_id, None, None, None).time_in_states() == {'Pending': 60_000, 'Preparing': 600_000}
+
+
+def test_time_in_states_counts_the_current_status_until_now(customer, clock):
+    partner, menu_item_ids = signup_restaurant('dosa')
+    order_ids = Order.place_orders([(customer.customer_id, [(menu_item_ids[0], 1)])] * 2)
+    clock.now += 30_000
+    assert partner.update_order_status(order_ids[0], 'Preparing')
+    clock.now += 90_000
+
+    stats = partner.time_in_states()
+    assert stats['Pending'] == {'orders': 2, 'total_ms': 150_000, 'avg_ms': 75_000.0, 'max_ms': 120_000}
+    assert stats['Preparing'] == {'orders': 1, 'total_ms': 90_000, 'avg_ms': 90_000.0, 'max_ms': 90_000}
+
+
+def test_event_rolls_back_with_the_status(customer, menu_item_ids):
+    order_id = Order.place_orders([(customer.customer_id, [(menu_item_ids[0], 1)])])[0]
+    with pytest.raises(RuntimeError):
+        with unit_of_work() as cursor:
+            assert change_order_status(cursor, order_id, 'Preparing', 'Pending', 'restaurant')
+            raise RuntimeError('payment service down')
+    order = Order(order_id, None, None, None)
+    assert order.track_order() == 'Pending'
+    assert [row['seq'] for row in order.get_status_history()] == [1]
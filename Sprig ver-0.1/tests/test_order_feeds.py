@@ -0,0 +1,58 @@
+from conftest import signup_restaurant
+from delivery_partner import DeliveryPartner
+from order import Order, order_watermark
+from utils.database import connection
+
+
+def ids(changes):
+    return [row['id'] for row in changes]
+
+
+def test_feed_returns_only_what_changed_since_the_watermark(customer):
+    partner, menu_item_ids = signup_restaurant('dosa')
+    other, other_menu_item_ids = signup_restaurant('idli')
+    order_ids = Order.place_orders([(customer.customer_id, [(menu_item_ids[0], 1)])] * 3)
+    Order.place_orders([(customer.customer_id, [(other_menu_item_ids[0], 1)])])
+
+    changes = partner.view_order_changes()
+    assert ids(changes) == order_ids and not changes.has_more
+    assert ids(partner.view_order_changes(changes.watermark)) == []
+
+    assert partner.update_order_status(order_ids[1], 'Preparing')
+    assert other.view_order_changes(0).watermark < partner.view_order_changes(changes.watermark).watermark
+    later = partner.view_order_changes(changes.watermark)
+    assert ids(later) == [order_ids[1]] and later[0]['order_status'] == 'Preparing'
+
+
+def test_feed_pages_with_has_more(customer):
+    partner, menu_item_ids = signup_restaurant('dosa')
+    order_ids = Order.place_orders([(customer.customer_id, [(menu_item_ids[0], 1)])] * 5)
+    first = partner.view_order_changes(limit=2)
+    second = partner.view_order_changes(first.watermark, limit=2)
+    third = partner.view_order_changes(second.watermark, limit=2)
+    assert (first.has_more, second.has_more, third.has_more) == (True, True, False)
+    assert ids(first) + ids(second) + ids(third) == order_ids
+
+
+def test_every_insert_and_update_takes_a_new_sequence_value(customer):
+    partner, menu_item_ids = signup_restaurant('dosa')
+    rider = DeliveryPartner.signup('ravi', 'Secret#123', 'Ravi', 'Bike', 'KA01AB1234')
+    with connection() as conn:
+        start = order_watermark(conn.cursor())
+        # A single-row insert outside insert_orders is numbered by the trigger
+        conn.execute('''
+            INSERT INTO Orders (customer_id, restaurant_id, order_status, order_date)
+            VALUES (?, ?, 'Pending', datetime('now'))
+        ''', (customer.customer_id, partner.restaurant_id))
+        conn.commit()
+    bulk = Order.place_orders([(customer.customer_id, [(menu_item_ids[0], 1)])] * 3)
+    assert rider.accept_order(bulk[0])
+
+    with connection() as conn:
+        seqs = [row[0] for row in conn.execute('SELECT change_seq FROM Orders ORDER BY change_seq')]
+        assert len(set(seqs)) == len(seqs) == 4
+        # The bulk insert took start+2..start+4; accepting its first order moved that one to start+5
+        assert seqs == [start + 1, start + 3, start + 4, start + 5]
+        assert order_watermark(conn.cursor()) == start + 5
+    # The assignment shows up in the rider's feed
+    assert ids(rider.view_assigned_order_changes()) == [bulk[0]]
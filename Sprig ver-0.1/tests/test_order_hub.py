@@ -0,0 +1,55 @@
+import asyncio
+import gc
+
+import pytest
+
+from order import Order
+from utils.order_hub import OrderHub, Subscription
+
+
+@pytest.fixture
+def order_id(customer, menu_item_ids):
+    return Order.place_orders([(customer.customer_id, [(menu_item_ids[0], 1)])])[0]
+
+
+def test_abandoned_async_subscription_is_unregistered(order_id):
+    hub = OrderHub()
+
+    async def read_snapshot_and_stop():
+        async for event in hub.subscribe(order_id):
+            return event
+
+    assert asyncio.run(read_snapshot_and_stop())['to_status'] == 'Pending'
+    gc.collect()
+    assert hub.stats()['subscribers'] == 0
+    assert hub._subscribers == {}
+
+
+def test_aclose_unregisters(order_id):
+    hub = OrderHub()
+
+    async def read_and_close():
+        subscription = hub.subscribe(order_id)
+        await subscription.__anext__()
+        assert hub.stats()['subscribers'] == 1
+        await subscription.aclose()
+        return hub.stats()['subscribers']
+
+    assert asyncio.run(read_and_close()) == 0
+
+
+def test_abandoned_queue_subscription_is_unregistered(order_id):
+    hub = OrderHub()
+    subscription = hub.subscribe_queue(order_id)
+    assert subscription.get(timeout=1)['to_status'] == 'Pending'
+    del subscription
+    gc.collect()
+    assert hub.stats()['subscribers'] == 0
+
+
+def test_subscription_without_a_wake_up_cannot_be_created(db):
+    class Silent(Subscription):
+        pass
+
+    with pytest.raises(TypeError):
+        Silent(OrderHub(), 1, 4)
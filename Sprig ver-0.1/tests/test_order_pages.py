@@ -0,0 +1,69 @@
+from conftest import signup_restaurant
+from order import MAX_PAGE_SIZE, Order
+from utils.database import connection
+
+
+def place_dated(customer, menu_item_id, dates):
+    order_ids = Order.place_orders([(customer.customer_id, [(menu_item_id, 1)])] * len(dates))
+    with connection() as conn:
+        conn.executemany('UPDATE Orders SET order_date=? WHERE id=?', list(zip(dates, order_ids)))
+        conn.commit()
+    return order_ids
+
+
+def all_pages(fetch, **filters):
+    pages, after = [], None
+    while True:
+        page = fetch(after=after, **filters)
+        pages.append([row['id'] for row in page])
+        if page.next_cursor is None:
+            return pages
+        after = page.next_cursor
+
+
+def test_pages_walk_every_order_once_newest_first(customer):
+    partner, menu_item_ids = signup_restaurant('dosa')
+    # Several orders share a date, so the id breaks the tie
+    dates = [f"2024-01-{day:02d} 12:00:00" for day in (1, 1, 2, 3, 3, 3, 4, 5, 5, 6, 7, 7)]
+    order_ids = place_dated(customer, menu_item_ids[0], dates)
+    newest_first = [order_id for _, order_id in sorted(zip(dates, order_ids), reverse=True)]
+
+    pages = all_pages(lambda **kw: customer.view_order_history(limit=5, **kw))
+    assert pages == [newest_first[:5], newest_first[5:10], newest_first[10:]]
+    assert sum(all_pages(lambda **kw: partner.view_orders(limit=4, **kw)), []) == newest_first
+
+
+def test_new_orders_do_not_shift_later_pages(customer):
+    _, menu_item_ids = signup_restaurant('dosa')
+    place_dated(customer, menu_item_ids[0], [f"2024-01-{day:02d}" for day in range(1, 9)])
+    first = customer.view_order_history(limit=4)
+    place_dated(customer, menu_item_ids[0], ['2024-02-01'])
+    second = customer.view_order_history(after=first.next_cursor, limit=4)
+    assert [row['order_date'] for row in second] == [f"2024-01-{day:02d}" for day in (4, 3, 2, 1)]
+
+
+def test_filters_and_limit(customer):
+    partner, menu_item_ids = signup_restaurant('dosa')
+    order_ids = place_dated(customer, menu_item_ids[0], [f"2024-01-{day:02d}" for day in range(1, 11)])
+    for order_id in order_ids[::2]:
+        assert partner.update_order_status(order_id, 'Preparing')
+
+    preparing = sum(all_pages(lambda **kw: partner.view_orders(limit=2, status='Preparing', **kw)), [])
+    assert preparing == order_ids[::2][::-1]
+    january_3_to_5 = customer.view_order_history(since='2024-01-03', until='2024-01-06')
+    assert [row['id'] for row in january_3_to_5] == order_ids[2:5][::-1]
+    both = customer.view_order_history(status=['Pending', 'Preparing'], limit=10 ** 6)
+    assert len(both) == 10 and both.next_cursor is None
+    assert len(customer.view_order_history(limit=0)) == 1
+
+
+def test_page_query_reads_the_index_in_order(customer):
+    with connection() as conn:
+        plan = [row[3] for row in conn.execute('''
+            EXPLAIN QUERY PLAN
+            SELECT Orders.id, Orders.order_date FROM Orders
+            WHERE Orders.customer_id=? AND (Orders.order_date, Orders.id) < (?, ?)
+            ORDER BY Orders.order_date DESC, Orders.id DESC LIMIT ?
+        ''', (customer.customer_id, '2024-01-01', 10, MAX_PAGE_SIZE))]
+    assert any('idx_orders_customer_id_order_date' in detail for detail in plan)
+    assert not any('TEMP B-TREE' in detail for detail in plan)
@@ -0,0 +1,78 @@
+import threading
+
+from conftest import signup_restaurant
+from delivery_partner import DeliveryPartner
+from order import Order, change_order_status
+from utils.database import connection
+from utils.group_commit import write
+
+
+def place(customer, menu_item_id):
+    return Order.place_orders([(customer.customer_id, [(menu_item_id, 1)])])[0]
+
+
+def status_and_events(order_id):
+    with connection() as conn:
+        status = conn.execute('SELECT order_status FROM Orders WHERE id=?', (order_id,)).fetchone()[0]
+        events = [tuple(row) for row in conn.execute(
+            'SELECT seq, from_status, to_status FROM OrderEvents WHERE order_id=? ORDER BY seq', (order_id,))]
+    return status, events
+
+
+def test_update_from_a_stale_status_loses(customer, menu_item_ids):
+    order_id = place(customer, menu_item_ids[0])
+    kitchen = Order(order_id, customer.customer_id, None, 'Pending')
+    # Loaded while the order was still Pending
+    stale = Order(order_id, customer.customer_id, None, 'Pending')
+
+    assert kitchen.update_order_status('Preparing')
+    assert not stale.cancel_order()
+    assert stale.status == 'Pending'
+    assert status_and_events(order_id) == ('Preparing', [(1, None, 'Pending'), (2, 'Pending', 'Preparing')])
+
+
+def test_only_one_of_concurrent_updates_wins(customer, menu_item_ids):
+    order_id = place(customer, menu_item_ids[0])
+    start = threading.Barrier(8)
+    results = []
+
+    def race(to_status):
+        start.wait()
+        results.append(write(change_order_status, order_id, to_status, 'Pending'))
+
+    threads = [threading.Thread(target=race, args=(('Preparing', 'Cancelled')[n % 2],)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [False] * 7 + [True]
+    status, events = status_and_events(order_id)
+    assert len(events) == 2 and events[1] == (2, 'Pending', status)
+
+
+def test_transitions_are_scoped_to_the_actor(customer, db):
+    partner, menu_item_ids = signup_restaurant('dosa')
+    other, _ = signup_restaurant('idli')
+    rider = DeliveryPartner.signup('ravi', 'Secret#123', 'Ravi', 'Bike', 'KA01AB1234')
+    order_id = place(customer, menu_item_ids[0])
+
+    # Another restaurant, a rider who was not assigned, and a rider skipping the kitchen all fail
+    assert not other.update_order_status(order_id, 'Preparing')
+    assert not rider.update_order_status(order_id, 'Out for Delivery')
+    assert rider.accept_order(order_id)
+    assert not rider.update_order_status(order_id, 'Preparing')
+    assert partner.update_order_status(order_id, 'Preparing')
+    assert not partner.update_order_status(order_id, 'Delivered')
+    assert rider.update_order_status(order_id, 'Out for Delivery')
+    assert rider.update_order_status(order_id, 'Delivered')
+    # Delivered is final
+    assert not partner.update_order_status(order_id, 'Cancelled')
+    assert status_and_events(order_id)[0] == 'Delivered'
+
+
+def test_customer_can_cancel_a_pending_order(customer, menu_item_ids):
+    order_id = place(customer, menu_item_ids[0])
+    order = Order(order_id, customer.customer_id, None, 'Pending')
+    assert order.cancel_order()
+    assert status_and_events(order_id) == ('Cancelled', [(1, None, 'Pending'), (2, 'Pending', 'Cancelled')])
@@ -0,0 +1,37 @@
+import sqlite3
+
+import pytest
+
+from utils import database
+
+# PRAGMA synchronous reports its level as a number
+SYNCHRONOUS = {'OFF': 0, 'NORMAL': 1, 'FULL': 2}
+
+
+def settings(conn):
+    return {pragma: conn.execute(f"PRAGMA {pragma}").fetchone()[0]
+            for pragma in ('journal_mode', 'synchronous', 'cache_size', 'busy_timeout')}
+
+
+@pytest.mark.parametrize('profile', sorted(database.PROFILES))
+def test_pooled_connections_use_the_configured_profile(db, tmp_path, monkeypatch, profile):
+    monkeypatch.setattr(database, 'PROFILE', database.PROFILE)
+    database.configure_pool(database=str(tmp_path / f"{profile}.db"), profile=profile)
+    expected = database.PROFILES[profile]
+    with database.connection() as conn:
+        assert settings(conn) == {'journal_mode': expected['journal_mode'].lower(),
+                                  'synchronous': SYNCHRONOUS[expected['synchronous']],
+                                  'cache_size': expected['cache_size'],
+                                  'busy_timeout': expected['busy_timeout']}
+
+
+def test_custom_profile_and_unknown_name(db, tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'custom.db'))
+    database.apply_profile(conn, {'synchronous': 'OFF', 'cache_size': -1234})
+    assert settings(conn)['synchronous'] == 0 and settings(conn)['cache_size'] == -1234
+    conn.close()
+    with pytest.raises(ValueError):
+        database.configure_pool(profile='fastest')
+    # The pool in use is left open
+    with database.connection() as conn:
+        assert conn.execute('SELECT 1').fetchone()[0] == 1
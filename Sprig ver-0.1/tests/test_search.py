@@ -0,0 +1,59 @@
+from restaurant import Restaurant, build_match_query
+from utils.database import connection
+
+
+def seed_menu():
+    with connection() as conn:
+        cafe = conn.execute("INSERT INTO Restaurants (restaurant_name, address, cuisine_type) "
+                            "VALUES ('Café Dosa', 'Main Street', 'South Indian')").lastrowid
+        grill = conn.execute("INSERT INTO Restaurants (restaurant_name, address, cuisine_type) "
+                             "VALUES ('Grill House', 'Main Street', 'Barbecue')").lastrowid
+        conn.executemany('''
+            INSERT INTO MenuItems (restaurant_id, item_name, item_description, price, item_type)
+            VALUES (?, ?, ?, ?, 'Veg')
+        ''', [(cafe, 'Masala Dosa', 'Crisp crepe with potato', 90),
+              (cafe, 'Filter Coffee', 'Served with a dosa of the day', 40),
+              (grill, 'Paneer Tikka', 'Smoky cottage cheese', 180)])
+        conn.commit()
+    return cafe, grill
+
+
+def titles(hits):
+    return [(hit['kind'], hit['title']) for hit in hits]
+
+
+def test_title_matches_rank_above_description_matches(db):
+    seed_menu()
+    hits = Restaurant.search('dosa')
+    assert titles(hits) == [('restaurant', 'Café Dosa'), ('item', 'Masala Dosa'), ('item', 'Filter Coffee')]
+    assert hits[1]['price'] == 90 and hits[1]['restaurant_name'] == 'Café Dosa'
+
+
+def test_prefixes_diacritics_and_every_word(db):
+    seed_menu()
+    assert titles(Restaurant.search('cafe')) == [('restaurant', 'Café Dosa')]
+    assert titles(Restaurant.search('pan tik')) == [('item', 'Paneer Tikka')]
+    assert Restaurant.search('paneer dosa') == []
+    # Quotes and brackets are not FTS syntax, and OR is just another word
+    assert titles(Restaurant.search('"tikka" (')) == [('item', 'Paneer Tikka')]
+    assert Restaurant.search('tikka OR dosa') == []
+    assert Restaurant.search('  !! ') == [] and build_match_query('') == ''
+
+
+def test_index_follows_menu_and_restaurant_changes(db):
+    cafe, grill = seed_menu()
+    with connection() as conn:
+        conn.execute("UPDATE MenuItems SET item_name='Tandoori Paneer' WHERE item_name='Paneer Tikka'")
+        conn.execute("DELETE FROM MenuItems WHERE item_name='Filter Coffee'")
+        conn.execute("UPDATE Restaurants SET cuisine_type='Tandoor' WHERE id=?", (grill,))
+        conn.commit()
+    assert Restaurant.search('tikka') == []
+    # The dish matches on its title, the restaurant only on its cuisine
+    assert titles(Restaurant.search('tandoor')) == [('item', 'Tandoori Paneer'), ('restaurant', 'Grill House')]
+    assert titles(Restaurant.search('dosa')) == [('restaurant', 'Café Dosa'), ('item', 'Masala Dosa')]
+
+
+def test_pages(db):
+    seed_menu()
+    everything = Restaurant.search('dosa')
+    assert Restaurant.search('dosa', limit=2) + Restaurant.search('dosa', limit=2, offset=2) == everything
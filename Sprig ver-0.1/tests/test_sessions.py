@@ -0,0 +1,43 @@
+from utils import sessions
+from utils.database import connection
+from utils.sessions import SessionStore
+
+
+class Clock:
+    def __init__(self, start):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+
+def stored_sessions():
+    with connection() as conn:
+        return conn.execute('SELECT COUNT(*) FROM Sessions').fetchone()[0]
+
+
+def test_session_in_use_survives_a_sweep(customer, monkeypatch):
+    clock = Clock(1_000_000_000)
+    monkeypatch.setattr(sessions, 'now_ms', clock)
+    store = SessionStore(ttl_s=60, touch_s=30)
+    token = store.create(customer.customer_id, 'Customer')
+    idle = store.create(customer.customer_id, 'Customer')
+
+    # Used 20 s in: the expiry slides to 80 s in memory, but is not written back yet
+    clock.now += 20_000
+    assert store.validate(token) is not None
+    clock.now += 41_000
+    assert store.sweep() == 0
+    assert stored_sessions() == 2
+
+    # The next use writes the slid expiry back and finds its row
+    clock.now += 9_000
+    session = store.validate(token)
+    assert session is not None and session.stored_expires_at == clock.now + 60_000
+    assert store.validate(idle) is None
+
+    # Unused past its expiry plus the touch interval, the row goes
+    clock.now += 91_000
+    assert store.sweep() == 1
+    assert store.validate(token) is None
+    assert stored_sessions() == 0
@@ -0,0 +1,65 @@
+from cart import Cart
+from customer import Customer
+from payment import Payment
+from utils.cart_store import CartStore
+from utils.database import connection, get_pool
+
+
+def commits():
+    return get_pool().stats()['commits']
+
+
+def test_signup_is_one_commit(db):
+    before = commits()
+    customer = Customer.signup('ravi', 'Secret#123', 'Ravi Kumar', 'ravi@example.com', '5550100101')
+    assert customer is not None
+    assert commits() - before == 1
+
+
+def test_place_order_is_one_commit(customer, menu_item_ids):
+    store = CartStore(flush_batch=1000, flush_ms=60000)
+    cart = store.get(customer.customer_id)
+    cart.add_to_cart(menu_item_ids[0], 2)
+    store.flush()
+    cart.add_to_cart(menu_item_ids[1], 1)
+
+    before = commits()
+    order_id = customer.place_order(cart)
+    assert order_id is not None
+    assert commits() - before == 1
+    with connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM CartItems WHERE cart_id=?', (cart.cart_id,)).fetchone()[0] == 0
+
+
+def test_checkout_is_one_commit(customer, menu_item_ids):
+    cart = Cart(customer.customer_id)
+    cart.add_to_cart(menu_item_ids[0], 1)
+
+    before = commits()
+    payment = Payment.checkout(customer, cart, 'UPI', 100)
+    assert payment is not None and payment.payment_id is not None
+    assert commits() - before == 1
+    assert cart.get_cart_items() == []
+
+
+def test_failed_checkout_commits_nothing(customer):
+    before = commits()
+    assert Payment.checkout(customer, Cart(customer.customer_id), 'UPI', 0) is None
+    assert commits() == before
+
+
+def test_checkout_rejects_an_amount_other_than_the_order_total(customer, menu_item_ids):
+    cart = Cart(customer.customer_id)
+    cart.add_to_cart(menu_item_ids[0], 2)
+
+    before = commits()
+    assert Payment.checkout(customer, cart, 'UPI', 1) is None
+    assert Payment.checkout(customer, cart, 'UPI', None) is None
+    assert commits() == before
+    assert cart.get_cart_items() == [(menu_item_ids[0], 2)]
+    with connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM Orders').fetchone()[0] == 0
+        assert conn.execute('SELECT COUNT(*) FROM Payments').fetchone()[0] == 0
+
+    payment = Payment.checkout(customer, cart, 'UPI', 200)
+    assert payment is not None and payment.amount == 200
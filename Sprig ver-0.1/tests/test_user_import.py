@@ -0,0 +1,63 @@
+from utils import hashing
+from utils.database import connection
+from utils.user_import import import_users
+
+
+def customer_row(n, **overrides):
+    row = {'username': f"guest{n}", 'password': 'Secret#123', 'name': 'Guest User',
+           'email': f"guest{n}@example.com", 'phone': f"55501{n:05d}"}
+    row.update(overrides)
+    return row
+
+
+def imported_usernames():
+    with connection() as conn:
+        return {row[0] for row in conn.execute("SELECT username FROM Users WHERE username LIKE 'guest%'")}
+
+
+def test_user_added_meanwhile_is_rejected_and_the_rest_of_the_chunk_inserts(db):
+    # Inserted behind the availability filter's back, as another process would
+    with connection() as conn:
+        conn.execute('''
+            INSERT INTO Users (username, password, name, email, user_type)
+            VALUES ('guest3', 'x', 'Someone Else', 'other@example.com', 'Customer')
+        ''')
+        conn.commit()
+
+    report = import_users(enumerate((customer_row(n) for n in range(1, 7)), 1), 'Customer', chunk_size=10)
+
+    assert report.imported == 5
+    assert report.errors == [(3, 'guest3', 'Username or email already exists.')]
+    assert imported_usernames() == {f"guest{n}" for n in range(1, 7)}
+    with connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM Customers").fetchone()[0] == 5
+
+
+def test_invalid_and_repeated_rows_are_reported_before_hashing(db):
+    rows = [customer_row(1), customer_row(2, password='short'), customer_row(1, email='again@example.com'),
+            customer_row(4, password='Aa1#' + 'x' * 69), customer_row(5)]
+
+    report = import_users(enumerate(rows, 1), 'Customer', chunk_size=2)
+
+    assert report.imported == 2
+    assert [(row_number, username) for row_number, username, _ in report.errors] == \
+        [(2, 'guest2'), (3, 'guest1'), (4, 'guest4')]
+    assert report.errors[2][2] == 'Password must be at most 72 bytes long.'
+    assert imported_usernames() == {'guest1', 'guest5'}
+
+
+def test_password_the_hasher_rejects_fails_only_its_row(db, monkeypatch):
+    class PickyHasher(hashing.BcryptHasher):
+        def hash(self, password):
+            if password == b'Reject#123':
+                raise ValueError('unsupported password')
+            return super().hash(password)
+
+    monkeypatch.setattr(hashing.password_hasher, 'hasher', PickyHasher(4))
+    rows = [customer_row(1), customer_row(2, password='Reject#123'), customer_row(3)]
+
+    report = import_users(enumerate(rows, 1), 'Customer')
+
+    assert report.imported == 2
+    assert report.errors == [(2, 'guest2', 'Password could not be hashed: unsupported password')]
+    assert imported_usernames() == {'guest1', 'guest3'}
@@ -8,17 +8,47 @@ email: Email of the user.
 password: Hashed password for secure login.
 Methods:
 register(): Registers a new user.
-login(): Authenticates a user based on email and password.
+is_username_available(): Checks a username is free, usually without a query.
+login(): Authenticates a user based on email and password, upgrading an outdated password hash.
+authenticate(token): Identifies a user from a session token issued at login, without a password check.
 logout(): Ends the user's session.
 Inheritance: Customer, RestaurantPartner, and DeliveryPartner inherit from this class.
 
 '''
 
 import sqlite3
-import bcrypt
+from utils.availability import is_username_available, user_availability
+from utils.database import connection, in_unit_of_work, unit_of_work
+from utils.hashing import HashingBusy, hash_password, verify_password
+from utils.sessions import session_store
 
 
-DATABASE = 'sprig.db'
+def verify_login(user_id, password, stored):
+    """
+    Checks password against the user's stored hash. After a successful check a hash in an
+    outdated algorithm or cost is replaced, unless the password changed in the meantime.
+    """
+    matches, new_hash = verify_password(password, stored)
+    if matches and new_hash is not None:
+        try:
+            with unit_of_work() as cursor:
+                cursor.execute('UPDATE Users SET password=? WHERE id=? AND password=?', (new_hash, user_id, stored))
+        except sqlite3.Error as e:
+            # The old hash still works, so the login goes ahead
+            print(f"Database error during password upgrade: {e}")
+    return matches
+
+
+def is_taken(username, email):
+    """
+    Returns True, after telling the user, if the username or email already belongs to
+    someone. Signups call it before hashing, so a taken name costs no password hash.
+    """
+    username_free, email_free = user_availability.check(username, email)
+    if not (username_free and email_free):
+        print("Username or email already exists.")
+        return True
+    return False
 
 
 class User:
@@ -27,53 +57,90 @@ class User:
         self.password = password
         self.name = name
         self.email = email
+        # Set by login; from_session() on the subclasses turns it back into a user
+        self.session_token = None
 
-    def register(self):
+    def register(self, user_type='Customer', hashed_password=None):
         """
-        Registers a new user.
+        Registers a new user and returns its id.
+        Inside a unit of work errors propagate so the whole operation rolls back; callers
+        that open one should hash the password first so the transaction is not held open
+        while it is hashed.
         """
+        if hashed_password is None:
+            hashed_password = hash_password(self.password)
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            hashed_password = bcrypt.hashpw(self.password.encode('utf-8'), bcrypt.gensalt())
-            cursor.execute('''
-                INSERT INTO Users (username, password, name, email)
-                VALUES (?, ?, ?, ?)
-            ''', (self.username, hashed_password, self.name, self.email))
-            conn.commit()
-            conn.close()
+            with unit_of_work() as cursor:
+                cursor.execute('''
+                    INSERT INTO Users (username, password, name, email, user_type)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (self.username, hashed_password, self.name, self.email, user_type))
+                user_id = cursor.lastrowid
+                user_availability.add(self.username, self.email)
             print(f"User {self.username} registered successfully.")
+            return user_id
         except sqlite3.Error as e:
+            if in_unit_of_work():
+                raise
             print(f"Database error during user registration: {e}")
+            return None
+
+    @staticmethod
+    def is_username_available(username):
+        """
+        Returns whether no user has this username yet.
+        """
+        return is_username_available(username)
 
     @staticmethod
     def login(username, password):
+        """
+        Checks a username and password and returns the user's details with a new
+        session_token, or None.
+        """
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, username, password, name, email, user_type 
-                FROM Users 
-                WHERE username=?
-            ''', (username,))
-            user = cursor.fetchone()
-            conn.close()
+            with connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT id, username, password, name, email, user_type 
+                    FROM Users 
+                    WHERE username=?
+                ''', (username,))
+                user = cursor.fetchone()
             
-            if user and bcrypt.checkpw(password.encode('utf-8'), user[2]):
+            if user and verify_login(user[0], password, user[2]):
                 return {
                     'id': user[0],
                     'username': user[1],
                     'name': user[3],
                     'email': user[4],
-                    'user_type': user[5]
+                    'user_type': user[5],
+                    'session_token': session_store.create(user[0], user[5]),
                 }
             return None
         except sqlite3.Error as e:
             print(f"Database error during login: {e}")
             return None
+        except HashingBusy as e:
+            print(f"Login is busy, please try again: {e}")
+            return None
+
+    @staticmethod
+    def authenticate(token, user_type=None):
+        """
+        Returns the Session for a token issued by login, or None if it is unknown, expired,
+        revoked or (with user_type) belongs to another kind of user. No password is checked.
+        """
+        session = session_store.validate(token)
+        if session is None or (user_type is not None and session.user_type != user_type):
+            return None
+        return session
 
     def logout(self):
         """
         Ends the user's session.
         """
+        if self.session_token is not None:
+            session_store.revoke(self.session_token)
+            self.session_token = None
         print(f"User {self.username} logged out successfully.")
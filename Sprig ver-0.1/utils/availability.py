@@ -0,0 +1,178 @@
+'''
+Username and email availability
+Purpose: Answers "is this username/email taken?" without a query in the common case,
+so signups can turn away taken names before spending a password hash on them.
+Bloom filters of every username and email in Users are built on first use (or by
+rebuild() at startup) and updated as users are inserted. A filter miss means the
+value is certainly free and needs no query; a hit may be a false positive and is
+confirmed with one query on the unique indexes. Filters are sized for
+SPRIG_BLOOM_FP_RATE at twice the current user count (at least SPRIG_BLOOM_CAPACITY)
+and rebuilt once that capacity is used up. Users added while a rebuild reads Users are
+recorded and replayed into the new filters before they replace the old ones.
+
+Users inserted by other processes are not in this process's filters until the next
+rebuild; the UNIQUE constraints still reject them at insert time.
+stats() reports lookups answered by the filter, confirmations and false positives.
+
+'''
+
+import hashlib
+import math
+import os
+import threading
+
+from utils.database import connection
+
+FP_RATE = float(os.environ.get('SPRIG_BLOOM_FP_RATE', '0.01'))
+MIN_CAPACITY = int(os.environ.get('SPRIG_BLOOM_CAPACITY', '100000'))
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings with k hash positions per value.
+    """
+
+    def __init__(self, capacity, fp_rate=FP_RATE):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class UserAvailability:
+    """
+    Bloom filters of taken usernames and emails with a confirming query on probable hits.
+    """
+
+    def __init__(self, fp_rate=FP_RATE, min_capacity=MIN_CAPACITY):
+        self.fp_rate = fp_rate
+        self.min_capacity = min_capacity
+        self._usernames = None
+        self._emails = None
+        self._lock = threading.Lock()
+        # One list per running rebuild, collecting the users added while it reads Users
+        self._rebuilds = []
+        self._filter_answers = 0
+        self._confirmations = 0
+        self._false_positives = 0
+
+    def rebuild(self):
+        """
+        Rebuilds both filters from Users and returns how many users they hold.
+        """
+        added = []
+        with self._lock:
+            self._rebuilds.append(added)
+        try:
+            with connection() as conn:
+                count = conn.execute('SELECT COUNT(*) FROM Users').fetchone()[0]
+                capacity = max(self.min_capacity, count * 2)
+                usernames, emails = BloomFilter(capacity, self.fp_rate), BloomFilter(capacity, self.fp_rate)
+                for username, email in conn.execute('SELECT username, email FROM Users'):
+                    usernames.add(username)
+                    emails.add(email)
+        except BaseException:
+            with self._lock:
+                self._rebuilds.remove(added)
+            raise
+        with self._lock:
+            self._rebuilds.remove(added)
+            # Users added during the read may be missing from it; one read twice only costs a count
+            for username, email in added:
+                usernames.add(username)
+                emails.add(email)
+            self._usernames, self._emails = usernames, emails
+        return count
+
+    def _filters(self):
+        if self._usernames is None:
+            self.rebuild()
+        return self._usernames, self._emails
+
+    def add(self, username, email):
+        """
+        Records a user being inserted. Call it before the insert commits: a user whose
+        insert rolls back only costs an extra confirming query later.
+        """
+        self._filters()
+        with self._lock:
+            usernames = self._usernames
+            usernames.add(username)
+            self._emails.add(email)
+            for added in self._rebuilds:
+                added.append((username, email))
+            full = usernames.count > usernames.capacity
+        if full:
+            self.rebuild()
+
+    def check(self, username=None, email=None):
+        """
+        Returns (username_available, email_available), with None for a value not given.
+        Runs at most one query, and none when the filters rule both values out.
+        """
+        usernames, emails = self._filters()
+        maybe_username = username is not None and username in usernames
+        maybe_email = email is not None and email in emails
+        with self._lock:
+            self._filter_answers += (username is not None and not maybe_username) + (email is not None and not maybe_email)
+        username_free = None if username is None else True
+        email_free = None if email is None else True
+        if maybe_username or maybe_email:
+            with connection() as conn:
+                taken_username, taken_email = conn.execute('''
+                    SELECT coalesce(MAX(username = ?), 0), coalesce(MAX(email = ?), 0)
+                    FROM Users WHERE username = ? OR email = ?
+                ''', (username, email, username, email)).fetchone()
+            if maybe_username:
+                username_free = not taken_username
+            if maybe_email:
+                email_free = not taken_email
+            with self._lock:
+                self._confirmations += maybe_username + maybe_email
+                self._false_positives += (maybe_username and not taken_username) + (maybe_email and not taken_email)
+        return username_free, email_free
+
+    def stats(self):
+        with self._lock:
+            usernames = self._usernames
+            return {
+                'users': usernames.count if usernames else 0,
+                'capacity': usernames.capacity if usernames else 0,
+                'bits': usernames.size if usernames else 0,
+                'hashes': usernames.hashes if usernames else 0,
+                'filter_answers': self._filter_answers,
+                'confirmations': self._confirmations,
+                'false_positives': self._false_positives,
+            }
+
+
+user_availability = UserAvailability()
+
+
+def is_username_available(username):
+    """
+    Returns whether no user has this username.
+    """
+    return user_availability.check(username=username)[0]
+
+
+def is_email_available(email):
+    """
+    Returns whether no user has this email.
+    """
+    return user_availability.check(email=email)[1]
@@ -0,0 +1,253 @@
+'''
+Cart store
+Purpose: Keeps customers' carts across calls and restarts using the Carts and CartItems tables.
+Each customer has one in-memory working copy, loaded lazily from the database the first
+time it is asked for. Cart changes are recorded as dirty lines and written through in
+batches: a flush runs once SPRIG_CART_FLUSH_BATCH changes are pending or
+SPRIG_CART_FLUSH_MS after the first unflushed change, whichever comes first. Repeated
+changes to the same line between flushes cost a single upsert.
+
+Changes still pending when the process crashes are lost; flush() is also run at exit.
+stats() reports rows written per cart change (write amplification).
+
+'''
+
+import atexit
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from cart import Cart
+from utils.database import connection, in_unit_of_work, on_commit, on_rollback, unit_of_work
+
+FLUSH_BATCH = int(os.environ.get('SPRIG_CART_FLUSH_BATCH', '32'))
+FLUSH_MS = float(os.environ.get('SPRIG_CART_FLUSH_MS', '1000'))
+MAX_CARTS = int(os.environ.get('SPRIG_CART_STORE_SIZE', '10000'))
+
+
+class CartStore:
+    """
+    Per-customer working copies of carts with batched write-through to CartItems.
+    """
+
+    def __init__(self, flush_batch=FLUSH_BATCH, flush_ms=FLUSH_MS, max_carts=MAX_CARTS):
+        self.flush_batch = flush_batch
+        self.flush_interval = flush_ms / 1000
+        self.max_carts = max_carts
+        self._carts = OrderedDict()
+        # customer_id -> (cart, cleared, dirty menu_item_ids)
+        self._dirty = {}
+        self._pending = 0
+        self._timer = None
+        self._lock = threading.RLock()
+        # One flush at a time: SQLite has a single writer, and a cart must not be in two flushes at once
+        self._flush_lock = threading.Lock()
+        # Customers whose cart lines are being deleted by an uncommitted discard; flushes skip them
+        self._discarding = set()
+        self._loads = 0
+        self._hits = 0
+        self._mutations = 0
+        self._flushes = 0
+        self._rows_written = 0
+
+    def get(self, customer_id):
+        """
+        Returns the customer's cart, loading it from the database on first access.
+        """
+        with self._lock:
+            cart = self._carts.get(customer_id)
+            if cart is not None:
+                self._carts.move_to_end(customer_id)
+                self._hits += 1
+                return cart
+        cart = self._load(customer_id)
+        with self._lock:
+            # Another thread may have loaded it meanwhile; keep the first copy
+            existing = self._carts.get(customer_id)
+            if existing is not None:
+                return existing
+            self._loads += 1
+            self._carts[customer_id] = cart
+            self._evict()
+        return cart
+
+    def _load(self, customer_id):
+        cart = Cart(customer_id)
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT Carts.id, CartItems.menu_item_id, CartItems.quantity
+                FROM Carts
+                LEFT JOIN CartItems ON CartItems.cart_id = Carts.id
+                WHERE Carts.customer_id=? AND Carts.id = (SELECT MIN(id) FROM Carts WHERE customer_id=?)
+            ''', (customer_id, customer_id))
+            for cart_id, menu_item_id, quantity in cursor.fetchall():
+                cart.cart_id = cart_id
+                if menu_item_id is not None:
+                    cart.add_to_cart(menu_item_id, quantity)
+        # Attach only now so loading does not count as changes
+        cart._store = self
+        return cart
+
+    def _evict(self):
+        # Only clean carts are dropped; dirty ones stay until their flush
+        for customer_id in list(self._carts):
+            if len(self._carts) <= self.max_carts:
+                return
+            if customer_id not in self._dirty:
+                self._carts.pop(customer_id)._store = None
+
+    def mark_dirty(self, cart, menu_item_id):
+        """
+        Records a changed cart line; called by Cart for carts owned by the store.
+        """
+        with self._lock:
+            _, cleared, ids = self._dirty.get(cart.customer_id, (cart, False, set()))
+            ids.add(menu_item_id)
+            self._dirty[cart.customer_id] = (cart, cleared, ids)
+            self._changed()
+
+    def mark_cleared(self, cart):
+        """
+        Records that every line of the cart was removed.
+        """
+        with self._lock:
+            self._dirty[cart.customer_id] = (cart, True, set())
+            self._changed()
+
+    def _changed(self):
+        self._mutations += 1
+        self._pending += 1
+        if self._pending >= self.flush_batch:
+            # Flush on a worker so the caller's own transaction is not joined
+            threading.Thread(target=self.flush, daemon=True).start()
+            self._pending = 0
+        elif self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self, customer_id=None):
+        """
+        Writes pending cart changes, for one customer or all, in one transaction.
+        """
+        with self._flush_lock:
+            return self._flush(customer_id)
+
+    def _flush(self, customer_id):
+        with self._lock:
+            if customer_id is None:
+                pending = {key: entry for key, entry in self._dirty.items() if key not in self._discarding}
+                self._dirty = {key: entry for key, entry in self._dirty.items() if key in self._discarding}
+                self._pending = 0
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            elif customer_id in self._discarding:
+                pending = {}
+            else:
+                entry = self._dirty.pop(customer_id, None)
+                pending = {customer_id: entry} if entry else {}
+        if not pending:
+            return True
+        created = []
+        try:
+            with unit_of_work() as cursor:
+                on_rollback(lambda: self._restore(pending, created))
+                rows = sum(self._write(cursor, cart, cleared, ids, created)
+                           for cart, cleared, ids in pending.values())
+        except sqlite3.Error as e:
+            if in_unit_of_work():
+                raise
+            print(f"Database error during cart flush: {e}")
+            return False
+        with self._lock:
+            self._flushes += 1
+            self._rows_written += rows
+        return True
+
+    def _write(self, cursor, cart, cleared, ids, created):
+        rows = 0
+        upserts = [(cart.cart_id, menu_item_id, cart.items[menu_item_id].quantity)
+                   for menu_item_id in ids if menu_item_id in cart.items]
+        if cart.cart_id is None:
+            if not upserts:
+                return 0
+            cursor.execute('INSERT INTO Carts (customer_id) VALUES (?)', (cart.customer_id,))
+            cart.cart_id = cursor.lastrowid
+            created.append(cart)
+            rows += 1
+            upserts = [(cart.cart_id, menu_item_id, quantity) for _, menu_item_id, quantity in upserts]
+        if cleared:
+            cursor.execute('DELETE FROM CartItems WHERE cart_id=?', (cart.cart_id,))
+            rows += max(cursor.rowcount, 0)
+        else:
+            deletes = [(cart.cart_id, menu_item_id) for menu_item_id in ids if menu_item_id not in cart.items]
+            if deletes:
+                cursor.executemany('DELETE FROM CartItems WHERE cart_id=? AND menu_item_id=?', deletes)
+                rows += len(deletes)
+        if upserts:
+            cursor.executemany('''
+                INSERT INTO CartItems (cart_id, menu_item_id, quantity) VALUES (?, ?, ?)
+                ON CONFLICT(cart_id, menu_item_id) DO UPDATE SET quantity=excluded.quantity
+            ''', upserts)
+            rows += len(upserts)
+        return rows
+
+    def _restore(self, pending, created):
+        # Put failed changes back so the next flush retries them
+        for cart in created:
+            cart.cart_id = None
+        with self._lock:
+            for customer_id, (cart, cleared, ids) in pending.items():
+                _, newer_cleared, newer_ids = self._dirty.get(customer_id, (cart, False, set()))
+                self._dirty[customer_id] = (cart, cleared or newer_cleared, ids | newer_ids)
+
+    def discard(self, cart):
+        """
+        Deletes a stored cart's lines as part of the current unit of work (e.g. an order
+        placed from it) and empties the working copy once that commits.
+        A flush already writing this cart's lines finishes first, so the delete lands after
+        them; flushes that start before the unit of work ends leave the cart alone. The
+        flush lock is only held while taking the pending lines, never across the delete.
+        """
+        customer_id = cart.customer_id
+        with self._flush_lock:
+            with self._lock:
+                # Unflushed changes are moot once the lines are deleted; a flush must not bring them back
+                entry = self._dirty.pop(customer_id, None)
+                self._discarding.add(customer_id)
+
+        def settle():
+            with self._lock:
+                self._discarding.discard(customer_id)
+
+        def undo():
+            if entry is not None:
+                self._restore({customer_id: entry}, [])
+            settle()
+
+        with unit_of_work() as cursor:
+            on_rollback(undo)
+            on_commit(cart._reset)
+            on_commit(settle)
+            if cart.cart_id is not None:
+                cursor.execute('DELETE FROM CartItems WHERE cart_id=?', (cart.cart_id,))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'carts': len(self._carts),
+                'loads': self._loads,
+                'hits': self._hits,
+                'mutations': self._mutations,
+                'pending': sum(len(ids) or 1 for _, _, ids in self._dirty.values()),
+                'flushes': self._flushes,
+                'rows_written': self._rows_written,
+                'write_amplification': self._rows_written / self._mutations if self._mutations else 0.0,
+            }
+
+
+cart_store = CartStore()
+atexit.register(cart_store.flush)
@@ -5,13 +5,372 @@ Refer all the files in the project for the complete and accurate code.
 '''
 import sqlite3
 import os
-
-DATABASE = 'sprig.db'
+import threading
+from contextlib import contextmanager
+
+from utils.instrumentation import InstrumentedConnection
+
+DATABASE = os.environ.get('SPRIG_DATABASE', 'sprig.db')
+POOL_SIZE = int(os.environ.get('SPRIG_POOL_SIZE', '5'))
+POOL_TIMEOUT = 30.0
+PROFILE = os.environ.get('SPRIG_DB_PROFILE', 'balanced')
+# Ids bound per IN (...) list; stays well below SQLite's limit on bound parameters per statement
+LOOKUP_CHUNK = 500
+
+# Named performance profiles applied to every connection. WAL lets readers such as
+# RestaurantPartner.view_orders run while Order.place_order is writing.
+# cache_size is in KiB when negative, mmap_size in bytes, busy_timeout in ms.
+PROFILES = {
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'mmap_size': 0,
+        'cache_size': -2000,
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 5000,
+    },
+    'balanced': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 64 * 1024 * 1024,
+        'cache_size': -16000,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+    'bulk-load': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64000,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 30000,
+    },
+}
+
+
+def resolve_profile(profile):
+    """
+    Returns the settings for a profile name, or the dict itself for a custom profile.
+    """
+    if isinstance(profile, dict):
+        return profile
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown database profile {profile!r}, expected one of {sorted(PROFILES)}.")
+    return PROFILES[profile]
+
+
+def apply_profile(conn, profile):
+    """
+    Applies a performance profile's PRAGMAs to a connection.
+    """
+    for pragma, value in resolve_profile(profile).items():
+        conn.execute(f"PRAGMA {pragma}={value}").fetchall()
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Raised when no pooled connection becomes free within the timeout."""
+
+
+class ConnectionPool:
+    """
+    Thread-aware pool of SQLite connections.
+    A thread that already holds a connection gets the same one back, so nested
+    calls share one connection instead of each opening their own.
+    """
+
+    def __init__(self, database=DATABASE, size=POOL_SIZE, timeout=POOL_TIMEOUT, profile=PROFILE):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.profile = resolve_profile(profile)
+        self._idle = []
+        self._open = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._checkouts = 0
+        self._waits = 0
+        self._replaced = 0
+        self._commits = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, timeout=self.timeout,
+                               check_same_thread=False, factory=InstrumentedConnection)
+        conn.row_factory = sqlite3.Row
+        apply_profile(conn, self.profile)
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn):
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        """
+        Checks out a connection for the calling thread, waiting if the pool is exhausted.
+        """
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            self._local.depth += 1
+            return held
+
+        with self._cond:
+            self._checkouts += 1
+            if not self._idle and self._open >= self.size:
+                self._waits += 1
+                if not self._cond.wait_for(
+                        lambda: self._idle or self._open < self.size, self.timeout):
+                    raise PoolTimeout(
+                        f"No database connection available after {self.timeout}s")
+            conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                self._open += 1
+
+        if conn is not None and not self._is_healthy(conn):
+            conn.close()
+            conn = None
+            self._replaced += 1
+        if conn is None:
+            try:
+                conn = self._connect()
+            except sqlite3.Error:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def release(self, conn):
+        """
+        Returns a connection to the pool once the outermost checkout in this thread ends.
+        Any transaction left open is rolled back.
+        """
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        self._local.conn = None
+        if conn.in_transaction:
+            conn.rollback()
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def commit(self, conn):
+        """
+        Commits a pooled connection's open transaction, if any, and counts it.
+        """
+        if conn.in_transaction:
+            conn.commit()
+            with self._cond:
+                self._commits += 1
+
+    def health_check(self):
+        """
+        Pings every idle connection and drops the ones that fail.
+        Returns the number of connections dropped.
+        """
+        with self._cond:
+            idle, self._idle = self._idle, []
+        healthy = [conn for conn in idle if self._is_healthy(conn)]
+        dropped = len(idle) - len(healthy)
+        for conn in idle:
+            if conn not in healthy:
+                conn.close()
+        with self._cond:
+            self._idle.extend(healthy)
+            self._open -= dropped
+            self._replaced += dropped
+            self._cond.notify_all()
+        return dropped
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'replaced': self._replaced,
+                'commits': self._commits,
+            }
+
+    def close(self):
+        """
+        Closes all idle connections. Connections still checked out are closed by their threads.
+        """
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn in idle:
+            conn.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DATABASE, POOL_SIZE, POOL_TIMEOUT, PROFILE)
+    return _pool
+
+
+def configure_pool(database=None, size=None, timeout=None, profile=None):
+    """
+    Replaces the shared pool, e.g. to point at another database file, change its size
+    or switch performance profile.
+    """
+    global _pool, DATABASE, PROFILE
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        if database is not None:
+            DATABASE = database
+        if profile is not None:
+            resolve_profile(profile)
+            PROFILE = profile
+        _pool = ConnectionPool(DATABASE,
+                               size if size is not None else POOL_SIZE,
+                               timeout if timeout is not None else POOL_TIMEOUT,
+                               PROFILE)
+    return _pool
+
+
+def connection():
+    """
+    Context manager yielding a pooled connection for the calling thread.
+    """
+    return get_pool().connection()
+
+
+_unit = threading.local()
+
+
+@contextmanager
+def unit_of_work():
+    """
+    Yields a cursor inside one transaction on the calling thread's pooled connection.
+    Domain methods open their writes with unit_of_work(); when one is already active in
+    this thread they join it, so only the outermost block commits (or rolls back on
+    error) and a whole business operation such as signup costs a single commit.
+    """
+    pool = get_pool()
+    with pool.connection() as conn:
+        depth = getattr(_unit, 'depth', 0)
+        _unit.depth = depth + 1
+        if depth == 0:
+            _unit.after_commit = []
+            _unit.after_rollback = []
+        try:
+            yield conn.cursor()
+            if depth == 0:
+                pool.commit(conn)
+        except BaseException:
+            if depth == 0:
+                _unit.after_commit = []
+                if conn.in_transaction:
+                    conn.rollback()
+                callbacks, _unit.after_rollback = _unit.after_rollback, []
+                for callback in callbacks:
+                    callback()
+            raise
+        finally:
+            _unit.depth = depth
+        if depth == 0:
+            _unit.after_rollback = []
+            callbacks, _unit.after_commit = _unit.after_commit, []
+            for callback in callbacks:
+                callback()
+
+
+def in_unit_of_work():
+    return getattr(_unit, 'depth', 0) > 0
+
+
+def on_commit(callback):
+    """
+    Runs callback once the current unit of work has committed, or right away outside one.
+    Used to invalidate caches only after the change is visible to other connections.
+    """
+    if in_unit_of_work():
+        _unit.after_commit.append(callback)
+    else:
+        callback()
+
+
+def on_rollback(callback):
+    """
+    Runs callback if the current unit of work rolls back, so in-memory state handed to
+    the transaction can be put back. Outside a unit of work there is nothing to undo.
+    """
+    if in_unit_of_work():
+        _unit.after_rollback.append(callback)
+
+
+@contextmanager
+def transaction_callbacks():
+    """
+    Marks the calling thread as inside a transaction that the caller commits itself, as the
+    group-commit writer does, so on_commit()/on_rollback() callbacks are collected instead of
+    run. Yields the (after_commit, after_rollback) lists for the caller to run.
+    """
+    depth = getattr(_unit, 'depth', 0)
+    saved = (getattr(_unit, 'after_commit', []), getattr(_unit, 'after_rollback', []))
+    _unit.depth = depth + 1
+    _unit.after_commit, _unit.after_rollback = [], []
+    try:
+        yield _unit.after_commit, _unit.after_rollback
+    finally:
+        _unit.depth = depth
+        _unit.after_commit, _unit.after_rollback = saved
+
+
+def in_chunks(ids):
+    """
+    Splits ids, without duplicates, into lists of at most LOOKUP_CHUNK and yields each
+    with its placeholder string for an IN (...) list.
+    """
+    ids = list(dict.fromkeys(ids))
+    for start in range(0, len(ids), LOOKUP_CHUNK):
+        chunk = ids[start:start + LOOKUP_CHUNK]
+        yield chunk, ', '.join('?' * len(chunk))
+
+
+def select_in(cursor, sql, ids):
+    """
+    Runs sql, whose IN list is written as {ids}, once per chunk of ids and returns all rows.
+    """
+    rows = []
+    for chunk, placeholders in in_chunks(ids):
+        cursor.execute(sql.format(ids=placeholders), chunk)
+        rows.extend(cursor.fetchall())
+    return rows
 
 
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE)
+    """
+    Opens a standalone connection outside the pool, used for schema maintenance.
+    """
+    conn = sqlite3.connect(DATABASE, factory=InstrumentedConnection)
     conn.row_factory = sqlite3.Row
+    apply_profile(conn, PROFILE)
     return conn
 
 
@@ -19,236 +378,45 @@ def drop_all_tables():
     """Drop all existing tables to ensure clean schema"""
     conn = get_db_connection()
     cursor = conn.cursor()
-    
+
     # Disable foreign key check temporarily
     cursor.execute("PRAGMA foreign_keys=OFF")
-    
-    # Get all tables
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+
+    # Get all tables, skipping SQLite's internal ones
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
     tables = cursor.fetchall()
-    
+
     # Drop each table
     for table in tables:
         cursor.execute(f"DROP TABLE IF EXISTS {table[0]}")
-    
-    # Re-enable foreign key check
-    cursor.execute("PRAGMA foreign_keys=ON")
-    
-    conn.commit()
-    conn.close()
 
+    # Reset the schema version so the next migration run rebuilds everything
+    cursor.execute("PRAGMA user_version=0")
 
-def create_tables():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Enable foreign key support
+    # Re-enable foreign key check
     cursor.execute("PRAGMA foreign_keys=ON")
 
-    # Create tables in correct order (tables with no dependencies first)
-    
-    # 1. Users table (base table)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL UNIQUE,
-            password TEXT NOT NULL,
-            name TEXT NOT NULL,
-            email TEXT NOT NULL UNIQUE,
-            user_type TEXT NOT NULL CHECK(user_type IN ('Customer', 'RestaurantPartner', 'DeliveryPartner'))
-        )
-    ''')
-
-    # 2. Restaurants table (no foreign keys)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Restaurants (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            restaurant_name TEXT NOT NULL,
-            address TEXT NOT NULL,
-            cuisine_type TEXT NOT NULL,
-            rating REAL DEFAULT 0.0
-        )
-    ''')
-
-    # Create Customers table (extends Users)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Customers (
-            id INTEGER PRIMARY KEY,
-            phone_number TEXT NOT NULL,
-            address TEXT,
-            FOREIGN KEY (id) REFERENCES Users(id)
-        )
-    ''')
-
-    # Create RestaurantPartners table (extends Users)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS RestaurantPartners (
-            id INTEGER PRIMARY KEY,
-            restaurant_id INTEGER NOT NULL,
-            address TEXT NOT NULL,
-            cuisine_type TEXT NOT NULL,
-            FOREIGN KEY (id) REFERENCES Users(id),
-            FOREIGN KEY (restaurant_id) REFERENCES Restaurants(id)
-        )
-    ''')
-
-    # Create DeliveryPartners table (extends Users)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS DeliveryPartners (
-            id INTEGER PRIMARY KEY,
-            vehicle_type TEXT NOT NULL,
-            license_number TEXT NOT NULL,
-            FOREIGN KEY (id) REFERENCES Users(id)
-        )
-    ''')
-
-    # Create index for email in Customers for fast lookups
-    cursor.execute(
-        'CREATE INDEX IF NOT EXISTS idx_customers_email ON Customers(email)')
-
-    # Create index for restaurant_id in RestaurantPartners for fast lookups
-    cursor.execute(
-        'CREATE INDEX IF NOT EXISTS idx_restaurant_partners_restaurant_id ON RestaurantPartners(restaurant_id)')
-
-    # Create MenuItems table (each restaurant has multiple menu items)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS MenuItems (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            restaurant_id INTEGER NOT NULL,
-            item_name TEXT NOT NULL,
-            item_description TEXT,
-            price REAL NOT NULL,
-            item_type TEXT NOT NULL,
-            availability INTEGER DEFAULT 1,
-            FOREIGN KEY (restaurant_id) REFERENCES Restaurants(id)
-        )
-    ''')
-
-    # Create index for restaurant_id in MenuItems for faster restaurant-menu item lookups
-    cursor.execute(
-        'CREATE INDEX IF NOT EXISTS idx_menu_items_restaurant_id ON MenuItems(restaurant_id)')
-
-    # Create Carts table (each customer has a cart)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Carts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            customer_id INTEGER NOT NULL,
-            total_price REAL DEFAULT 0.0,
-            FOREIGN KEY (customer_id) REFERENCES Customers(id)
-        )
-    ''')
-
-    # Create index for customer_id in Carts for faster lookups
-    cursor.execute(
-        'CREATE INDEX IF NOT EXISTS idx_carts_customer_id ON Carts(customer_id)')
-
-    # Create CartItems table (to store items in a cart)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS CartItems (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            cart_id INTEGER NOT NULL,
-            menu_item_id INTEGER NOT NULL,
-            quantity INTEGER NOT NULL,
-            FOREIGN KEY (cart_id) REFERENCES Carts(id),
-            FOREIGN KEY (menu_item_id) REFERENCES MenuItems(id)
-        )
-    ''')
-
-    # Create index for cart_id in CartItems for fast retrieval of cart contents
-    cursor.execute(
-        'CREATE INDEX IF NOT EXISTS idx_cart_items_cart_id ON CartItems(cart_id)')
-
-    # Create Orders table (links customers, restaurants, and delivery partners)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Orders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            customer_id INTEGER NOT NULL,
-            restaurant_id INTEGER NOT NULL,
-            order_status TEXT NOT NULL CHECK(order_status IN ('Pending', 'Preparing', 'Out for Delivery', 'Delivered')),
-            order_date TEXT NOT NULL,
-            delivery_partner_id INTEGER,
-            membership_discount REAL DEFAULT 0.0,
-            FOREIGN KEY (customer_id) REFERENCES Customers(id),
-            FOREIGN KEY (restaurant_id) REFERENCES Restaurants(id),
-            FOREIGN KEY (delivery_partner_id) REFERENCES DeliveryPartners(id)
-        )
-    ''')
-
-    # Create index for customer_id and restaurant_id in Orders for fast lookups
-    cursor.execute(
-        'CREATE INDEX IF NOT EXISTS idx_orders_customer_id ON Orders(customer_id)')
-    cursor.execute(
-        'CREATE INDEX IF NOT EXISTS idx_orders_restaurant_id ON Orders(restaurant_id)')
-
-    # Create OrderItems table (each order can have multiple items)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS OrderItems (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_id INTEGER NOT NULL,
-            menu_item_id INTEGER NOT NULL,
-            quantity INTEGER NOT NULL,
-            FOREIGN KEY (order_id) REFERENCES Orders(id),
-            FOREIGN KEY (menu_item_id) REFERENCES MenuItems(id)
-        )
-    ''')
-
-    # Create index for order_id in OrderItems for fast retrieval of order details
-    cursor.execute(
-        'CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON OrderItems(order_id)')
-
-    # Create Membership table (each customer can have a membership)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Membership (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            customer_id INTEGER NOT NULL,
-            membership_type TEXT NOT NULL,
-            discount_rate REAL NOT NULL,
-            expiry_date TEXT NOT NULL,
-            FOREIGN KEY (customer_id) REFERENCES Customers(id)
-        )
-    ''')
-
-    # Create index for customer_id in Membership for fast membership lookups
-    cursor.execute(
-        'CREATE INDEX IF NOT EXISTS idx_membership_customer_id ON Membership(customer_id)')
-
-    # Create Payments table (each order has a payment)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Payments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_id INTEGER NOT NULL,
-            payment_method TEXT NOT NULL,
-            payment_status TEXT NOT NULL CHECK(payment_status IN ('Pending', 'Completed', 'Refunded')),
-            payment_date TEXT NOT NULL,
-            amount REAL NOT NULL,
-            FOREIGN KEY (order_id) REFERENCES Orders(id)
-        )
-    ''')
-
-    # Create index for order_id in Payments for fast lookup of payments
-    cursor.execute(
-        'CREATE INDEX IF NOT EXISTS idx_payments_order_id ON Payments(order_id)')
-
     conn.commit()
     conn.close()
 
 
 def initialize_database():
-    """Initialize the database with proper schema"""
+    """
+    Brings the schema up to date without touching existing data.
+    When the schema is current this is a single version check; run
+    `python -m utils.migrations` to apply migrations ahead of time.
+    """
+    from utils.migrations import migrate
+
     try:
-        # If database exists but schema is wrong, recreate it
-        if os.path.exists(DATABASE):
-            drop_all_tables()
-            os.remove(DATABASE)
-            print("Existing database removed.")
-        
-        # Create new database with correct schema
-        create_tables()
-        print("Database created with updated schema.")
-        
+        conn = get_db_connection()
+        try:
+            applied = migrate(conn)
+        finally:
+            conn.close()
+        if applied:
+            print(f"Database schema migrated to version {applied[-1]}.")
+        return applied
     except Exception as e:
         print(f"Error initializing database: {str(e)}")
         raise
-
-# This function will be called when the module is imported
-initialize_database()
@@ -0,0 +1,220 @@
+'''
+Group commit
+Purpose: Lets many small writes share one transaction and one fsync.
+When enabled, write() hands each write to a background writer thread that collects
+requests for up to a latency budget (window_ms) and commits them together. Every
+write runs inside its own SAVEPOINT, so a failing write is rolled back and reported
+to its caller without affecting the rest of the batch. Callers block until the batch
+has committed and then get their own result back. on_commit() callbacks registered by
+a write run once its batch has committed, as they would after a unit of work.
+If opening the writer's connection or committing a batch fails, every write still
+waiting in that batch gets the error and the next batch starts on a new connection.
+Writes submitted after the writer has stopped fail at once.
+
+Enable with SPRIG_GROUP_COMMIT_MS=<window> or enable_group_commit(window_ms).
+When disabled, or when the caller is inside a unit of work, write() runs on the
+caller's pooled connection through unit_of_work() instead.
+
+'''
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from utils.database import get_db_connection, in_unit_of_work, transaction_callbacks, unit_of_work
+
+DEFAULT_MAX_BATCH = 256
+
+
+class GroupCommitWriter:
+    """
+    Background writer that commits queued writes in batches.
+    """
+
+    def __init__(self, window_ms=2.0, max_batch=DEFAULT_MAX_BATCH):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._batches = 0
+        self._writes = 0
+        self._thread = threading.Thread(target=self._run, name='sprig-group-commit', daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args):
+        """
+        Queues fn(cursor, *args) and returns a Future for its result.
+        """
+        future = Future()
+        with self._lock:
+            if not self._stopped:
+                self._queue.put((fn, args, future))
+                return future
+        future.set_exception(RuntimeError("The group commit writer has stopped"))
+        return future
+
+    def call(self, fn, *args):
+        """
+        Queues fn(cursor, *args) and waits until its batch has committed.
+        """
+        return self.submit(fn, *args).result()
+
+    def close(self):
+        """
+        Commits everything already queued and stops the writer thread.
+        """
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self):
+        return {
+            'batches': self._batches,
+            'writes': self._writes,
+            'average_batch': self._writes / self._batches if self._batches else 0.0,
+        }
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Put the stop marker back so the loop exits after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _connect(self):
+        conn = get_db_connection()
+        conn.isolation_level = None
+        return conn
+
+    def _run(self):
+        conn = None
+        try:
+            while True:
+                first = self._queue.get()
+                if first is None:
+                    return
+                batch = self._collect(first)
+                try:
+                    if conn is None:
+                        conn = self._connect()
+                    self._commit(conn.cursor(), batch)
+                except Exception as e:
+                    # Callers must not wait forever; the connection may be unusable, so reopen it
+                    self._fail(batch, e)
+                    if conn is not None:
+                        conn.close()
+                        conn = None
+        finally:
+            with self._lock:
+                self._stopped = True
+            leftover = []
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    leftover.append(item)
+            self._fail(leftover, RuntimeError("The group commit writer has stopped"))
+            if conn is not None:
+                conn.close()
+
+    @staticmethod
+    def _fail(batch, error):
+        for _, _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def _commit(self, cursor, batch):
+        results = []
+        after_commit, after_rollback = [], []
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            for fn, args, future in batch:
+                cursor.execute('SAVEPOINT write')
+                with transaction_callbacks() as (committed, rolled_back):
+                    try:
+                        results.append((future, True, fn(cursor, *args)))
+                        cursor.execute('RELEASE write')
+                    except Exception as e:
+                        cursor.execute('ROLLBACK TO write')
+                        cursor.execute('RELEASE write')
+                        results.append((future, False, e))
+                        for callback in rolled_back:
+                            callback()
+                        continue
+                after_commit.extend(committed)
+                after_rollback.extend(rolled_back)
+            cursor.execute('COMMIT')
+        except Exception as e:
+            if cursor.connection.in_transaction:
+                cursor.execute('ROLLBACK')
+            for callback in after_rollback:
+                callback()
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        for callback in after_commit:
+            callback()
+        self._batches += 1
+        self._writes += len(batch)
+        for future, ok, value in results:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def enable_group_commit(window_ms=2.0, max_batch=DEFAULT_MAX_BATCH):
+    """
+    Routes write() through a shared group-commit writer with the given latency budget.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+        _writer = GroupCommitWriter(window_ms, max_batch)
+    return _writer
+
+
+def disable_group_commit():
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+
+
+def get_group_writer():
+    return _writer
+
+
+def write(fn, *args):
+    """
+    Runs fn(cursor, *args) as a committed write and returns its result, batched with
+    concurrent writes when group commit is enabled.
+    """
+    writer = _writer
+    if writer is not None and not in_unit_of_work():
+        return writer.call(fn, *args)
+    with unit_of_work() as cursor:
+        return fn(cursor, *args)
+
+
+if os.environ.get('SPRIG_GROUP_COMMIT_MS'):
+    enable_group_commit(float(os.environ['SPRIG_GROUP_COMMIT_MS']))
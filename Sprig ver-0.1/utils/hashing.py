@@ -0,0 +1,499 @@
+'''
+Password hashing
+Purpose: Hashes and checks passwords off the calling thread, with pluggable algorithms.
+Hashing and checking a password costs tens to hundreds of milliseconds of CPU, so both
+run in a process pool of SPRIG_HASH_WORKERS workers (the number of cores by default).
+hash_password/verify_password block the caller until the result is ready;
+hash_password_async/verify_password_async await it on the event loop; hash_many() feeds
+a batch of passwords through the pool for bulk imports.
+
+HASHERS maps algorithm names to hasher classes: bcrypt, stdlib scrypt, and sha256 for
+verifying the unsalted hex digests stored by older delivery partner signups. New
+hashes use SPRIG_HASH_ALGORITHM and carry their algorithm and parameters ($2b$<cost>$...
+for bcrypt, $scrypt$ln=<log2 N>,r=<r>,p=<p>$<salt>$<hash> for scrypt). calibrate()
+times the algorithm on this host at startup and picks the highest cost that stays
+within SPRIG_HASH_TARGET_MS, but never below the algorithm's default; SPRIG_HASH_COST
+fixes the cost instead. verify_password also returns a new hash when the stored one
+uses another algorithm or a lower cost, so callers can upgrade it after a successful
+login; hashes stronger than the current settings are left alone.
+
+At most SPRIG_HASH_QUEUE requests are in flight at once. Further callers wait for a
+slot for up to SPRIG_HASH_WAIT_MS and then get HashingBusy, so a burst queues in
+front of the pool instead of piling up unbounded work behind it. stats() reports
+queue depth, waits, rejections and hash latency (p50/p95/p99, queueing included).
+SPRIG_HASH_WORKERS=0 hashes inline on the calling thread.
+
+Workers start from a forkserver (spawned on platforms without one) and, like any
+multiprocessing worker, re-import the main module. Entry points that hash through the
+pool must therefore keep their top-level code under if __name__ == '__main__';
+multiprocessing raises RuntimeError when a worker importing the main module tries to
+start the pool again.
+
+'''
+
+import asyncio
+import atexit
+import base64
+import hashlib
+import hmac
+import math
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import bcrypt
+
+WORKERS = int(os.environ.get('SPRIG_HASH_WORKERS', str(os.cpu_count() or 1)))
+MAX_PENDING = int(os.environ.get('SPRIG_HASH_QUEUE', str(max(WORKERS, 1) * 64)))
+WAIT_MS = float(os.environ.get('SPRIG_HASH_WAIT_MS', '5000'))
+ALGORITHM = os.environ.get('SPRIG_HASH_ALGORITHM', 'bcrypt')
+COST = os.environ.get('SPRIG_HASH_COST')
+TARGET_MS = float(os.environ.get('SPRIG_HASH_TARGET_MS', '100'))
+SAMPLE_LIMIT = 1024
+CALIBRATION_PROBES = 5
+
+
+class HashingBusy(Exception):
+    """
+    Raised when no hashing slot frees up within the wait limit.
+    """
+
+
+def _encode(value):
+    return value.encode('utf-8') if isinstance(value, str) else value
+
+
+def _text(value):
+    # Hashes stored before the registry are bcrypt bytes
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+class Hasher:
+    """
+    One password hashing algorithm at one cost. Each step up in cost doubles the work.
+    """
+
+    name = None
+    DEFAULT_COST = None
+    MAX_COST = None
+    # Cost timed by calibrate(); cheap enough to run at startup
+    PROBE_COST = None
+
+    def __init__(self, cost=None):
+        self.cost = self.DEFAULT_COST if cost is None else int(cost)
+
+    @classmethod
+    def identify(cls, stored):
+        """
+        Returns whether stored is a hash in this algorithm's format.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def verify(cls, password, stored):
+        raise NotImplementedError
+
+    @classmethod
+    def parameters(cls, stored):
+        """
+        Returns the parameters a stored hash was made with.
+        """
+        raise NotImplementedError
+
+    def hash(self, password):
+        raise NotImplementedError
+
+    def current_parameters(self):
+        raise NotImplementedError
+
+    def needs_rehash(self, stored):
+        """
+        Returns whether a stored hash uses another algorithm or weaker parameters than this hasher.
+        """
+        if not self.identify(stored):
+            return True
+        # Never rehash down: a stored hash that is stronger than this hasher's settings stays
+        stored_parameters = self.parameters(stored)
+        return any(stored_parameters.get(key, 0) < value for key, value in self.current_parameters().items())
+
+    @classmethod
+    def calibrate(cls, target_ms=TARGET_MS):
+        """
+        Returns a hasher whose cost on this host comes closest to target_ms without exceeding it,
+        but never below DEFAULT_COST. The fastest of CALIBRATION_PROBES runs is used, so a busy
+        host does not pick a lower cost than an idle one.
+        """
+        probe = cls(cls.PROBE_COST)
+        timings = []
+        for _ in range(CALIBRATION_PROBES):
+            start = time.perf_counter()
+            probe.hash(b'calibration')
+            timings.append((time.perf_counter() - start) * 1000)
+        cost = cls.PROBE_COST + math.floor(math.log2(target_ms / max(min(timings), 0.001)))
+        return cls(min(max(cost, cls.DEFAULT_COST), cls.MAX_COST))
+
+    def __repr__(self):
+        return f"{type(self).__name__}(cost={self.cost})"
+
+
+class BcryptHasher(Hasher):
+    """
+    bcrypt; the cost is the log2 of its rounds and is stored in the hash.
+    """
+
+    name = 'bcrypt'
+    DEFAULT_COST = 12
+    MAX_COST = 16
+    PROBE_COST = 6
+
+    @classmethod
+    def identify(cls, stored):
+        return stored.startswith(('$2a$', '$2b$', '$2y$'))
+
+    @classmethod
+    def verify(cls, password, stored):
+        return bcrypt.checkpw(password, stored.encode('utf-8'))
+
+    @classmethod
+    def parameters(cls, stored):
+        return {'cost': int(stored.split('$')[2])}
+
+    def hash(self, password):
+        return bcrypt.hashpw(password, bcrypt.gensalt(self.cost)).decode('utf-8')
+
+    def current_parameters(self):
+        return {'cost': self.cost}
+
+
+class ScryptHasher(Hasher):
+    """
+    hashlib.scrypt; the cost is log2 of N, with block size r and parallelism p fixed per hasher.
+    """
+
+    name = 'scrypt'
+    DEFAULT_COST = 15
+    MAX_COST = 20
+    PROBE_COST = 10
+    PREFIX = '$scrypt$'
+
+    def __init__(self, cost=None, r=8, p=1):
+        super().__init__(cost)
+        self.r = r
+        self.p = p
+
+    @staticmethod
+    def _derive(password, salt, ln, r, p):
+        # scrypt needs 128 * r * N bytes; allow twice that
+        return hashlib.scrypt(password, salt=salt, n=2 ** ln, r=r, p=p, maxmem=256 * r * 2 ** ln + 2 ** 20, dklen=32)
+
+    @staticmethod
+    def _b64(data):
+        return base64.b64encode(data).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def _unb64(text):
+        return base64.b64decode(text + '=' * (-len(text) % 4))
+
+    @classmethod
+    def identify(cls, stored):
+        return stored.startswith(cls.PREFIX)
+
+    @classmethod
+    def parameters(cls, stored):
+        fields = stored[len(cls.PREFIX):].split('$')[0]
+        return {key: int(value) for key, value in (field.split('=') for field in fields.split(','))}
+
+    @classmethod
+    def verify(cls, password, stored):
+        params = cls.parameters(stored)
+        salt, expected = stored[len(cls.PREFIX):].split('$')[1:3]
+        derived = cls._derive(password, cls._unb64(salt), params['ln'], params['r'], params['p'])
+        return hmac.compare_digest(derived, cls._unb64(expected))
+
+    def hash(self, password):
+        salt = os.urandom(16)
+        derived = self._derive(password, salt, self.cost, self.r, self.p)
+        return f"{self.PREFIX}ln={self.cost},r={self.r},p={self.p}${self._b64(salt)}${self._b64(derived)}"
+
+    def current_parameters(self):
+        return {'ln': self.cost, 'r': self.r, 'p': self.p}
+
+
+class Sha256Hasher(Hasher):
+    """
+    Unsalted sha256 hex digests from older delivery partner signups. Verify only: a
+    successful login always replaces them.
+    """
+
+    name = 'sha256'
+
+    @classmethod
+    def identify(cls, stored):
+        return len(stored) == 64 and all(c in '0123456789abcdef' for c in stored)
+
+    @classmethod
+    def verify(cls, password, stored):
+        return hmac.compare_digest(hashlib.sha256(password).hexdigest(), stored)
+
+    @classmethod
+    def parameters(cls, stored):
+        return {}
+
+    def hash(self, password):
+        raise ValueError("sha256 is only accepted to verify existing hashes")
+
+    def current_parameters(self):
+        return None
+
+    @classmethod
+    def calibrate(cls, target_ms=TARGET_MS):
+        raise ValueError("sha256 cannot be used for new hashes")
+
+
+HASHERS = {hasher.name: hasher for hasher in (BcryptHasher, ScryptHasher, Sha256Hasher)}
+
+
+def register_hasher(hasher_class):
+    """
+    Adds a Hasher subclass to the registry under its name. It must be importable by the
+    pool's worker processes, i.e. defined at module level in an importable module.
+    """
+    HASHERS[hasher_class.name] = hasher_class
+    return hasher_class
+
+
+def identify_hasher(stored):
+    """
+    Returns the hasher class whose format the stored hash is in, or None.
+    """
+    stored = _text(stored)
+    for hasher_class in HASHERS.values():
+        if hasher_class.identify(stored):
+            return hasher_class
+    return None
+
+
+# Worker functions run in the pool's processes, so they live at module level
+def _hash(hasher, password):
+    return hasher.hash(password)
+
+
+def _verify(hasher_class, current, password, stored):
+    # Rehashing in the same call saves a second trip through the queue
+    if not hasher_class.verify(password, stored):
+        return False, None
+    return True, current.hash(password) if current.needs_rehash(stored) else None
+
+
+def _start_method():
+    # forkserver workers fork from a clean server process: forking this one while other
+    # threads hold locks is not safe. Platforms without it (Windows) spawn.
+    return 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+class PasswordHasher:
+    """
+    Bounded process pool for the configured Hasher with sync and asyncio APIs and latency metrics.
+    """
+
+    def __init__(self, workers=WORKERS, max_pending=MAX_PENDING, wait_ms=WAIT_MS, hasher=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.wait = wait_ms / 1000
+        # The hasher new passwords are hashed with; stored hashes that differ are upgraded
+        self.hasher = hasher if hasher is not None else HASHERS[ALGORITHM](COST)
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=SAMPLE_LIMIT)
+        self._depth = 0
+        self._max_depth = 0
+        self._submitted = 0
+        self._completed = 0
+        self._waits = 0
+        self._rejected = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                worker_context = multiprocessing.get_context(_start_method())
+                if worker_context.get_start_method() == 'forkserver':
+                    worker_context.set_forkserver_preload([__name__])
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=worker_context)
+            return self._executor
+
+    def _acquire(self):
+        if self._slots.acquire(blocking=False):
+            return
+        with self._lock:
+            self._waits += 1
+        if not self._slots.acquire(timeout=self.wait):
+            with self._lock:
+                self._rejected += 1
+            raise HashingBusy(f"{self.max_pending} password hashes already in flight")
+
+    def _dispatch(self, fn, *args):
+        # The caller holds a slot; it is released when the work finishes
+        start = time.perf_counter()
+        with self._lock:
+            self._submitted += 1
+            self._depth += 1
+            self._max_depth = max(self._max_depth, self._depth)
+
+        def finished(_):
+            with self._lock:
+                self._depth -= 1
+                self._completed += 1
+                self._latencies.append(time.perf_counter() - start)
+            self._slots.release()
+
+        if self.workers <= 0:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            try:
+                future = self._get_executor().submit(fn, *args)
+            except Exception:
+                finished(None)
+                raise
+        future.add_done_callback(finished)
+        return future
+
+    def submit(self, fn, *args):
+        """
+        Runs fn(*args) in the pool once a slot is free and returns its Future.
+        """
+        self._acquire()
+        return self._dispatch(fn, *args)
+
+    async def submit_async(self, fn, *args):
+        """
+        Runs fn(*args) in the pool and awaits its result; waiting for a slot does not block the loop.
+        """
+        if not self._slots.acquire(blocking=False):
+            acquiring = asyncio.get_running_loop().run_in_executor(None, self._acquire)
+            try:
+                # Shielded so a cancelled caller can still see whether the wait got a slot
+                await asyncio.shield(acquiring)
+            except BaseException:
+                acquiring.add_done_callback(self._release_unused)
+                raise
+        return await asyncio.wrap_future(self._dispatch(fn, *args))
+
+    def _release_unused(self, acquiring):
+        # The caller stopped waiting; a slot the wait still obtained is given back
+        if not acquiring.cancelled() and acquiring.exception() is None:
+            self._slots.release()
+
+    def _verify_args(self, password, stored):
+        stored = _text(stored)
+        hasher_class = identify_hasher(stored)
+        return (hasher_class, self.hasher, _encode(password), stored) if hasher_class else None
+
+    def calibrate(self, target_ms=TARGET_MS):
+        """
+        Sets the hasher's cost to what this host can do within target_ms, unless SPRIG_HASH_COST
+        fixes it. Returns the hasher in use.
+        """
+        if COST is None:
+            self.hasher = type(self.hasher).calibrate(target_ms)
+        return self.hasher
+
+    def hash(self, password):
+        return self.submit(_hash, self.hasher, _encode(password)).result()
+
+    def hash_many(self, passwords):
+        """
+        Starts hashing every password and returns their Futures in order. For batch jobs:
+        it waits as long as it takes for a slot instead of raising HashingBusy, so at most
+        max_pending hashes are in flight while the caller keeps feeding the pool.
+        """
+        futures = []
+        for password in passwords:
+            self._slots.acquire()
+            futures.append(self._dispatch(_hash, self.hasher, _encode(password)))
+        return futures
+
+    def verify(self, password, stored):
+        """
+        Returns (matches, new_hash); new_hash is set when the stored hash should be replaced.
+        """
+        args = self._verify_args(password, stored)
+        return self.submit(_verify, *args).result() if args else (False, None)
+
+    async def hash_async(self, password):
+        return await self.submit_async(_hash, self.hasher, _encode(password))
+
+    async def verify_async(self, password, stored):
+        args = self._verify_args(password, stored)
+        return await self.submit_async(_verify, *args) if args else (False, None)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def stats(self):
+        with self._lock:
+            ordered = sorted(self._latencies)
+            submitted, completed = self._submitted, self._completed
+            depth, max_depth, waits, rejected = self._depth, self._max_depth, self._waits, self._rejected
+
+        def percentile(p):
+            return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000 if ordered else 0.0
+
+        return {
+            'workers': self.workers,
+            'hasher': repr(self.hasher),
+            'queue_depth': depth,
+            'max_queue_depth': max_depth,
+            'submitted': submitted,
+            'completed': completed,
+            'waits': waits,
+            'rejected': rejected,
+            'p50_ms': percentile(50),
+            'p95_ms': percentile(95),
+            'p99_ms': percentile(99),
+        }
+
+
+password_hasher = PasswordHasher()
+atexit.register(password_hasher.shutdown)
+
+
+def hash_password(password):
+    """
+    Returns a hash of password in the configured algorithm, computed in the hashing pool.
+    """
+    return password_hasher.hash(password)
+
+
+def verify_password(password, stored):
+    """
+    Checks password against a stored hash of any registered algorithm in the hashing pool.
+    Returns (matches, new_hash); new_hash is set when the stored hash should be upgraded.
+    """
+    return password_hasher.verify(password, stored)
+
+
+def check_password(password, stored):
+    return verify_password(password, stored)[0]
+
+
+async def hash_password_async(password):
+    return await password_hasher.hash_async(password)
+
+
+async def verify_password_async(password, stored):
+    return await password_hasher.verify_async(password, stored)
+
+
+async def check_password_async(password, stored):
+    return (await password_hasher.verify_async(password, stored))[0]
@@ -0,0 +1,284 @@
+'''
+Index advisor
+Purpose: Checks every SQL statement shipped in the project against the current schema.
+Statements are collected from the source with ast, planned with EXPLAIN QUERY PLAN
+against a freshly migrated and seeded in-memory database, and flagged when the plan
+contains a full-table scan or a temporary B-tree. For flagged tables the advisor
+proposes a composite index (equality columns, then range/ORDER BY columns) and,
+when the selected columns are known, a covering variant.
+Statements that do not even prepare against the schema are reported as errors.
+
+Accepted proposals are added to the schema as a new migration in utils/migrations.py.
+
+Usage (from the project directory):
+python -m utils.index_advisor [--all] [--analyze]
+
+'''
+
+import argparse
+import ast
+import os
+import re
+import sqlite3
+import sys
+
+from utils.migrations import migrate
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SKIP_DIRS = {'benchmarks', 'tests', '__pycache__'}
+SKIP_FILES = {os.path.join('utils', 'migrations.py')}
+PLANNED_PREFIXES = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'REPLACE')
+
+TABLE_REF = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(?!WHERE|ON|JOIN|SET|LEFT|INNER|ORDER|GROUP|LIMIT|VALUES)(\w+))?',
+                       re.IGNORECASE)
+PREDICATE = re.compile(r'(?:(\w+)\.)?(\w+)\s*(=|<=|>=|<|>|\bIN\b|\bBETWEEN\b)\s*(?:\?|\'|\(|\d)',
+                       re.IGNORECASE)
+ORDER_BY = re.compile(r'\bORDER\s+BY\s+(.+?)(?:\bLIMIT\b|$)', re.IGNORECASE | re.DOTALL)
+
+
+def collect_statements(project_dir=PROJECT_DIR):
+    """
+    Returns (path, line, sql) for every literal SQL string passed to execute()/executemany().
+    """
+    statements = []
+    for root, dirs, files in os.walk(project_dir):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS and not d.startswith('.'))
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, project_dir)
+            if not name.endswith('.py') or relative in SKIP_FILES:
+                continue
+            with open(path, encoding='utf-8') as f:
+                source = f.read()
+            try:
+                tree = ast.parse(source)
+            except SyntaxError:
+                continue
+            for node in ast.walk(tree):
+                if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                        and node.func.attr in ('execute', 'executemany') and node.args
+                        and isinstance(node.args[0], ast.Constant)
+                        and isinstance(node.args[0].value, str)):
+                    sql = ' '.join(node.args[0].value.split())
+                    # Catalog queries such as drop_all_tables() are not worth indexing
+                    if sql.upper().startswith(PLANNED_PREFIXES) and 'sqlite_' not in sql:
+                        statements.append((relative, node.lineno, sql))
+    return statements
+
+
+def seed_database(conn, scale=1):
+    """
+    Fills the core tables with a small, realistic data set.
+    """
+    cursor = conn.cursor()
+    user_types = ('Customer', 'RestaurantPartner', 'DeliveryPartner')
+    statuses = ('Pending', 'Preparing', 'Out for Delivery', 'Delivered')
+    users = 300 * scale
+    restaurants = 20 * scale
+    cursor.executemany('''
+        INSERT INTO Users (username, password, name, email, user_type) VALUES (?, ?, ?, ?, ?)
+    ''', [(f"user{i}", 'x', f"User {i}", f"user{i}@sprig.com", user_types[i % 3])
+          for i in range(1, users + 1)])
+    cursor.executemany('''
+        INSERT INTO Restaurants (restaurant_name, address, cuisine_type) VALUES (?, ?, ?)
+    ''', [(f"Restaurant {i}", f"{i} Main Street", 'Indian') for i in range(1, restaurants + 1)])
+    customers = [i for i in range(1, users + 1) if i % 3 == 1]
+    partners = [i for i in range(1, users + 1) if i % 3 == 2]
+    riders = [i for i in range(1, users + 1) if i % 3 == 0]
+    cursor.executemany('INSERT INTO Customers (id, phone_number) VALUES (?, ?)',
+                       [(i, '9999999999') for i in customers])
+    cursor.executemany('''
+        INSERT INTO RestaurantPartners (id, restaurant_id, address, cuisine_type) VALUES (?, ?, ?, ?)
+    ''', [(p, n % restaurants + 1, 'Main Street', 'Indian') for n, p in enumerate(partners)])
+    cursor.executemany('''
+        INSERT INTO DeliveryPartners (id, vehicle_type, license_number) VALUES (?, ?, ?)
+    ''', [(r, 'Bike', f"KA{r:06d}") for r in riders])
+    cursor.executemany('''
+        INSERT INTO MenuItems (restaurant_id, item_name, item_description, price, item_type)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(r, f"Dish {i}", 'Tasty', 100 + i, 'Veg')
+          for r in range(1, restaurants + 1) for i in range(20)])
+    orders = 2000 * scale
+    cursor.executemany('''
+        INSERT INTO Orders (customer_id, restaurant_id, order_status, order_date, delivery_partner_id)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(customers[i % len(customers)], i % restaurants + 1, statuses[i % 4],
+           f"2024-01-{i % 28 + 1:02d}", riders[i % len(riders)]) for i in range(orders)])
+    cursor.executemany('INSERT INTO OrderItems (order_id, menu_item_id, quantity) VALUES (?, ?, ?)',
+                       [(o, (o * 7) % (restaurants * 20) + 1, 1) for o in range(1, orders + 1)])
+    conn.commit()
+
+
+def table_aliases(sql):
+    aliases = {}
+    for table, alias in TABLE_REF.findall(sql):
+        aliases[table] = table
+        if alias:
+            aliases[alias] = table
+    return aliases
+
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def rowid_columns(conn, table):
+    """
+    Returns the names that address a table's rowid: its INTEGER PRIMARY KEY column, if any,
+    and the rowid aliases. An index on them would duplicate the table itself.
+    """
+    info = conn.execute(f"PRAGMA table_info({table})").fetchall()
+    keys = [row for row in info if row[5]]
+    columns = {'rowid', '_rowid_', 'oid'}
+    if len(keys) == 1 and keys[0][2].upper() == 'INTEGER':
+        columns.add(keys[0][1])
+    return columns
+
+
+def propose_index(conn, sql, table):
+    """
+    Builds a composite index proposal for a scanned table from the statement's
+    WHERE predicates and ORDER BY, plus a covering variant when possible.
+    """
+    aliases = table_aliases(sql)
+    columns = table_columns(conn, table)
+
+    def owned(qualifier, column):
+        if column not in columns:
+            return False
+        return qualifier is None or aliases.get(qualifier) == table
+
+    where = re.split(r'\bWHERE\b', sql, maxsplit=1, flags=re.IGNORECASE)
+    equality, ranges = [], []
+    if len(where) > 1:
+        clause = re.split(r'\b(?:ORDER|GROUP)\s+BY\b|\bLIMIT\b', where[1], flags=re.IGNORECASE)[0]
+        for qualifier, column, op in PREDICATE.findall(clause):
+            if not owned(qualifier or None, column):
+                continue
+            target = equality if op.strip().upper() in ('=', 'IN') else ranges
+            if column not in equality + ranges:
+                target.append(column)
+
+    order = []
+    match = ORDER_BY.search(sql)
+    if match:
+        for term in match.group(1).split(','):
+            parts = term.strip().split()[0].split('.')
+            qualifier, column = (parts[0], parts[1]) if len(parts) == 2 else (None, parts[0])
+            if owned(qualifier, column) and column not in equality + ranges + order:
+                order.append(column)
+
+    rowid = rowid_columns(conn, table)
+    key = [column for column in equality + ranges[:1] + order if column not in rowid]
+    if not key:
+        return None, None
+
+    covering = None
+    select = re.match(r'\s*SELECT\s+(.+?)\s+FROM\b', sql, re.IGNORECASE | re.DOTALL)
+    if select and '*' not in select.group(1):
+        selected = []
+        for term in select.group(1).split(','):
+            parts = term.strip().split()[0].split('.')
+            qualifier, column = (parts[0], parts[1]) if len(parts) == 2 else (None, parts[0])
+            if owned(qualifier, column) and column not in rowid and column not in key + selected:
+                selected.append(column)
+        if selected and len(key) + len(selected) <= 5:
+            covering = key + selected
+    return key, covering
+
+
+def index_sql(table, columns):
+    name = 'idx_' + re.sub(r'(?<!^)(?=[A-Z])', '_', table).lower() + '_' + '_'.join(columns)
+    return f"CREATE INDEX IF NOT EXISTS {name} ON {table}({', '.join(columns)})"
+
+
+def null_parameters(sql):
+    """
+    Returns None for every parameter of sql: a dict for :name/@name/$name parameters,
+    otherwise a tuple for ? placeholders. String literals and comments are skipped.
+    """
+    code = re.sub(r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|--[^\n]*|/\*.*?\*/""", ' ', sql, flags=re.S)
+    names = re.findall(r'[:@$]([A-Za-z_]\w*)', code)
+    if names:
+        return dict.fromkeys(names)
+    return (None,) * code.count('?')
+
+
+def advise(conn, statements):
+    """
+    Plans each statement and returns a list of findings dicts.
+    """
+    findings = []
+    for path, line, sql in statements:
+        finding = {'path': path, 'line': line, 'sql': sql, 'plan': [], 'issues': [],
+                   'proposals': [], 'error': None}
+        try:
+            plan = conn.execute('EXPLAIN QUERY PLAN ' + sql, null_parameters(sql)).fetchall()
+        except sqlite3.Error as e:
+            finding['error'] = str(e)
+            findings.append(finding)
+            continue
+        aliases = table_aliases(sql)
+        for row in plan:
+            detail = row[3]
+            finding['plan'].append(detail)
+            scan = re.match(r'SCAN (\w+)(?: AS (\w+))?$', detail)
+            if scan:
+                table = aliases.get(scan.group(1), scan.group(1))
+                finding['issues'].append(f"full scan of {table}")
+                key, covering = propose_index(conn, sql, table)
+                if key:
+                    finding['proposals'].append(index_sql(table, key))
+                if covering:
+                    finding['proposals'].append(index_sql(table, covering) + '  -- covering')
+            elif 'USE TEMP B-TREE' in detail:
+                finding['issues'].append(detail.lower())
+        findings.append(finding)
+    return findings
+
+
+def build_database(analyze=False):
+    conn = sqlite3.connect(':memory:')
+    migrate(conn)
+    seed_database(conn)
+    if analyze:
+        conn.execute('ANALYZE')
+    return conn
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check shipped SQL statements against the schema.')
+    parser.add_argument('--all', action='store_true', help='also list statements without issues')
+    parser.add_argument('--analyze', action='store_true',
+                        help='run ANALYZE on the seeded data before planning')
+    args = parser.parse_args(argv)
+
+    conn = build_database(args.analyze)
+    findings = advise(conn, collect_statements())
+    proposals = []
+    for finding in findings:
+        if not (finding['error'] or finding['issues'] or args.all):
+            continue
+        print(f"{finding['path']}:{finding['line']}: {finding['sql'][:110]}")
+        if finding['error']:
+            print(f"    ERROR: {finding['error']}")
+        for detail in finding['plan']:
+            print(f"    plan: {detail}")
+        for issue in finding['issues']:
+            print(f"    issue: {issue}")
+        for proposal in finding['proposals']:
+            print(f"    proposal: {proposal}")
+            if proposal not in proposals:
+                proposals.append(proposal)
+    errors = sum(1 for f in findings if f['error'])
+    flagged = sum(1 for f in findings if f['issues'])
+    print(f"\n{len(findings)} statements, {flagged} with scans or temp B-trees, {errors} failing to prepare.")
+    if proposals:
+        print('Proposed indexes:')
+        for proposal in proposals:
+            print(f"    {proposal}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,277 @@
+'''
+Query instrumentation
+Purpose: Shows which SQL statements dominate database time.
+Pooled connections hand out InstrumentedCursor objects. While instrumentation is
+enabled each statement records its call count, total and p50/p95/p99 latency
+(execute plus fetch) and the rows returned. Statements slower than the threshold
+are written to the slow-query log together with their EXPLAIN QUERY PLAN output.
+
+Enable with SPRIG_QUERY_STATS=<file> (stats are written there at exit) or by
+calling enable_instrumentation(). Print the report with:
+python -m utils.instrumentation [--top N] <file>
+
+'''
+
+import argparse
+import atexit
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+SAMPLE_LIMIT = 1024
+
+slow_query_logger = logging.getLogger('sprig.slow_query')
+
+_enabled = False
+_slow_query_ms = float(os.environ.get('SPRIG_SLOW_QUERY_MS', '50'))
+_lock = threading.Lock()
+_stats = {}
+
+
+def normalize_sql(sql):
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+class StatementStats:
+    __slots__ = ('sql', 'count', 'total', 'rows', 'samples', '_next_sample')
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.total = 0.0
+        self.rows = 0
+        self.samples = []
+        self._next_sample = 0
+
+    def add(self, elapsed, rows):
+        self.count += 1
+        self.total += elapsed
+        self.rows += rows
+        # Keep a bounded ring of recent samples for the percentiles
+        if len(self.samples) < SAMPLE_LIMIT:
+            self.samples.append(elapsed)
+        else:
+            self.samples[self._next_sample] = elapsed
+            self._next_sample = (self._next_sample + 1) % SAMPLE_LIMIT
+
+    def percentile(self, p):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def as_dict(self):
+        return {
+            'sql': self.sql,
+            'count': self.count,
+            'total_ms': self.total * 1000,
+            'p50_ms': self.percentile(50) * 1000,
+            'p95_ms': self.percentile(95) * 1000,
+            'p99_ms': self.percentile(99) * 1000,
+            'rows': self.rows,
+        }
+
+
+def _record(conn, sql, params, elapsed, rows):
+    key = normalize_sql(sql)
+    with _lock:
+        stats = _stats.get(key)
+        if stats is None:
+            stats = _stats[key] = StatementStats(key)
+        stats.add(elapsed, rows)
+    if elapsed * 1000 >= _slow_query_ms:
+        _log_slow_query(conn, sql, params, elapsed)
+
+
+def _log_slow_query(conn, sql, params, elapsed):
+    try:
+        plan = sqlite3.Cursor(conn).execute(
+            'EXPLAIN QUERY PLAN ' + sql, params or ()).fetchall()
+        plan = '\n'.join(f"    {row[3]}" for row in plan)
+    except (sqlite3.Error, ValueError):
+        plan = '    (no plan available)'
+    slow_query_logger.warning("%.1f ms: %s\n%s", elapsed * 1000, normalize_sql(sql), plan)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Cursor that times each statement from execute() until its results are consumed.
+    """
+
+    _pending = None
+
+    def _start(self, sql, params):
+        self._finish()
+        self._pending = [sql, params, 0.0, 0]
+
+    def _finish(self):
+        pending = self._pending
+        if pending is not None:
+            self._pending = None
+            _record(self.connection, *pending)
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._pending is not None:
+                self._pending[2] += time.perf_counter() - start
+
+    def execute(self, sql, parameters=()):
+        if not _enabled:
+            return super().execute(sql, parameters)
+        self._start(sql, parameters)
+        result = self._timed(super().execute, sql, parameters)
+        # Statements without a result set are complete once executed
+        if self.description is None:
+            self._finish()
+        return result
+
+    def executemany(self, sql, seq_of_parameters):
+        if not _enabled:
+            return super().executemany(sql, seq_of_parameters)
+        seq_of_parameters = list(seq_of_parameters)
+        self._start(sql, seq_of_parameters[0] if seq_of_parameters else ())
+        try:
+            return self._timed(super().executemany, sql, seq_of_parameters)
+        finally:
+            self._finish()
+
+    def fetchone(self):
+        if self._pending is None:
+            return super().fetchone()
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        else:
+            self._pending[3] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        if self._pending is None:
+            return super().fetchmany(self.arraysize if size is None else size)
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        self._pending[3] += len(rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        if self._pending is None:
+            return super().fetchall()
+        rows = self._timed(super().fetchall)
+        self._pending[3] += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        if self._pending is None:
+            return super().__next__()
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        self._pending[3] += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    Connection whose cursors, including those behind conn.execute(), are instrumented.
+    sqlite3.Connection.execute() creates its cursor internally, so the shortcuts are
+    routed through cursor() here.
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self.cursor().executemany(sql, parameters)
+
+
+def enable_instrumentation(slow_query_ms=None, slow_query_log=None):
+    """
+    Starts recording statement stats. slow_query_log names a file for slow statements;
+    without one they go to the 'sprig.slow_query' logger's existing handlers.
+    """
+    global _enabled, _slow_query_ms
+    if slow_query_ms is not None:
+        _slow_query_ms = slow_query_ms
+    if slow_query_log:
+        handler = logging.FileHandler(slow_query_log)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_query_logger.addHandler(handler)
+    _enabled = True
+
+
+def disable_instrumentation():
+    global _enabled
+    _enabled = False
+
+
+def reset_stats():
+    with _lock:
+        _stats.clear()
+
+
+def get_stats():
+    """
+    Returns per-statement stats as dicts, most expensive (by total time) first.
+    """
+    with _lock:
+        stats = [s.as_dict() for s in _stats.values()]
+    return sorted(stats, key=lambda s: s['total_ms'], reverse=True)
+
+
+def dump_stats(path):
+    with open(path, 'w') as f:
+        json.dump(get_stats(), f, indent=2)
+
+
+def format_report(stats, top=20):
+    lines = [f"{'calls':>8} {'total ms':>10} {'p50':>8} {'p95':>8} {'p99':>8} {'rows':>8}  statement"]
+    for s in stats[:top]:
+        lines.append(f"{s['count']:>8} {s['total_ms']:>10.1f} {s['p50_ms']:>8.2f} "
+                     f"{s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f} {s['rows']:>8}  {s['sql'][:100]}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Show the top statements by total time.')
+    parser.add_argument('stats_file', help='file written via SPRIG_QUERY_STATS or dump_stats()')
+    parser.add_argument('--top', type=int, default=20, help='number of statements to show')
+    args = parser.parse_args(argv)
+    with open(args.stats_file) as f:
+        stats = json.load(f)
+    stats.sort(key=lambda s: s['total_ms'], reverse=True)
+    print(format_report(stats, args.top))
+    return 0
+
+
+if os.environ.get('SPRIG_QUERY_STATS'):
+    enable_instrumentation(slow_query_log=os.environ.get('SPRIG_SLOW_QUERY_LOG', 'slow_queries.log'))
+    atexit.register(dump_stats, os.environ['SPRIG_QUERY_STATS'])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
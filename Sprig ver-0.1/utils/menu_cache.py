@@ -0,0 +1,155 @@
+'''
+Menu cache
+Purpose: Serves Restaurant.get_menu and Menu.get_menu from memory.
+Menus are read far more often than they change, so each restaurant's menu rows are
+kept in an LRU map bounded by entry count and an estimate of their memory use.
+Every menu write invalidates the restaurant's entry, both immediately and again once
+its transaction commits, and a generation counter stops a read that raced with a
+write from caching the old rows.
+
+Size the cache with SPRIG_MENU_CACHE_BYTES / SPRIG_MENU_CACHE_ENTRIES; warm_up()
+preloads the most-ordered restaurants at startup.
+
+'''
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from utils.database import connection, in_unit_of_work, on_commit
+
+MAX_BYTES = int(os.environ.get('SPRIG_MENU_CACHE_BYTES', str(16 * 1024 * 1024)))
+MAX_ENTRIES = int(os.environ.get('SPRIG_MENU_CACHE_ENTRIES', '1000'))
+WARM_UP_RESTAURANTS = int(os.environ.get('SPRIG_MENU_WARMUP', '50'))
+
+
+def estimate_size(rows):
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+class MenuCache:
+    """
+    Per-restaurant LRU cache of menu rows with hit/miss metrics.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES, max_entries=MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        # Bumped on every invalidation so holders of menu prices, such as carts, can tell they may be stale
+        self.version = 0
+
+    def get(self, restaurant_id):
+        """
+        Returns the restaurant's menu rows, loading them on a miss.
+        """
+        restaurant_id = int(restaurant_id)
+        with self._lock:
+            entry = self._entries.get(restaurant_id)
+            if entry is not None:
+                self._entries.move_to_end(restaurant_id)
+                self._hits += 1
+                return list(entry[0])
+            self._misses += 1
+            generation = self._generations.get(restaurant_id, 0)
+
+        rows = self._load(restaurant_id)
+        if in_unit_of_work():
+            # Rows read inside a transaction may include writes that later roll back
+            return list(rows)
+        with self._lock:
+            # A write since we started loading makes these rows stale
+            if self._generations.get(restaurant_id, 0) == generation:
+                self._store(restaurant_id, rows)
+        return list(rows)
+
+    def _load(self, restaurant_id):
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM MenuItems WHERE restaurant_id=?', (restaurant_id,))
+            return tuple(cursor.fetchall())
+
+    def _store(self, restaurant_id, rows):
+        size = estimate_size(rows)
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(restaurant_id, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._entries[restaurant_id] = (rows, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self._evictions += 1
+
+    def invalidate(self, restaurant_id=None):
+        """
+        Drops one restaurant's menu, or every menu when restaurant_id is None.
+        """
+        with self._lock:
+            self._invalidations += 1
+            self.version += 1
+            if restaurant_id is None:
+                for key in list(self._generations) + list(self._entries):
+                    self._generations[key] = self._generations.get(key, 0) + 1
+                self._entries.clear()
+                self._bytes = 0
+                return
+            restaurant_id = int(restaurant_id)
+            self._generations[restaurant_id] = self._generations.get(restaurant_id, 0) + 1
+            entry = self._entries.pop(restaurant_id, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def warm_up(self, restaurants=WARM_UP_RESTAURANTS):
+        """
+        Preloads the menus of the most-ordered restaurants and returns how many were loaded.
+        """
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT restaurant_id FROM Orders
+                GROUP BY restaurant_id
+                ORDER BY COUNT(*) DESC
+                LIMIT ?
+            ''', (restaurants,))
+            restaurant_ids = [row[0] for row in cursor.fetchall()]
+        for restaurant_id in restaurant_ids:
+            self.get(restaurant_id)
+        return len(restaurant_ids)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+            }
+
+
+menu_cache = MenuCache()
+
+
+def invalidate_menu(restaurant_id):
+    """
+    Invalidates a restaurant's cached menu now and again after the current unit of work commits.
+    """
+    menu_cache.invalidate(restaurant_id)
+    on_commit(lambda: menu_cache.invalidate(restaurant_id))
@@ -0,0 +1,502 @@
+'''
+Schema migrations
+Purpose: Evolves the database schema in place instead of dropping and recreating it.
+The applied version is stored in PRAGMA user_version; only migrations newer than it run,
+in order, inside a single transaction, so a failed upgrade leaves the schema untouched.
+
+Usage (from the project directory):
+python -m utils.migrations            Apply pending migrations.
+python -m utils.migrations --status   Show the current and latest schema version.
+
+'''
+
+import argparse
+import sys
+
+from utils import database
+from utils.database import get_db_connection
+
+
+def allow_cancelled_orders(cursor):
+    """
+    Rebuilds Orders so its order_status CHECK also accepts 'Cancelled'.
+    SQLite cannot alter a CHECK constraint, so the table is copied into a new one
+    (keeping every column added since) and its indexes are recreated. migrate() runs
+    with foreign keys off, so OrderItems and Payments keep pointing at Orders throughout.
+    """
+    table_sql = cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type='table' AND name='Orders'").fetchone()[0]
+    index_sql = [row[0] for row in cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type='index' AND tbl_name='Orders' AND sql IS NOT NULL")]
+    new_sql = table_sql.replace(
+        "'Out for Delivery', 'Delivered')", "'Out for Delivery', 'Delivered', 'Cancelled')", 1)
+    new_sql = new_sql.replace('Orders', 'Orders_new', 1)
+    cursor.execute(new_sql)
+    cursor.execute('INSERT INTO Orders_new SELECT * FROM Orders')
+    cursor.execute('DROP TABLE Orders')
+    cursor.execute('ALTER TABLE Orders_new RENAME TO Orders')
+    for sql in index_sql:
+        cursor.execute(sql)
+
+
+# Each migration is (version, description, steps). A step is either an SQL
+# statement or a callable taking a cursor. Never edit a released migration;
+# append a new one with the next version number instead.
+MIGRATIONS = [
+    (1, 'Initial schema', [
+        # 1. Users table (base table)
+        '''
+            CREATE TABLE IF NOT EXISTS Users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL UNIQUE,
+                password TEXT NOT NULL,
+                name TEXT NOT NULL,
+                email TEXT NOT NULL UNIQUE,
+                user_type TEXT NOT NULL CHECK(user_type IN ('Customer', 'RestaurantPartner', 'DeliveryPartner'))
+            )
+        ''',
+
+        # 2. Restaurants table (no foreign keys)
+        '''
+            CREATE TABLE IF NOT EXISTS Restaurants (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                restaurant_name TEXT NOT NULL,
+                address TEXT NOT NULL,
+                cuisine_type TEXT NOT NULL,
+                rating REAL DEFAULT 0.0
+            )
+        ''',
+
+        # Create Customers table (extends Users)
+        '''
+            CREATE TABLE IF NOT EXISTS Customers (
+                id INTEGER PRIMARY KEY,
+                phone_number TEXT NOT NULL,
+                address TEXT,
+                FOREIGN KEY (id) REFERENCES Users(id)
+            )
+        ''',
+
+        # Create RestaurantPartners table (extends Users)
+        '''
+            CREATE TABLE IF NOT EXISTS RestaurantPartners (
+                id INTEGER PRIMARY KEY,
+                restaurant_id INTEGER NOT NULL,
+                address TEXT NOT NULL,
+                cuisine_type TEXT NOT NULL,
+                FOREIGN KEY (id) REFERENCES Users(id),
+                FOREIGN KEY (restaurant_id) REFERENCES Restaurants(id)
+            )
+        ''',
+
+        # Create DeliveryPartners table (extends Users)
+        '''
+            CREATE TABLE IF NOT EXISTS DeliveryPartners (
+                id INTEGER PRIMARY KEY,
+                vehicle_type TEXT NOT NULL,
+                license_number TEXT NOT NULL,
+                FOREIGN KEY (id) REFERENCES Users(id)
+            )
+        ''',
+
+        # Create index for restaurant_id in RestaurantPartners for fast lookups
+        'CREATE INDEX IF NOT EXISTS idx_restaurant_partners_restaurant_id ON RestaurantPartners(restaurant_id)',
+
+        # Create MenuItems table (each restaurant has multiple menu items)
+        '''
+            CREATE TABLE IF NOT EXISTS MenuItems (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                restaurant_id INTEGER NOT NULL,
+                item_name TEXT NOT NULL,
+                item_description TEXT,
+                price REAL NOT NULL,
+                item_type TEXT NOT NULL,
+                availability INTEGER DEFAULT 1,
+                FOREIGN KEY (restaurant_id) REFERENCES Restaurants(id)
+            )
+        ''',
+
+        # Create index for restaurant_id in MenuItems for faster restaurant-menu item lookups
+        'CREATE INDEX IF NOT EXISTS idx_menu_items_restaurant_id ON MenuItems(restaurant_id)',
+
+        # Create Carts table (each customer has a cart)
+        '''
+            CREATE TABLE IF NOT EXISTS Carts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                customer_id INTEGER NOT NULL,
+                total_price REAL DEFAULT 0.0,
+                FOREIGN KEY (customer_id) REFERENCES Customers(id)
+            )
+        ''',
+
+        # Create index for customer_id in Carts for faster lookups
+        'CREATE INDEX IF NOT EXISTS idx_carts_customer_id ON Carts(customer_id)',
+
+        # Create CartItems table (to store items in a cart)
+        '''
+            CREATE TABLE IF NOT EXISTS CartItems (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                cart_id INTEGER NOT NULL,
+                menu_item_id INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                FOREIGN KEY (cart_id) REFERENCES Carts(id),
+                FOREIGN KEY (menu_item_id) REFERENCES MenuItems(id)
+            )
+        ''',
+
+        # Create index for cart_id in CartItems for fast retrieval of cart contents
+        'CREATE INDEX IF NOT EXISTS idx_cart_items_cart_id ON CartItems(cart_id)',
+
+        # Create Orders table (links customers, restaurants, and delivery partners)
+        '''
+            CREATE TABLE IF NOT EXISTS Orders (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                customer_id INTEGER NOT NULL,
+                restaurant_id INTEGER NOT NULL,
+                order_status TEXT NOT NULL CHECK(order_status IN ('Pending', 'Preparing', 'Out for Delivery', 'Delivered')),
+                order_date TEXT NOT NULL,
+                delivery_partner_id INTEGER,
+                membership_discount REAL DEFAULT 0.0,
+                FOREIGN KEY (customer_id) REFERENCES Customers(id),
+                FOREIGN KEY (restaurant_id) REFERENCES Restaurants(id),
+                FOREIGN KEY (delivery_partner_id) REFERENCES DeliveryPartners(id)
+            )
+        ''',
+
+        # Create index for customer_id and restaurant_id in Orders for fast lookups
+        'CREATE INDEX IF NOT EXISTS idx_orders_customer_id ON Orders(customer_id)',
+        'CREATE INDEX IF NOT EXISTS idx_orders_restaurant_id ON Orders(restaurant_id)',
+
+        # Create OrderItems table (each order can have multiple items)
+        '''
+            CREATE TABLE IF NOT EXISTS OrderItems (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                order_id INTEGER NOT NULL,
+                menu_item_id INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                FOREIGN KEY (order_id) REFERENCES Orders(id),
+                FOREIGN KEY (menu_item_id) REFERENCES MenuItems(id)
+            )
+        ''',
+
+        # Create index for order_id in OrderItems for fast retrieval of order details
+        'CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON OrderItems(order_id)',
+
+        # Create Membership table (each customer can have a membership)
+        '''
+            CREATE TABLE IF NOT EXISTS Membership (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                customer_id INTEGER NOT NULL,
+                membership_type TEXT NOT NULL,
+                discount_rate REAL NOT NULL,
+                expiry_date TEXT NOT NULL,
+                FOREIGN KEY (customer_id) REFERENCES Customers(id)
+            )
+        ''',
+
+        # Create index for customer_id in Membership for fast membership lookups
+        'CREATE INDEX IF NOT EXISTS idx_membership_customer_id ON Membership(customer_id)',
+
+        # Create Payments table (each order has a payment)
+        '''
+            CREATE TABLE IF NOT EXISTS Payments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                order_id INTEGER NOT NULL,
+                payment_method TEXT NOT NULL,
+                payment_status TEXT NOT NULL CHECK(payment_status IN ('Pending', 'Completed', 'Refunded')),
+                payment_date TEXT NOT NULL,
+                amount REAL NOT NULL,
+                FOREIGN KEY (order_id) REFERENCES Orders(id)
+            )
+        ''',
+
+        # Create index for order_id in Payments for fast lookup of payments
+        'CREATE INDEX IF NOT EXISTS idx_payments_order_id ON Payments(order_id)',
+    ]),
+    (2, 'Index Orders.delivery_partner_id', [
+        # DeliveryPartner.view_assigned_orders scanned every order (found by utils/index_advisor.py)
+        'CREATE INDEX IF NOT EXISTS idx_orders_delivery_partner_id ON Orders(delivery_partner_id)',
+    ]),
+    (3, 'Full-text search over menu items and restaurants', [
+        # One FTS5 table holds both kinds of document so a single ranked query returns
+        # restaurant and dish hits. Menu items use rowid id*2, restaurants id*2+1.
+        '''
+            CREATE VIRTUAL TABLE IF NOT EXISTS SearchIndex USING fts5(
+                kind UNINDEXED,
+                ref_id UNINDEXED,
+                restaurant_id UNINDEXED,
+                title,
+                body,
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_menu_items_search_insert AFTER INSERT ON MenuItems
+            BEGIN
+                INSERT INTO SearchIndex (rowid, kind, ref_id, restaurant_id, title, body)
+                VALUES (new.id * 2, 'item', new.id, new.restaurant_id, new.item_name,
+                        coalesce(new.item_description, ''));
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_menu_items_search_update
+            AFTER UPDATE OF restaurant_id, item_name, item_description ON MenuItems
+            BEGIN
+                DELETE FROM SearchIndex WHERE rowid = old.id * 2;
+                INSERT INTO SearchIndex (rowid, kind, ref_id, restaurant_id, title, body)
+                VALUES (new.id * 2, 'item', new.id, new.restaurant_id, new.item_name,
+                        coalesce(new.item_description, ''));
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_menu_items_search_delete AFTER DELETE ON MenuItems
+            BEGIN
+                DELETE FROM SearchIndex WHERE rowid = old.id * 2;
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_restaurants_search_insert AFTER INSERT ON Restaurants
+            BEGIN
+                INSERT INTO SearchIndex (rowid, kind, ref_id, restaurant_id, title, body)
+                VALUES (new.id * 2 + 1, 'restaurant', new.id, new.id, new.restaurant_name,
+                        new.cuisine_type);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_restaurants_search_update
+            AFTER UPDATE OF restaurant_name, cuisine_type ON Restaurants
+            BEGIN
+                DELETE FROM SearchIndex WHERE rowid = old.id * 2 + 1;
+                INSERT INTO SearchIndex (rowid, kind, ref_id, restaurant_id, title, body)
+                VALUES (new.id * 2 + 1, 'restaurant', new.id, new.id, new.restaurant_name,
+                        new.cuisine_type);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_restaurants_search_delete AFTER DELETE ON Restaurants
+            BEGIN
+                DELETE FROM SearchIndex WHERE rowid = old.id * 2 + 1;
+            END
+        ''',
+        # Index rows that existed before this migration
+        '''
+            INSERT INTO SearchIndex (rowid, kind, ref_id, restaurant_id, title, body)
+            SELECT id * 2, 'item', id, restaurant_id, item_name, coalesce(item_description, '')
+            FROM MenuItems
+        ''',
+        '''
+            INSERT INTO SearchIndex (rowid, kind, ref_id, restaurant_id, title, body)
+            SELECT id * 2 + 1, 'restaurant', id, id, restaurant_name, cuisine_type
+            FROM Restaurants
+        ''',
+    ]),
+    (4, 'One CartItems row per cart and menu item', [
+        # The cart store upserts cart lines, which needs a unique key; keep the newest duplicate
+        '''
+            DELETE FROM CartItems WHERE id NOT IN (
+                SELECT MAX(id) FROM CartItems GROUP BY cart_id, menu_item_id
+            )
+        ''',
+        'DROP INDEX IF EXISTS idx_cart_items_cart_id',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_cart_items_cart_id_menu_item_id ON CartItems(cart_id, menu_item_id)',
+    ]),
+    (5, 'Order totals and order-time prices', [
+        # Orders keep their total and each line its price at order time, so reports need no MenuItems join
+        'ALTER TABLE Orders ADD COLUMN total_amount REAL',
+        'ALTER TABLE OrderItems ADD COLUMN price REAL',
+        '''
+            UPDATE OrderItems SET price = (SELECT price FROM MenuItems WHERE MenuItems.id = OrderItems.menu_item_id)
+        ''',
+        '''
+            UPDATE Orders SET total_amount = coalesce(
+                (SELECT SUM(price * quantity) FROM OrderItems WHERE OrderItems.order_id = Orders.id), 0
+            ) - coalesce(membership_discount, 0)
+        ''',
+    ]),
+    (6, "Allow 'Cancelled' orders", [
+        # Order.cancel_order wrote a status the CHECK constraint rejected
+        allow_cancelled_orders,
+    ]),
+    (7, 'Append-only order event log', [
+        # One row per status change, clustered by order so an order's history is one range read
+        '''
+            CREATE TABLE IF NOT EXISTS OrderEvents (
+                order_id INTEGER NOT NULL,
+                seq INTEGER NOT NULL,
+                from_status TEXT,
+                to_status TEXT NOT NULL,
+                actor TEXT,
+                created_at INTEGER NOT NULL,
+                PRIMARY KEY (order_id, seq),
+                FOREIGN KEY (order_id) REFERENCES Orders(id)
+            ) WITHOUT ROWID
+        ''',
+        # Orders.order_status stays the current-status projection; these make appending O(1)
+        'ALTER TABLE Orders ADD COLUMN status_seq INTEGER NOT NULL DEFAULT 0',
+        'ALTER TABLE Orders ADD COLUMN status_changed_at INTEGER',
+        # Existing orders start their history in their current status, as of their order date
+        '''
+            UPDATE Orders SET status_seq = 1,
+                status_changed_at = coalesce(CAST(strftime('%s', order_date) AS INTEGER) * 1000,
+                                             CAST(strftime('%s', 'now') AS INTEGER) * 1000)
+        ''',
+        '''
+            INSERT INTO OrderEvents (order_id, seq, from_status, to_status, actor, created_at)
+            SELECT id, 1, NULL, order_status, NULL, status_changed_at FROM Orders
+        ''',
+    ]),
+    (8, 'Keyset pagination indexes on Orders', [
+        # (scope, order_date) plus the implicit rowid serves ORDER BY order_date DESC, id DESC
+        # straight from the index; each replaces the single-column index it extends
+        'CREATE INDEX IF NOT EXISTS idx_orders_customer_id_order_date ON Orders(customer_id, order_date)',
+        'CREATE INDEX IF NOT EXISTS idx_orders_restaurant_id_order_date ON Orders(restaurant_id, order_date)',
+        'CREATE INDEX IF NOT EXISTS idx_orders_delivery_partner_id_order_date '
+        'ON Orders(delivery_partner_id, order_date)',
+        # Restaurant queues are usually filtered to one status
+        'CREATE INDEX IF NOT EXISTS idx_orders_restaurant_id_order_status_order_date '
+        'ON Orders(restaurant_id, order_status, order_date)',
+        'DROP INDEX IF EXISTS idx_orders_customer_id',
+        'DROP INDEX IF EXISTS idx_orders_restaurant_id',
+        'DROP INDEX IF EXISTS idx_orders_delivery_partner_id',
+    ]),
+    (9, 'Order change sequence for partner delta feeds', [
+        # A single counter row; every insert or update of an Orders row takes the next value.
+        # SQLite has one writer at a time, so values become visible in the order they were taken.
+        '''
+            CREATE TABLE IF NOT EXISTS Counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''',
+        'ALTER TABLE Orders ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0',
+        # Existing orders count as changed in id order
+        'UPDATE Orders SET change_seq = id',
+        """INSERT INTO Counters (name, value) SELECT 'orders', coalesce(MAX(change_seq), 0) FROM Orders""",
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_orders_change_seq_insert AFTER INSERT ON Orders
+            WHEN new.change_seq = 0
+            BEGIN
+                UPDATE Counters SET value = value + 1 WHERE name = 'orders';
+                UPDATE Orders SET change_seq = (SELECT value FROM Counters WHERE name = 'orders')
+                WHERE id = new.id;
+            END
+        ''',
+        # Bulk inserts may take a block of values themselves (see insert_orders), and the
+        # update trigger's WHEN clause skips the triggers' own change_seq updates
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_orders_change_seq_update AFTER UPDATE ON Orders
+            WHEN new.change_seq IS old.change_seq
+            BEGIN
+                UPDATE Counters SET value = value + 1 WHERE name = 'orders';
+                UPDATE Orders SET change_seq = (SELECT value FROM Counters WHERE name = 'orders')
+                WHERE id = new.id;
+            END
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_orders_restaurant_id_change_seq ON Orders(restaurant_id, change_seq)',
+        'CREATE INDEX IF NOT EXISTS idx_orders_delivery_partner_id_change_seq '
+        'ON Orders(delivery_partner_id, change_seq)',
+    ]),
+    (10, 'Login sessions', [
+        # Only a hash of each token is stored, so the table cannot be used to log in
+        '''
+            CREATE TABLE IF NOT EXISTS Sessions (
+                token_hash TEXT PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                user_type TEXT NOT NULL,
+                created_at INTEGER NOT NULL,
+                expires_at INTEGER NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES Users(id)
+            ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON Sessions(user_id)',
+        'CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON Sessions(expires_at)',
+    ]),
+]
+
+
+def latest_version():
+    return MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def pending_migrations(conn):
+    """
+    Returns the migrations newer than the database's schema version, oldest first.
+    """
+    version = get_schema_version(conn)
+    return [migration for migration in MIGRATIONS if migration[0] > version]
+
+
+def migrate(conn):
+    """
+    Applies all pending migrations in one transaction and returns the versions applied.
+    Does nothing beyond the version check when the schema is current.
+    """
+    if not pending_migrations(conn):
+        return []
+
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    cursor = conn.cursor()
+    # Table rebuilds drop and rename tables that others reference; foreign key
+    # enforcement can only be switched off outside the transaction
+    foreign_keys = cursor.execute('PRAGMA foreign_keys').fetchone()[0]
+    cursor.execute('PRAGMA foreign_keys=OFF')
+    try:
+        # Take the write lock first so concurrent starters migrate only once
+        cursor.execute('BEGIN IMMEDIATE')
+        applied = []
+        try:
+            for version, description, steps in pending_migrations(conn):
+                for step in steps:
+                    if callable(step):
+                        step(cursor)
+                    else:
+                        cursor.execute(step)
+                cursor.execute(f'PRAGMA user_version={int(version)}')
+                applied.append(version)
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        return applied
+    finally:
+        cursor.execute(f'PRAGMA foreign_keys={int(foreign_keys)}')
+        conn.isolation_level = isolation_level
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Apply pending Sprig schema migrations.')
+    parser.add_argument('--database', help=f'database file (default: {database.DATABASE})')
+    parser.add_argument('--status', action='store_true',
+                        help='only report the current and latest schema version')
+    args = parser.parse_args(argv)
+
+    if args.database:
+        database.configure_pool(database=args.database)
+
+    conn = get_db_connection()
+    try:
+        current = get_schema_version(conn)
+        if args.status:
+            print(f"Schema version {current}, latest {latest_version()}.")
+            return 0
+        applied = migrate(conn)
+    finally:
+        conn.close()
+
+    if applied:
+        for version, description, _ in MIGRATIONS:
+            if version in applied:
+                print(f"Applied migration {version}: {description}")
+    else:
+        print(f"Schema is up to date (version {current}).")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,314 @@
+'''
+Order hub
+Purpose: Pushes order status changes to in-process subscribers instead of having them poll track_order().
+Status changes publish their OrderEvents row here once their transaction has committed.
+A subscriber first receives a snapshot of the order's current status (the only database
+read), then every later change, and its stream ends after Delivered or Cancelled.
+
+subscribe(order_id) returns an async iterator for asyncio code; subscribe_queue(order_id)
+returns a blocking iterator for threads. Each subscriber has a bounded buffer
+(SPRIG_HUB_BUFFER events); when a slow consumer lets it fill up the oldest events are
+dropped and counted, so a stalled subscriber never holds back publishers. stats()
+reports subscribers, deliveries, drops and slow consumers.
+
+Close a subscription when done with it (close(), aclose(), or a with/async with block).
+The hub only holds subscriptions weakly, so one a consumer abandons without closing is
+unregistered once it is garbage collected rather than buffering events forever.
+
+'''
+
+import asyncio
+import os
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from collections import deque
+
+from utils.database import connection
+
+BUFFER_SIZE = int(os.environ.get('SPRIG_HUB_BUFFER', '64'))
+FINAL_STATUSES = ('Delivered', 'Cancelled')
+
+
+class Subscription(ABC):
+    """
+    One subscriber's bounded event buffer for a single order. Subclasses decide how a
+    waiting consumer is woken up.
+    """
+
+    def __init__(self, hub, order_id, buffer_size):
+        self.hub = hub
+        self.order_id = order_id
+        self._events = deque()
+        self._buffer_size = buffer_size
+        self._lock = threading.Lock()
+        self._seq = 0
+        self.closed = False
+        self.delivered = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def _offer(self, event):
+        """
+        Buffers an event; returns False if an older event had to be dropped to make room.
+        """
+        with self._lock:
+            if self.closed or event['seq'] <= self._seq:
+                return True
+            self._seq = event['seq']
+            dropped = len(self._events) >= self._buffer_size
+            if dropped:
+                self._events.popleft()
+                self.dropped += 1
+            self._events.append(event)
+            self.max_depth = max(self.max_depth, len(self._events))
+        self._wake()
+        return not dropped
+
+    def _offer_snapshot(self, snapshot):
+        """
+        Puts the snapshot first; events it already reflects are dropped, newer ones kept.
+        """
+        with self._lock:
+            self._events = deque(event for event in self._events if event['seq'] > snapshot['seq'])
+            self._events.appendleft(snapshot)
+            self._seq = max(self._seq, snapshot['seq'])
+        self._wake()
+
+    @abstractmethod
+    def _wake(self):
+        """
+        Wakes a consumer waiting for an event; called after every offer and on close.
+        """
+
+    def _take(self):
+        """
+        Returns the next buffered event, or None when the buffer is empty.
+        """
+        with self._lock:
+            if not self._events:
+                return None
+            event = self._events.popleft()
+            self.delivered += 1
+        if event['to_status'] in FINAL_STATUSES:
+            self.close()
+        return event
+
+    def _finished(self):
+        with self._lock:
+            return self.closed and not self._events
+
+    def close(self):
+        """
+        Stops the subscription; events already buffered can still be read.
+        """
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+        self.hub._unsubscribe(self)
+        self._wake()
+
+    def stats(self):
+        with self._lock:
+            return {'order_id': self.order_id, 'depth': len(self._events), 'max_depth': self.max_depth,
+                    'delivered': self.delivered, 'dropped': self.dropped}
+
+
+class AsyncSubscription(Subscription):
+    """
+    Async iterator of an order's status events; the snapshot is read off the event loop.
+    """
+
+    def __init__(self, hub, order_id, buffer_size):
+        super().__init__(hub, order_id, buffer_size)
+        self._loop = None
+        self._ready = None
+        self._snapshot_taken = False
+
+    def _wake(self):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._ready.set)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._ready = asyncio.Event()
+        if not self._snapshot_taken:
+            self._snapshot_taken = True
+            snapshot = await self._loop.run_in_executor(None, self.hub.snapshot, self.order_id)
+            if snapshot is None:
+                self.close()
+            else:
+                self._offer_snapshot(snapshot)
+        while True:
+            self._ready.clear()
+            event = self._take()
+            if event is not None:
+                return event
+            if self._finished():
+                raise StopAsyncIteration
+            await self._ready.wait()
+
+    async def aclose(self):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+
+class QueueSubscription(Subscription):
+    """
+    Blocking iterator of an order's status events for thread consumers.
+    """
+
+    def __init__(self, hub, order_id, buffer_size):
+        super().__init__(hub, order_id, buffer_size)
+        self._ready = threading.Condition()
+
+    def _wake(self):
+        with self._ready:
+            self._ready.notify_all()
+
+    def get(self, timeout=None):
+        """
+        Waits for the next event; returns None on timeout or once the stream has ended.
+        """
+        with self._ready:
+            while True:
+                event = self._take()
+                if event is not None or self._finished():
+                    return event
+                if not self._ready.wait(timeout):
+                    return None
+
+    def __iter__(self):
+        while True:
+            event = self.get()
+            if event is None:
+                return
+            yield event
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class OrderHub:
+    """
+    In-process publish/subscribe of order status events, keyed by order id.
+    """
+
+    def __init__(self, buffer_size=BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._published = 0
+        self._overflows = 0
+        self._closed_dropped = 0
+        self._closed_delivered = 0
+
+    def snapshot(self, order_id):
+        """
+        Reads the order's current status as an event, or None if there is no such order.
+        """
+        with connection() as conn:
+            row = conn.execute('''
+                SELECT order_status, status_seq, status_changed_at FROM Orders WHERE id=?
+            ''', (order_id,)).fetchone()
+        if row is None:
+            return None
+        return {'order_id': order_id, 'seq': row[1], 'from_status': None, 'to_status': row[0],
+                'actor': None, 'created_at': row[2], 'snapshot': True}
+
+    def _register(self, subscription):
+        with self._lock:
+            self._subscribers.setdefault(subscription.order_id, weakref.WeakSet()).add(subscription)
+        # An abandoned subscription leaves the WeakSet when collected; drop the order's entry with it
+        weakref.finalize(subscription, self._prune, subscription.order_id)
+        return subscription
+
+    def _prune(self, order_id):
+        with self._lock:
+            subscribers = self._subscribers.get(order_id)
+            # Iterate rather than len(): the collected subscription may not have left the set yet
+            if subscribers is not None and not list(subscribers):
+                del self._subscribers[order_id]
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.order_id)
+            if subscribers is None or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.order_id]
+            self._closed_dropped += subscription.dropped
+            self._closed_delivered += subscription.delivered
+
+    def subscribe(self, order_id):
+        """
+        Returns an async iterator over the order's status events, starting with a snapshot.
+        """
+        return self._register(AsyncSubscription(self, order_id, self.buffer_size))
+
+    def subscribe_queue(self, order_id):
+        """
+        Returns a blocking iterator over the order's status events, starting with a snapshot.
+        """
+        # Register before reading the snapshot so no change can slip in between
+        subscription = self._register(QueueSubscription(self, order_id, self.buffer_size))
+        snapshot = self.snapshot(order_id)
+        if snapshot is None:
+            subscription.close()
+        else:
+            subscription._offer_snapshot(snapshot)
+        return subscription
+
+    def publish(self, event):
+        """
+        Delivers a committed status event to the order's subscribers without blocking on any of them.
+        """
+        with self._lock:
+            self._published += 1
+            subscribers = list(self._subscribers.get(event['order_id'], ()))
+        for subscription in subscribers:
+            if not subscription._offer(event):
+                with self._lock:
+                    self._overflows += 1
+
+    def stats(self):
+        with self._lock:
+            subscriptions = [s for subscribers in self._subscribers.values() for s in subscribers]
+            published, overflows = self._published, self._overflows
+            dropped, delivered = self._closed_dropped, self._closed_delivered
+        current = [s.stats() for s in subscriptions]
+        return {
+            'orders': len({s['order_id'] for s in current}),
+            'subscribers': len(current),
+            'published': published,
+            'delivered': delivered + sum(s['delivered'] for s in current),
+            'dropped': dropped + sum(s['dropped'] for s in current),
+            'overflows': overflows,
+            'slow_consumers': sum(1 for s in current if s['dropped']),
+            'max_depth': max((s['max_depth'] for s in current), default=0),
+        }
+
+
+order_hub = OrderHub()
+
+
+def subscribe(order_id):
+    return order_hub.subscribe(order_id)
+
+
+def subscribe_queue(order_id):
+    return order_hub.subscribe_queue(order_id)
@@ -0,0 +1,255 @@
+'''
+Sessions
+Purpose: Lets a client prove who it is with an opaque token instead of a password check per request.
+A successful login creates a session and hands out a random token; the Sessions table
+keeps only its sha256 hash. validate(token) answers from an in-memory LRU map of
+SPRIG_SESSION_CACHE_SIZE sessions, so an authenticated request costs a dictionary
+lookup rather than a bcrypt check or a query.
+
+Expiry slides: each use pushes a session's expiry SPRIG_SESSION_TTL_S seconds ahead,
+up to SPRIG_SESSION_MAX_AGE_S after it was created. The new expiry is written back at
+most every SPRIG_SESSION_TOUCH_S seconds per session; that write also notices a session
+revoked by another process. revoke() and revoke_user() end sessions at once, and
+sweep() deletes rows expired for longer than the touch interval, so it never removes a
+session whose slid expiry has not been written yet; it also runs from create() every
+SPRIG_SESSION_SWEEP_S.
+stats() reports hits, misses, and sessions created, revoked and expired.
+
+'''
+
+import hashlib
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from utils.database import connection, on_commit, unit_of_work
+
+TTL_S = int(os.environ.get('SPRIG_SESSION_TTL_S', str(30 * 60)))
+MAX_AGE_S = int(os.environ.get('SPRIG_SESSION_MAX_AGE_S', str(7 * 24 * 3600)))
+TOUCH_S = int(os.environ.get('SPRIG_SESSION_TOUCH_S', '60'))
+SWEEP_S = int(os.environ.get('SPRIG_SESSION_SWEEP_S', '300'))
+MAX_SESSIONS = int(os.environ.get('SPRIG_SESSION_CACHE_SIZE', '10000'))
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class Session:
+    """
+    A validated session: who it belongs to and when it expires (milliseconds).
+    """
+
+    __slots__ = ('token_hash', 'user_id', 'user_type', 'created_at', 'expires_at', 'stored_expires_at')
+
+    def __init__(self, token_hash, user_id, user_type, created_at, expires_at):
+        self.token_hash = token_hash
+        self.user_id = user_id
+        self.user_type = user_type
+        self.created_at = created_at
+        self.expires_at = expires_at
+        # Expiry as last written to the Sessions table
+        self.stored_expires_at = expires_at
+
+
+class SessionStore:
+    """
+    Sessions table with an LRU cache of live sessions in front of it.
+    """
+
+    def __init__(self, ttl_s=TTL_S, max_age_s=MAX_AGE_S, touch_s=TOUCH_S, sweep_s=SWEEP_S,
+                 max_sessions=MAX_SESSIONS):
+        self.ttl = ttl_s * 1000
+        self.max_age = max_age_s * 1000
+        self.touch_interval = touch_s * 1000
+        self.sweep_interval = sweep_s * 1000
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = now_ms()
+        self._hits = 0
+        self._misses = 0
+        self._created = 0
+        self._revoked = 0
+        self._expired = 0
+        self._touches = 0
+
+    def _expiry(self, created_at, now):
+        return min(now + self.ttl, created_at + self.max_age)
+
+    def _cache(self, session):
+        with self._lock:
+            self._sessions[session.token_hash] = session
+            self._sessions.move_to_end(session.token_hash)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def _forget(self, token_hash):
+        with self._lock:
+            return self._sessions.pop(token_hash, None)
+
+    def create(self, user_id, user_type):
+        """
+        Starts a session for a user who has just logged in and returns its token.
+        """
+        token = secrets.token_urlsafe(32)
+        now = now_ms()
+        session = Session(hash_token(token), user_id, user_type, now, self._expiry(now, now))
+        with unit_of_work() as cursor:
+            cursor.execute('''
+                INSERT INTO Sessions (token_hash, user_id, user_type, created_at, expires_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (session.token_hash, user_id, user_type, now, session.expires_at))
+            # Only a committed session may be served from memory
+            on_commit(lambda: self._cache(session))
+        with self._lock:
+            self._created += 1
+            sweep_due = now - self._last_sweep >= self.sweep_interval
+        if sweep_due:
+            self.sweep()
+        return token
+
+    def validate(self, token):
+        """
+        Returns the token's Session, extending its expiry, or None if it is unknown,
+        expired or revoked.
+        """
+        if not token:
+            return None
+        token_hash = hash_token(token)
+        now = now_ms()
+        with self._lock:
+            session = self._sessions.get(token_hash)
+            if session is not None:
+                self._sessions.move_to_end(token_hash)
+                self._hits += 1
+            else:
+                self._misses += 1
+        if session is None:
+            session = self._load(token_hash)
+            if session is None:
+                return None
+            self._cache(session)
+        if session.expires_at <= now:
+            try:
+                self._end(token_hash, expired=True)
+            except sqlite3.Error:
+                # The sweep deletes the row later
+                self._forget(token_hash)
+            return None
+        session.expires_at = self._expiry(session.created_at, now)
+        if session.expires_at - session.stored_expires_at >= self.touch_interval and not self._touch(session):
+            return None
+        return session
+
+    def _load(self, token_hash):
+        with connection() as conn:
+            row = conn.execute('''
+                SELECT user_id, user_type, created_at, expires_at FROM Sessions WHERE token_hash=?
+            ''', (token_hash,)).fetchone()
+        return Session(token_hash, *row) if row else None
+
+    def _touch(self, session):
+        # Persist the slid expiry; no row means the session was revoked elsewhere
+        try:
+            with unit_of_work() as cursor:
+                cursor.execute('UPDATE Sessions SET expires_at=? WHERE token_hash=?',
+                               (session.expires_at, session.token_hash))
+                found = cursor.rowcount > 0
+        except sqlite3.Error as e:
+            # Keep the session; the expiry is written on a later use
+            print(f"Database error during session refresh: {e}")
+            return True
+        with self._lock:
+            self._touches += 1
+        if not found:
+            self._forget(session.token_hash)
+            return False
+        session.stored_expires_at = session.expires_at
+        return True
+
+    def _end(self, token_hash, expired=False):
+        self._forget(token_hash)
+        with unit_of_work() as cursor:
+            cursor.execute('DELETE FROM Sessions WHERE token_hash=?', (token_hash,))
+            ended = cursor.rowcount > 0
+        with self._lock:
+            if expired:
+                self._expired += 1
+            elif ended:
+                self._revoked += 1
+        return ended
+
+    def revoke(self, token):
+        """
+        Ends one session (logout); returns whether it existed.
+        """
+        try:
+            return self._end(hash_token(token))
+        except sqlite3.Error as e:
+            print(f"Database error during session revocation: {e}")
+            return False
+
+    def revoke_user(self, user_id):
+        """
+        Ends every session of a user, e.g. after a password change; returns how many there were.
+        """
+        with self._lock:
+            for token_hash in [h for h, s in self._sessions.items() if s.user_id == user_id]:
+                del self._sessions[token_hash]
+        try:
+            with unit_of_work() as cursor:
+                cursor.execute('DELETE FROM Sessions WHERE user_id=?', (user_id,))
+                count = cursor.rowcount
+        except sqlite3.Error as e:
+            print(f"Database error during session revocation: {e}")
+            return 0
+        with self._lock:
+            self._revoked += count
+        return count
+
+    def sweep(self):
+        """
+        Deletes expired sessions from the table and the cache; returns how many rows were removed.
+        A stored expiry can trail a live session's by up to a touch interval, so rows are only
+        deleted once they are that far past it.
+        """
+        now = now_ms()
+        with self._lock:
+            self._last_sweep = now
+            for token_hash in [h for h, s in self._sessions.items() if s.expires_at <= now]:
+                del self._sessions[token_hash]
+        try:
+            with unit_of_work() as cursor:
+                cursor.execute('DELETE FROM Sessions WHERE expires_at <= ?', (now - self.touch_interval,))
+                count = cursor.rowcount
+        except sqlite3.Error as e:
+            print(f"Database error during session sweep: {e}")
+            return 0
+        with self._lock:
+            self._expired += count
+        return count
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'sessions': len(self._sessions),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'created': self._created,
+                'revoked': self._revoked,
+                'expired': self._expired,
+                'touches': self._touches,
+            }
+
+
+session_store = SessionStore()
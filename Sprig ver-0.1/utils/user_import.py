@@ -0,0 +1,297 @@
+'''
+Bulk user import
+Purpose: Onboards many customers, restaurant partners or delivery partners at once
+instead of one signup (and one hash and one commit) at a time.
+Rows come from CSV (with a header) or NDJSON, one user type per file:
+Customer:          username, password, name, email, phone
+RestaurantPartner: username, password, restaurant_name, address, cuisine [, email]
+DeliveryPartner:   username, password, name, vehicle_type, license_number [, email]
+Partners without an email get <username>@sprig.com, as signup gives them.
+
+Rows are checked with the utils/validations.py rules, against earlier rows of the file
+and against existing users (see utils/availability.py) before any hashing. Passwords
+of valid rows are hashed in the hashing pool one chunk ahead of the inserts, and each
+chunk goes into Users and the subtype table with executemany in one transaction. If a
+chunk hits a constraint (a user added meanwhile by someone else) it is retried row by
+row, so only the offending rows fail. Every rejected row is reported with its row number
+and reason, including passwords the hasher rejects, and the summary gives the import rate.
+
+Usage (from the project directory):
+python -m utils.user_import FILE --type Customer [--format csv|ndjson]
+       [--chunk-size 500] [--errors report.csv] [--database sprig.db]
+
+'''
+
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from utils import database, hashing
+from utils.availability import user_availability
+from utils.database import unit_of_work
+from utils.validations import (validate_address, validate_email, validate_name, validate_password,
+                               validate_phone_number, validate_restaurant_name, validate_username)
+
+CHUNK_SIZE = int(os.environ.get('SPRIG_IMPORT_CHUNK', '500'))
+# bcrypt rejects longer passwords
+BCRYPT_MAX_BYTES = 72
+
+FIELDS = {
+    'Customer': ('username', 'password', 'name', 'email', 'phone'),
+    'RestaurantPartner': ('username', 'password', 'restaurant_name', 'address', 'cuisine'),
+    'DeliveryPartner': ('username', 'password', 'name', 'vehicle_type', 'license_number'),
+}
+
+
+def _required(label):
+    def validate(value):
+        if 1 <= len(value) <= 100:
+            return True, ""
+        return False, f"{label} must be between 1 and 100 characters."
+    return validate
+
+
+VALIDATORS = {
+    'Customer': {'name': validate_name, 'phone': validate_phone_number},
+    'RestaurantPartner': {'restaurant_name': validate_restaurant_name, 'address': validate_address,
+                          'cuisine': _required('Cuisine')},
+    'DeliveryPartner': {'name': validate_name, 'vehicle_type': _required('Vehicle type'),
+                        'license_number': _required('License number')},
+}
+
+
+class ImportReport:
+    """
+    Outcome of an import: rows imported, rejected rows with reasons, and timing.
+    """
+
+    def __init__(self):
+        self.imported = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    def reject(self, row_number, username, message):
+        self.errors.append((row_number, username, message))
+
+    @property
+    def rows(self):
+        return self.imported + len(self.errors)
+
+    @property
+    def rate(self):
+        return self.imported / self.elapsed if self.elapsed else 0.0
+
+
+def read_rows(path, file_format=None):
+    """
+    Yields (row_number, row) from a CSV or NDJSON file; the format follows the extension
+    unless given. Row numbers count data rows from 1.
+    """
+    if file_format is None:
+        file_format = 'csv' if path.lower().endswith('.csv') else 'ndjson'
+    with open(path, newline='', encoding='utf-8') as f:
+        if file_format == 'csv':
+            yield from enumerate(csv.DictReader(f), 1)
+            return
+        row_number = 0
+        for line in f:
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = f"Invalid JSON: {e}"
+            yield row_number, row
+
+
+def check_row(row, user_type):
+    """
+    Returns the row's fields as strings and a list of validation errors.
+    """
+    if not isinstance(row, dict):
+        return None, [row if isinstance(row, str) else "Row must be an object."]
+    fields = {key: '' if value is None else str(value).strip() for key, value in row.items() if key}
+    if user_type != 'Customer':
+        fields['email'] = fields.get('email') or f"{fields.get('username', '')}@sprig.com"
+    missing = [field for field in FIELDS[user_type] if not fields.get(field)]
+    if missing:
+        return fields, [f"Missing {', '.join(missing)}."]
+    validators = {'username': validate_username, 'password': validate_password, 'email': validate_email}
+    validators.update(VALIDATORS[user_type])
+    errors = []
+    for field, validate in validators.items():
+        valid, message = validate(fields[field])
+        if not valid:
+            errors.append(message)
+    if (isinstance(hashing.password_hasher.hasher, hashing.BcryptHasher)
+            and len(fields['password'].encode('utf-8')) > BCRYPT_MAX_BYTES):
+        errors.append(f"Password must be at most {BCRYPT_MAX_BYTES} bytes long.")
+    return fields, errors
+
+
+def _valid_rows(rows, user_type, report):
+    seen_usernames, seen_emails = set(), set()
+    for row_number, row in rows:
+        fields, errors = check_row(row, user_type)
+        username = fields.get('username') if fields else None
+        if not errors:
+            if fields['username'] in seen_usernames or fields['email'] in seen_emails:
+                errors = ["Username or email appears earlier in the file."]
+            else:
+                username_free, email_free = user_availability.check(fields['username'], fields['email'])
+                if not (username_free and email_free):
+                    errors = ["Username or email already exists."]
+        if errors:
+            report.reject(row_number, username, ' '.join(errors))
+            continue
+        seen_usernames.add(fields['username'])
+        seen_emails.add(fields['email'])
+        yield row_number, fields
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _inserted_ids(cursor, count):
+    # Rows from one executemany into an AUTOINCREMENT table get consecutive ids while the
+    # transaction holds the write lock, ending at last_insert_rowid()
+    last = cursor.execute('SELECT last_insert_rowid()').fetchone()[0]
+    return range(last - count + 1, last + 1)
+
+
+def _insert_rows(cursor, user_type, rows, hashes):
+    name_field = 'restaurant_name' if user_type == 'RestaurantPartner' else 'name'
+    cursor.executemany('''
+        INSERT INTO Users (username, password, name, email, user_type)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(fields['username'], hashed, fields[name_field], fields['email'], user_type)
+          for (_, fields), hashed in zip(rows, hashes)])
+    user_ids = _inserted_ids(cursor, len(rows))
+    if user_type == 'Customer':
+        cursor.executemany('INSERT INTO Customers (id, phone_number) VALUES (?, ?)',
+                           [(user_id, fields['phone']) for user_id, (_, fields) in zip(user_ids, rows)])
+    elif user_type == 'RestaurantPartner':
+        cursor.executemany('''
+            INSERT INTO Restaurants (restaurant_name, address, cuisine_type)
+            VALUES (?, ?, ?)
+        ''', [(fields['restaurant_name'], fields['address'], fields['cuisine']) for _, fields in rows])
+        restaurant_ids = _inserted_ids(cursor, len(rows))
+        cursor.executemany('''
+            INSERT INTO RestaurantPartners (id, restaurant_id, address, cuisine_type)
+            VALUES (?, ?, ?, ?)
+        ''', [(user_id, restaurant_id, fields['address'], fields['cuisine'])
+              for user_id, restaurant_id, (_, fields) in zip(user_ids, restaurant_ids, rows)])
+    else:
+        cursor.executemany('''
+            INSERT INTO DeliveryPartners (id, vehicle_type, license_number)
+            VALUES (?, ?, ?)
+        ''', [(user_id, fields['vehicle_type'], fields['license_number'])
+              for user_id, (_, fields) in zip(user_ids, rows)])
+    for _, fields in rows:
+        user_availability.add(fields['username'], fields['email'])
+
+
+def _insert_chunk(user_type, rows, futures, report):
+    hashed_rows, hashes = [], []
+    for row, future in zip(rows, futures):
+        try:
+            hashes.append(future.result())
+            hashed_rows.append(row)
+        except Exception as e:
+            report.reject(row[0], row[1]['username'], f"Password could not be hashed: {e}")
+    rows = hashed_rows
+    if not rows:
+        return
+    try:
+        with unit_of_work() as cursor:
+            _insert_rows(cursor, user_type, rows, hashes)
+        report.imported += len(rows)
+        return
+    except sqlite3.IntegrityError:
+        pass
+    except sqlite3.Error as e:
+        for row_number, fields in rows:
+            report.reject(row_number, fields['username'], f"Database error: {e}")
+        return
+    for row, hashed in zip(rows, hashes):
+        try:
+            with unit_of_work() as cursor:
+                _insert_rows(cursor, user_type, [row], [hashed])
+            report.imported += 1
+        except sqlite3.IntegrityError:
+            report.reject(row[0], row[1]['username'], "Username or email already exists.")
+        except sqlite3.Error as e:
+            report.reject(row[0], row[1]['username'], f"Database error: {e}")
+
+
+def import_users(rows, user_type, chunk_size=CHUNK_SIZE):
+    """
+    Imports (row_number, row) pairs of one user type and returns an ImportReport.
+    The next chunk's passwords are hashing while the current chunk is inserted.
+    """
+    if user_type not in FIELDS:
+        raise ValueError(f"User type must be one of {set(FIELDS)}.")
+    report = ImportReport()
+    start = time.perf_counter()
+    pending = None
+    for chunk in _chunks(_valid_rows(rows, user_type, report), chunk_size):
+        futures = hashing.password_hasher.hash_many([fields['password'] for _, fields in chunk])
+        if pending:
+            _insert_chunk(user_type, *pending, report)
+        pending = (chunk, futures)
+    if pending:
+        _insert_chunk(user_type, *pending, report)
+    report.elapsed = time.perf_counter() - start
+    report.errors.sort()
+    return report
+
+
+def write_errors(report, path):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['row', 'username', 'error'])
+        writer.writerows(report.errors)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import users from a CSV or NDJSON file.')
+    parser.add_argument('file', help='CSV file with a header row, or NDJSON with one user per line')
+    parser.add_argument('--type', required=True, choices=sorted(FIELDS), help='user type of every row')
+    parser.add_argument('--format', choices=['csv', 'ndjson'], help='file format (default: from the extension)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='rows per transaction')
+    parser.add_argument('--errors', help='write rejected rows to this CSV file instead of printing them')
+    parser.add_argument('--database', help=f'database file (default: {database.DATABASE})')
+    args = parser.parse_args(argv)
+
+    if args.database:
+        database.configure_pool(database=args.database)
+    database.initialize_database()
+    hashing.password_hasher.calibrate()
+
+    report = import_users(read_rows(args.file, args.format), args.type, args.chunk_size)
+    if args.errors:
+        write_errors(report, args.errors)
+    else:
+        for row_number, username, message in report.errors:
+            print(f"row {row_number} ({username or '-'}): {message}")
+    print(f"Imported {report.imported} of {report.rows} rows in {report.elapsed:.1f} s "
+          f"({report.rate:.1f} users/s); {len(report.errors)} rejected.")
+    return 1 if report.errors else 0
+
+
+# Keep this guard: password hashing workers re-import the main module (utils/hashing.py)
+if __name__ == '__main__':
+    sys.exit(main())